@@ -0,0 +1,297 @@
+#
+# Animated GIF/APNG Tile for Tile Manager.
+#
+# Animations (logos, radar loops) are decoded once into a process-wide frame
+# cache shared by every tile showing the same file at the same size. Frames
+# with at most 256 colors are kept palette-indexed (1 byte per pixel), others
+# as RGB. The least recently used animations are evicted once the cache
+# grows beyond its memory cap; tiles only keep the cache key, so evicted
+# animations are freed and decoded again on next use.
+#
+# Per-frame durations are mapped onto the tile manager's frame clock: the
+# tile shows the animation frame due at current_frame / fps seconds.
+#
+
+import base_tile
+import bisect
+import collections
+import math
+import os
+import threading
+from PIL import Image
+from PIL import ImageSequence
+
+
+class DecodedAnimation(object):
+  """ Decoded frames of an animation, ready to paste onto an RGB buffer.
+
+  Attributes:
+    frames: List of PIL.Image P (palette-indexed) or RGB frames.
+    durations: List of Integer milliseconds each frame is shown.
+    size: Tuple (Integer: X, Integer: Y) frame size in pixels.
+    duration: Integer milliseconds of one loop.
+    nbytes: Integer approximate memory used by the frames, in bytes.
+  """
+
+  def __init__(self, frames, durations):
+    """ Initalize decoded animation.
+
+    Args:
+      frames: List of PIL.Image P or RGB frames, all the same size.
+      durations: List of Integer milliseconds each frame is shown.
+    """
+    self.frames = frames
+    self.durations = durations
+    self.size = frames[0].size
+    self.duration = sum(durations)
+    self._ends = []
+    end = 0
+    for duration in durations:
+      end += duration
+      self._ends.append(end)
+    self.nbytes = 0
+    for frame in frames:
+      if frame.mode == 'P':
+        self.nbytes += self.size[0] * self.size[1] + 768
+      else:
+        self.nbytes += self.size[0] * self.size[1] * 3
+
+  def GetFrameIndex(self, milliseconds):
+    """ Returns Integer index of the frame shown at a time, looping.
+
+    Args:
+      milliseconds: Float time since the animation started.
+    """
+    if self.duration == 0:
+      return 0
+    return bisect.bisect_right(self._ends, milliseconds % self.duration)
+
+
+class FrameCache(object):
+  """ Least recently used cache of decoded animations, capped in memory.
+
+  Attributes:
+    max_bytes: Integer memory the decoded frames may use, in bytes. The most
+        recently used animation is always kept, even if bigger.
+    nbytes: Integer memory used by the cached frames, in bytes.
+    hits: Integer number of lookups served from the cache.
+    misses: Integer number of lookups decoding the animation.
+    evictions: Integer number of animations evicted.
+    DEFAULT_DURATION: Integer milliseconds used for frames without a usable
+        duration. Default: 100.
+    MIN_DURATION: Integer milliseconds, shorter frame durations are treated
+        as missing (as browsers do). Default: 20.
+  """
+  DEFAULT_DURATION = 100
+  MIN_DURATION = 20
+
+  def __init__(self, max_bytes=4 * 1024 * 1024):
+    """ Initalize frame cache.
+
+    Args:
+      max_bytes: Integer memory the decoded frames may use, in bytes.
+          Default: 4 MiB.
+    """
+    self.max_bytes = max_bytes
+    self.nbytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._animations = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def _Compact(self, frame):
+    """ Returns PIL.Image frame palette-indexed if it has 256 colors or less.
+
+    Args:
+      frame: PIL.Image RGB frame.
+    """
+    colors = frame.getcolors(256)
+    if colors is None:
+      return frame
+    palette = Image.new('P', (1, 1))
+    palette.putpalette([value for (count, color) in colors for value in color])
+    return frame.quantize(palette=palette, dither=Image.Dither.NONE)
+
+  def _Decode(self, path, size):
+    """ Returns DecodedAnimation of a GIF, APNG or still image file.
+
+    Frames are scaled to fit the size, keeping their aspect ratio, and
+    centered on black. Transparent pixels are black.
+
+    Args:
+      path: String location of the animation.
+      size: Tuple (Integer: X, Integer: Y) size to fit the frames in.
+
+    Raises:
+      Exception if the file cannot be decoded.
+    """
+    frames = []
+    durations = []
+    try:
+      with Image.open(path) as image:
+        for source in ImageSequence.Iterator(image):
+          duration = source.info.get('duration') or 0
+          rgba = source.convert('RGBA')
+          if rgba.size != size:
+            scale = min(size[0] / rgba.size[0], size[1] / rgba.size[1])
+            rgba = rgba.resize((max(1, round(rgba.size[0] * scale)),
+                                max(1, round(rgba.size[1] * scale))),
+                               Image.LANCZOS)
+          frame = Image.new('RGB', size)
+          frame.paste(rgba, ((size[0] - rgba.size[0]) // 2,
+                             (size[1] - rgba.size[1]) // 2), rgba)
+          frames.append(self._Compact(frame))
+          if duration < self.MIN_DURATION:
+            duration = self.DEFAULT_DURATION
+          durations.append(int(duration))
+    except (IOError, SyntaxError) as e:
+      raise Exception('FrameCache: cannot decode %s: %s' % (path, e))
+    return DecodedAnimation(frames, durations)
+
+  def Get(self, path, size):
+    """ Returns DecodedAnimation for a file, decoding it if not cached.
+
+    Args:
+      path: String location of the animation.
+      size: Tuple (Integer: X, Integer: Y) size to fit the frames in.
+    """
+    key = (os.path.realpath(path), tuple(size))
+    with self._lock:
+      animation = self._animations.get(key)
+      if animation is not None:
+        self._animations.move_to_end(key)
+        self.hits += 1
+        return animation
+    # Decode outside the lock, tiles of other files are not held up.
+    animation = self._Decode(path, key[1])
+    with self._lock:
+      self.misses += 1
+      if key not in self._animations:
+        self._animations[key] = animation
+        self.nbytes += animation.nbytes
+      while self.nbytes > self.max_bytes and len(self._animations) > 1:
+        (evicted_key, evicted) = self._animations.popitem(last=False)
+        self.nbytes -= evicted.nbytes
+        self.evictions += 1
+      return self._animations.get(key, animation)
+
+  def Clear(self):
+    """ Drop every cached animation. """
+    with self._lock:
+      self._animations.clear()
+      self.nbytes = 0
+
+
+_CACHE = FrameCache()
+
+
+def GetCache():
+  """ Returns FrameCache shared by every animation tile in the process. """
+  return _CACHE
+
+
+class AbstractAnimationTile(base_tile.BaseTile):
+  """ Abstract animation tile, playing a GIF or APNG file.
+
+  Single frame images are static tiles and get the static lifespan from the
+  tile manager.
+
+  Attributes:
+    FRAME_CACHE: FrameCache decoding the animations, shared by all animation
+        tiles. Default: GetCache().
+    path: String location of the animation.
+    fps: Integer frames per second the tile manager renders at.
+    loops: Integer number of times the animation is played.
+  """
+  FRAME_CACHE = GetCache()
+
+  def __init__(self, path, fps=1, loops=1, x=0, y=0, scrolling=(0,0)):
+    """ Initalize animation tile.
+
+    Args:
+      path: String location of a GIF, APNG or still image file.
+      fps: Integer frames per second the tile manager renders at, to map
+          frame durations onto rendered frames. Default: 1.
+      loops: Integer number of times the animation is played. Default: 1.
+      x: Integer absolute X position of tile. Default: 0.
+      y: Integer absolute Y position of tile. Default: 0.
+      scrolling: Tuple (Integer: X, Integer: Y) containing scrolling
+          information. Values are number of pixels to change at once along
+          respective axis. Default: (0, 0) (no scrolling).
+    """
+    base_tile.BaseTile.__init__(self, x, y, scrolling)
+    self.path = path
+    self.fps = fps
+    self.loops = loops
+    self._shown = None
+
+  def _GetAnimation(self):
+    """ Returns DecodedAnimation for the tile, from the frame cache. """
+    return self.FRAME_CACHE.Get(self.path, (self.TILE_WIDTH, self.TILE_HEIGHT))
+
+  def GetCacheKey(self):
+    """ Returns the content the animation frames depend on, or None.
+
+    The file's modification time and size are part of the key, so a replaced
+    file misses the cache. None is returned if the file can not be read.
+    """
+    try:
+      stat = os.stat(self.path)
+    except OSError:
+      return None
+    return (os.path.realpath(self.path), stat.st_mtime_ns, stat.st_size,
+            self.fps, self.loops, self.START_X, self.START_Y, self.scrolling)
+
+  def GetMaxFrames(self):
+    """ Returns Integer total number of frames for tile.
+
+    Animations last their duration times loops (or until scrolled off, if
+    longer); single frame images are static.
+    """
+    if self._max_frame_count is None:
+      animation = self._GetAnimation()
+      frames = base_tile.BaseTile.GetMaxFrames(self)
+      if len(animation.frames) > 1:
+        frames = max(frames, math.ceil(
+            animation.duration * self.loops * self.fps / 1000.0))
+      self._max_frame_count = frames
+    return self._max_frame_count
+
+  def Reset(self):
+    """ Reset tile frame state to initial state. """
+    base_tile.BaseTile.Reset(self)
+    self._shown = None
+
+  def OnHide(self):
+    """ Release the image buffer, redrawn when shown again. """
+    base_tile.BaseTile.OnHide(self)
+    self._shown = None
+
+  def Render(self):
+    """ Returns Image buffer for tile to render.
+
+    The buffer is only redrawn when the animation frame or position changes.
+
+    Returns:
+      Image containing rendered tile to display.
+    """
+    animation = self._GetAnimation()
+    index = animation.GetFrameIndex(self.current_frame * 1000.0 / self.fps)
+    shown = (id(animation), index, self.x, self.y)
+    if shown != self._shown:
+      self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
+                                 fill=base_tile.BLACK)
+      self._image_buffer.paste(animation.frames[index], (self.x, self.y))
+      self._shown = shown
+    self.displayed = True
+    return self._image_buffer
+
+
+class AnimationTile32x32(AbstractAnimationTile):
+  """ 32x32 pixel animation tile. """
+
+
+class AnimationTile64x32(AbstractAnimationTile):
+  """ 64x32 pixel animation tile. """
+  TILE_WIDTH = 64
@@ -0,0 +1,145 @@
+#
+# Animated GIF/APNG Tile unittest.
+#
+
+import animation
+import base_tile
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+
+class TestAnimationTile(unittest.TestCase):
+  """ Ensure animation functionality works. """
+
+  def setUp(self):
+    """ Initalize animation test files and a private frame cache. """
+    self.directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.directory)
+    self.cache = animation.FrameCache()
+    animation.AbstractAnimationTile.FRAME_CACHE = self.cache
+    self.addCleanup(setattr, animation.AbstractAnimationTile, 'FRAME_CACHE',
+                    animation.GetCache())
+    self.gif = self.Save('logo.gif', [base_tile.RED, base_tile.GREEN,
+                                      base_tile.BLUE], [100, 200, 300])
+
+  def Save(self, name, colors, durations, size=(32, 32)):
+    """ Returns String path of an animation of solid color frames. """
+    path = os.path.join(self.directory, name)
+    frames = [Image.new('RGB', size, color) for color in colors]
+    frames[0].save(path, save_all=True, append_images=frames[1:],
+                   duration=durations, loop=0)
+    return path
+
+  def Colors(self, tile, frames):
+    """ Returns List of Tuple colors shown for a number of frames. """
+    colors = []
+    for frame in range(frames):
+      colors.append(tile.Render().getpixel((0, 0)))
+      tile.StepFrame()
+    return colors
+
+  def testFrameDurations(self):
+    """ Ensure frames follow their durations on the frame clock. """
+    tile = animation.AnimationTile32x32(self.gif, fps=10, loops=2)
+    self.assertEqual(tile.GetMaxFrames(), 12)
+    self.assertEqual(self.Colors(tile, 8),
+                     [base_tile.RED] + [base_tile.GREEN] * 2 +
+                     [base_tile.BLUE] * 3 + [base_tile.RED] +
+                     [base_tile.GREEN])
+
+  def testApng(self):
+    """ Ensure APNG animations are decoded. """
+    path = self.Save('radar.png', [base_tile.YELLOW, base_tile.WHITE],
+                     [500, 500])
+    tile = animation.AnimationTile32x32(path, fps=2)
+    self.assertEqual(tile.GetMaxFrames(), 2)
+    self.assertEqual(self.Colors(tile, 2), [base_tile.YELLOW, base_tile.WHITE])
+
+  def testStillImageIsStatic(self):
+    """ Ensure single frame images get the static lifespan. """
+    path = os.path.join(self.directory, 'still.png')
+    Image.new('RGB', (32, 32), base_tile.RED).save(path)
+    self.assertEqual(animation.AnimationTile32x32(path).GetMaxFrames(), 0)
+
+  def testPaletteFrames(self):
+    """ Ensure frames with few colors are palette-indexed. """
+    decoded = self.cache.Get(self.gif, (32, 32))
+    self.assertEqual([frame.mode for frame in decoded.frames], ['P'] * 3)
+    self.assertEqual(decoded.frames[2].convert('RGB').getpixel((5, 5)),
+                     base_tile.BLUE)
+    self.assertEqual(decoded.nbytes, 3 * (32 * 32 + 768))
+
+    path = os.path.join(self.directory, 'noise.png')
+    generator = random.Random(1)
+    noise = Image.frombytes('RGB', (32, 32), bytes(
+        generator.randrange(256) for value in range(32 * 32 * 3)))
+    noise.save(path)
+    decoded = self.cache.Get(path, (32, 32))
+    self.assertEqual(decoded.frames[0].mode, 'RGB')
+    self.assertEqual(decoded.frames[0].tobytes(), noise.tobytes())
+
+  def testScaledToFit(self):
+    """ Ensure frames are scaled to fit the tile, centered. """
+    path = self.Save('wide.gif', [base_tile.RED, base_tile.GREEN],
+                     [100, 100], size=(128, 64))
+    tile = animation.AnimationTile32x32(path, fps=10)
+    image = tile.Render()
+    self.assertEqual(image.getpixel((0, 0)), base_tile.BLACK)
+    self.assertEqual(image.getpixel((16, 16)), base_tile.RED)
+    self.assertEqual(image.getbbox(), (0, 8, 32, 24))
+
+  def testSharedDecoding(self):
+    """ Ensure tiles of the same file share one decoded copy. """
+    first = animation.AnimationTile32x32(self.gif, fps=10)
+    second = animation.AnimationTile32x32(self.gif, fps=10)
+    first.Render()
+    second.Render()
+    self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+    self.assertIs(first._GetAnimation(), second._GetAnimation())
+    # Other sizes are decoded separately.
+    animation.AnimationTile64x32(self.gif, fps=10).Render()
+    self.assertEqual(self.cache.misses, 2)
+
+  def testLruEviction(self):
+    """ Ensure least recently used animations are evicted over the cap. """
+    self.cache.max_bytes = 2 * 3 * (32 * 32 + 768)
+    paths = [self.Save('%d.gif' % index, [base_tile.RED, base_tile.GREEN,
+                                          base_tile.BLUE], [100] * 3)
+             for index in range(3)]
+    self.cache.Get(paths[0], (32, 32))
+    self.cache.Get(paths[1], (32, 32))
+    self.cache.Get(paths[0], (32, 32))
+    self.cache.Get(paths[2], (32, 32))
+    self.assertEqual(self.cache.evictions, 1)
+    self.assertLessEqual(self.cache.nbytes, self.cache.max_bytes)
+    self.cache.Get(paths[0], (32, 32))
+    self.assertEqual(self.cache.misses, 3)
+    self.cache.Get(paths[1], (32, 32))
+    self.assertEqual(self.cache.misses, 4)
+
+  def testRedrawOnlyOnChange(self):
+    """ Ensure the buffer is only redrawn when the frame changes. """
+    tile = animation.AnimationTile32x32(self.gif, fps=10)
+    image = tile.Render()
+    image.putpixel((0, 0), base_tile.WHITE)
+    self.assertEqual(tile.Render().getpixel((0, 0)), base_tile.WHITE)
+    tile.StepFrame()
+    self.assertEqual(tile.Render().getpixel((0, 0)), base_tile.GREEN)
+    tile.Reset()
+    self.assertEqual(tile.Render().getpixel((0, 0)), base_tile.RED)
+
+  def testDecodeError(self):
+    """ Ensure undecodable files raise. """
+    path = os.path.join(self.directory, 'broken.gif')
+    with open(path, 'wb') as broken:
+      broken.write(b'not an image')
+    with self.assertRaises(Exception):
+      animation.AnimationTile32x32(path).Render()
+
+
+if __name__ == '__main__':
+  unittest.main()
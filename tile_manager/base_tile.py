@@ -5,6 +5,8 @@
 # used by TileManager.
 #
 
+import buffer_pool
+import clocks
 import math
 import operator
 import os
@@ -20,6 +22,10 @@ RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 BLACK = (0, 0, 0)
 
+# Colors of palette-indexed ('P' mode) tiles; black is index 0.
+PALETTE = (BLACK, WHITE, GRAY, GREEN, YELLOW, RED, BLUE)
+_PALETTE_DATA = [value for color in PALETTE for value in color]
+
 
 class BaseTile(object):
   """ Base tile used for all tiles to be displayed on matrix.
@@ -52,11 +58,29 @@ class BaseTile(object):
   tiles. A tile is static if the display information has no 'scrolling'
   attribute.
 
+  The image buffer is only allocated when needed, from a pool shared by all
+  tiles. TileManager drives the tile lifecycle with OnSchedule() (next to be
+  displayed), OnShow() (placed on screen) and OnHide() (expired); OnHide()
+  gives the buffer back to the pool. Tiles holding other heavy resources
+  should release them in OnHide() and re-create them when next rendered.
+
+  Tiles drawing only PALETTE colors (e.g. text) can set BUFFER_MODE to 'P':
+  the buffer then holds one palette index per pixel instead of three bytes,
+  and TileManager expands it to RGB once per distinct frame (see
+  scaling.TileScaler). Layers pasted onto a 'P' buffer must be created with
+  _NewImage(), so they share the palette.
+
   Attributes:
     FONT_Y_OFFSET: Integer Y offset for handling font descenders. Default: -2.
     FONT: ImageFont font to render text in. Default: helvR08.pil.
     TILE_WIDTH: Integer image width. Default: 32 pixels.
     TILE_HEIGHT: Integer image height. Default: 32 pixels.
+    BUFFER_POOL: buffer_pool.BufferPool image buffers are taken from.
+        Default: buffer_pool.GetPool().
+    BUFFER_MODE: String PIL mode of the image buffer, 'RGB' or 'P'.
+        Default: 'RGB'.
+    CLOCK: clocks.RealClock (or VirtualClock) time-sensitive tiles read the
+        time from, see SetClock(). Default: clocks.GetClock().
   """
   FONT_Y_OFFSET = -2
   FONT = ImageFont.load(os.path.join(
@@ -64,6 +88,9 @@ class BaseTile(object):
       'helvR08.pil'))
   TILE_WIDTH = 32
   TILE_HEIGHT = 32
+  BUFFER_POOL = buffer_pool.GetPool()
+  BUFFER_MODE = 'RGB'
+  CLOCK = clocks.GetClock()
 
   def __init__(self, x=0, y=0, scrolling=(0,0)):
     """ Initalize base tile.
@@ -81,9 +108,105 @@ class BaseTile(object):
     self.displayed = False
     self.current_frame = 0
     self._max_frame_count = None
-    self._image_buffer = Image.new('RGB', (self.TILE_WIDTH, self.TILE_HEIGHT))
-    self._image_draw = ImageDraw.Draw(self._image_buffer)
+    self._buffer = None
+    self._draw = None
+
+  def __getstate__(self):
+    """ Returns Dictionary tile state for pickling.
+
+    The image buffer and draw object are not picklable and are re-created
+    when the unpickled tile next renders, so tiles can be sent to other
+    processes. A clock set with SetClock() is not sent either, the unpickled
+    tile uses the real clock.
+    """
+    state = self.__dict__.copy()
+    state['_buffer'] = None
+    state['_draw'] = None
+    state.pop('CLOCK', None)
+    return state
 
+  def SetClock(self, clock):
+    """ Set the clock the tile reads the time from.
+
+    TileManager sets its own clock on every tile it displays.
+
+    Args:
+      clock: clocks.RealClock or clocks.VirtualClock.
+    """
+    self.CLOCK = clock
+
+  @property
+  def _image_buffer(self):
+    """ PIL.Image buffer the tile renders into, acquired on first use. """
+    if self._buffer is None:
+      self._AcquireBuffer()
+    return self._buffer
+
+  @property
+  def _image_draw(self):
+    """ ImageDraw drawing onto the image buffer, acquired on first use. """
+    if self._draw is None:
+      self._AcquireBuffer()
+    return self._draw
+
+  def _AcquireBuffer(self):
+    """ Take a black image buffer from the buffer pool, if not held. """
+    if self._buffer is None:
+      self._buffer = self.BUFFER_POOL.Acquire(
+          (self.TILE_WIDTH, self.TILE_HEIGHT), self.BUFFER_MODE)
+      if self.BUFFER_MODE == 'P':
+        self._buffer.putpalette(_PALETTE_DATA)
+      self._draw = ImageDraw.Draw(self._buffer)
+
+  def _NewImage(self, size):
+    """ Returns PIL.Image black image in the buffer mode, for layers.
+
+    Args:
+      size: Tuple (Integer: X, Integer: Y) image size.
+    """
+    image = Image.new(self.BUFFER_MODE, size)
+    if self.BUFFER_MODE == 'P':
+      image.putpalette(_PALETTE_DATA)
+    return image
+
+  def _ReleaseBuffer(self):
+    """ Give the image buffer back to the buffer pool, if held. """
+    if self._buffer is not None:
+      self.BUFFER_POOL.Release(self._buffer)
+      self._buffer = None
+      self._draw = None
+
+  def OnSchedule(self):
+    """ Called by TileManager when the tile is next to be displayed.
+
+    Override to prepare data ahead of display. By default nothing is done.
+    """
+
+  def OnShow(self):
+    """ Called by TileManager when the tile is placed on the screen.
+
+    The image buffer is acquired, so the first render does not allocate.
+    """
+    self._AcquireBuffer()
+
+  def OnHide(self):
+    """ Called by TileManager when the tile expired and left the screen.
+
+    The image buffer goes back to the buffer pool; rendering again acquires
+    a new one.
+    """
+    self._ReleaseBuffer()
+
+  def GetCacheKey(self):
+    """ Returns the content a render cache keys the tile's frames on, or None.
+
+    Tiles rendering the same frames for the same key can be played back from
+    a render_cache.RenderCache. The key must be built from Strings, numbers,
+    Tuples and other values with a stable repr(), and cover everything the
+    frames depend on apart from the tile class, size and font. By default
+    None is returned and the tile is always rendered.
+    """
+    return None
 
   def _GetFrameCount(self, scrolling, start_pos, tile_width, render_width):
     """ Determines the minimum number of frames to shift off screen.
@@ -3,8 +3,10 @@
 #
 
 import base_tile
+import pickle
 import unittest
 import PIL
+import PIL.ImageDraw
 
 
 class TestBaseTile(unittest.TestCase):
@@ -92,6 +94,51 @@ class TestBaseTile(unittest.TestCase):
     self.tile.current_frame = 100
     self.assertTrue(self.tile.IsExpired())
 
+  def testPickle(self):
+    """ Ensure a tile can be pickled and renders after unpickling. """
+    self.tile.scrolling = (1, 1)
+    self.tile.StepFrame()
+    tile = pickle.loads(pickle.dumps(self.tile))
+    self.assertEqual((tile.x, tile.y, tile.current_frame), (1, 1, 1))
+    self.assertIsInstance(tile.Render(), PIL.Image.Image)
+
+
+class PaletteTile(base_tile.BaseTile):
+  """ Tile drawing text onto a palette-indexed buffer. """
+  BUFFER_MODE = 'P'
+
+  def Render(self):
+    base_tile.BaseTile.Render(self)
+    self._RenderText(0, 0, 'R', base_tile.RED)
+    layer = self._NewImage((8, 8))
+    PIL.ImageDraw.Draw(layer).rectangle((0, 0, 7, 7), fill=base_tile.YELLOW)
+    self._image_buffer.paste(layer, (20, 20))
+    return self._image_buffer
+
+
+class TestPaletteTile(unittest.TestCase):
+  """ Test tiles opting into palette-indexed buffers. """
+
+  def testRenderToRGB(self):
+    """ Ensure palette tiles draw and expand to RGB exactly. """
+    image = PaletteTile().Render()
+    self.assertEqual(image.mode, 'P')
+    rgb = image.convert('RGB')
+    self.assertEqual(set(color for (count, color) in rgb.getcolors()),
+                     set([base_tile.BLACK, base_tile.RED, base_tile.YELLOW]))
+    self.assertEqual(rgb.getpixel((20, 20)), base_tile.YELLOW)
+    self.assertEqual(len(image.tobytes()), 32 * 32)
+
+  def testRecycledBuffer(self):
+    """ Ensure recycled palette buffers are black with the palette. """
+    tile = PaletteTile()
+    tile.Render()
+    tile.OnHide()
+    tile = PaletteTile()
+    tile.OnShow()
+    self.assertEqual(tile._image_buffer.convert('RGB').getcolors(),
+                     [(32 * 32, base_tile.BLACK)])
+
 
 if __name__ == '__main__':
   unittest.main()
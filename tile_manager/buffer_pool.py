@@ -0,0 +1,75 @@
+#
+# Shared pool of tile image buffers.
+#
+# Tiles only need an image buffer while they are displayed. Instead of every
+# tile allocating its own buffer when created, buffers are taken from a
+# process-wide pool when a tile is shown and given back when it expires.
+# Buffers are pooled by size class (mode and size), so the few distinct tile
+# sizes in use are recycled, and at most MAX_FREE idle buffers are kept per
+# size class.
+#
+
+import threading
+from PIL import Image
+
+
+class BufferPool(object):
+  """ Recycles PIL.Image buffers by mode and size.
+
+  Attributes:
+    MAX_FREE: Integer idle buffers kept per size class. Default: 8.
+    allocated: Integer number of buffers created.
+    reused: Integer number of buffers taken from the pool.
+  """
+  MAX_FREE = 8
+
+  def __init__(self):
+    """ Initalize buffer pool. """
+    self.allocated = 0
+    self.reused = 0
+    self._free = {}
+    self._lock = threading.Lock()
+
+  def Acquire(self, size, mode='RGB'):
+    """ Returns PIL.Image black buffer, reused from the pool if possible.
+
+    Args:
+      size: Tuple (Integer: X, Integer: Y) buffer size.
+      mode: String PIL image mode. Default: 'RGB'.
+    """
+    with self._lock:
+      free = self._free.get((mode, size))
+      if free:
+        buffer = free.pop()
+        self.reused += 1
+      else:
+        buffer = None
+        self.allocated += 1
+    if buffer is None:
+      return Image.new(mode, size)
+    buffer.paste(0, (0, 0) + size)
+    return buffer
+
+  def Release(self, buffer):
+    """ Give a buffer back to the pool. It must no longer be used.
+
+    Args:
+      buffer: PIL.Image buffer from Acquire.
+    """
+    with self._lock:
+      free = self._free.setdefault((buffer.mode, buffer.size), [])
+      if len(free) < self.MAX_FREE:
+        free.append(buffer)
+
+  def GetFreeCount(self):
+    """ Returns Integer number of idle buffers held by the pool. """
+    with self._lock:
+      return sum(len(free) for free in self._free.values())
+
+
+_POOL = BufferPool()
+
+
+def GetPool():
+  """ Returns BufferPool shared by every tile in the process. """
+  return _POOL
@@ -0,0 +1,107 @@
+#
+# Shared tile buffer pool unittest.
+#
+
+import base_tile
+import blank
+import buffer_pool
+import tile_manager
+import unittest
+
+
+class LifecycleTile(base_tile.BaseTile):
+  """ Tile recording lifecycle calls. """
+
+  def __init__(self, events, name):
+    base_tile.BaseTile.__init__(self)
+    self.events = events
+    self.name = name
+
+  def OnSchedule(self):
+    self.events.append(('schedule', self.name))
+
+  def OnShow(self):
+    base_tile.BaseTile.OnShow(self)
+    self.events.append(('show', self.name))
+
+  def OnHide(self):
+    base_tile.BaseTile.OnHide(self)
+    self.events.append(('hide', self.name))
+
+
+class TestBufferPool(unittest.TestCase):
+  """ Test recycling image buffers. """
+
+  def setUp(self):
+    """ Initalize BufferPool test setup. """
+    self.pool = buffer_pool.BufferPool()
+
+  def testRecycle(self):
+    """ Ensure released buffers are reused cleared. """
+    buffer = self.pool.Acquire((32, 32))
+    buffer.putpixel((3, 3), base_tile.RED)
+    self.pool.Release(buffer)
+    self.assertIs(self.pool.Acquire((32, 32)), buffer)
+    self.assertIsNone(buffer.getbbox())
+    self.assertEqual((self.pool.allocated, self.pool.reused), (1, 1))
+
+  def testSizeClasses(self):
+    """ Ensure buffers are only reused for the same size and mode. """
+    self.pool.Release(self.pool.Acquire((32, 32)))
+    self.assertEqual(self.pool.Acquire((64, 32)).size, (64, 32))
+    self.assertEqual(self.pool.Acquire((32, 32), 'L').mode, 'L')
+    self.assertEqual(self.pool.reused, 0)
+
+  def testMaxFree(self):
+    """ Ensure the pool keeps a bounded number of idle buffers. """
+    buffers = [self.pool.Acquire((32, 32)) for index in range(20)]
+    for buffer in buffers:
+      self.pool.Release(buffer)
+    self.assertEqual(self.pool.GetFreeCount(), self.pool.MAX_FREE)
+
+
+class TestTileLifecycle(unittest.TestCase):
+  """ Test tiles acquiring buffers only while displayed. """
+
+  def setUp(self):
+    """ Initalize tiles with a private buffer pool. """
+    self.pool = buffer_pool.BufferPool()
+    base_tile.BaseTile.BUFFER_POOL = self.pool
+    self.addCleanup(setattr, base_tile.BaseTile, 'BUFFER_POOL',
+                    buffer_pool.GetPool())
+    self.events = []
+    self.tiles = [LifecycleTile(self.events, name) for name in 'abc']
+
+  def testLazyBuffer(self):
+    """ Ensure tiles allocate no buffer until used. """
+    tile = self.tiles[0]
+    self.assertIsNone(tile._buffer)
+    tile.Render()
+    self.assertEqual(tile._buffer.size, (32, 32))
+    tile.OnHide()
+    self.assertIsNone(tile._buffer)
+    self.assertEqual(self.pool.GetFreeCount(), 1)
+
+  def testManagerLifecycle(self):
+    """ Ensure the tile manager schedules, shows and hides tiles. """
+    manager = tile_manager.TileManager(self.tiles, 32, 2, fps=1,
+                                       static_lifespan=1)
+    manager._RenderAddNewTiles()
+    self.assertEqual(self.events, [('show', 'a'), ('show', 'b'),
+                                   ('schedule', 'c')])
+    self.assertIsNone(self.tiles[2]._buffer)
+    del self.events[:]
+    for frame in range(3):
+      manager._RenderToMatrix()
+      manager._RenderPruneAndTick()
+      manager._RenderAddNewTiles()
+    self.assertEqual(self.events, [('hide', 'a'), ('hide', 'b'),
+                                   ('show', 'c')])
+    # The expired tiles' buffers are recycled.
+    self.assertIsNone(self.tiles[0]._buffer)
+    self.assertEqual(self.pool.allocated, 2)
+    self.assertEqual(self.pool.reused, 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
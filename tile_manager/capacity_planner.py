@@ -0,0 +1,406 @@
+#
+# Panel refresh and render throughput capacity planner.
+#
+# Two budgets limit a display:
+#
+#   - the panel refresh rate: the matrix library multiplexes the panel, one
+#     pair of rows at a time (1:16 scan for 32 row panels). For each row pair
+#     every PWM bit plane is clocked into the chain and shown for a time
+#     doubling with each bit, so longer chains, slower write cycles and more
+#     PWM bits all lower the refresh rate until the display flickers,
+#   - the content frame rate: every frame tiles are rendered, composited,
+#     color corrected and dithered in Python on the host.
+#
+# The refresh rate is modeled from the timing of rpi-rgb-led-matrix; the
+# constants are class attributes of PanelModel to adjust for other hardware.
+# The content frame rate is calibrated by timing the render stages of this
+# package on the host, so run the planner on the Pi driving the display:
+#
+#   python capacity_planner.py --led-rows 32 --chain-length 4 \
+#       --target-refresh 200 --fps 10
+#
+
+import argparse
+import base_tile
+import color_correction
+import datetime
+import dithering
+import pytz
+import route
+import ticker
+import time
+import weather
+from PIL import Image
+
+PANEL_COLUMNS = 32
+MAX_PWM_BITS = 11
+MAX_DITHER_BITS = 8
+
+SAMPLE_WEATHER = {'id': 800,
+                  'main': 'Clear',
+                  'description': 'clear sky',
+                  'icon': '01d',
+                  'temp': 72,
+                  'temp_min': 68,
+                  'temp_max': 78,
+                  'humidity': 23}
+
+
+def GetDisplaySize(led_rows, chain_length):
+  """ Returns Tuple (Integer: X, Integer: Y) display size in pixels.
+
+  Same geometry as matrix_manager.MatrixInterface, without opening the panel.
+
+  Args:
+    led_rows: Integer size of the RGB matrix panels.
+    chain_length: Integer number of panels chained.
+
+  Raises:
+    Exception if the panel size is not supported.
+  """
+  if led_rows == 64 or led_rows == 8:
+    return (led_rows, led_rows)
+  if led_rows == 32 or led_rows == 16:
+    return (led_rows * chain_length, led_rows)
+  raise Exception('GetDisplaySize: led_rows must be 8, 16, 32 or 64.')
+
+
+class PanelModel(object):
+  """ Models the refresh rate of a chain of multiplexed panels.
+
+  A refresh shows every bit plane of every scanned row pair. Each bit plane
+  is clocked into the chain, one pixel clock per column, then latched and
+  lit for PWM_LSB_NANOSECONDS doubled for each bit.
+
+  Attributes:
+    led_rows: Integer rows of each panel.
+    chain_length: Integer number of panels chained.
+    write_cycles: Integer write cycle speed, higher is slower.
+    pwm_bits: Integer PWM bits per color channel, 1 to 11.
+    PWM_LSB_NANOSECONDS: Integer time the lowest bit plane is lit.
+        Default: 130.
+    CLOCK_NANOSECONDS: Integer time of a pixel clock for each write cycle.
+        Default: 50.
+    ROW_NANOSECONDS: Integer time to address and latch a row bit plane.
+        Default: 500.
+  """
+  PWM_LSB_NANOSECONDS = 130
+  CLOCK_NANOSECONDS = 50
+  ROW_NANOSECONDS = 500
+
+  def __init__(self, led_rows=32, chain_length=2, write_cycles=2,
+               pwm_bits=MAX_PWM_BITS):
+    """ Initalize panel model.
+
+    Args:
+      led_rows: Integer rows of each panel. Default: 32.
+      chain_length: Integer number of panels chained. Default: 2.
+      write_cycles: Integer write cycle speed, higher is slower. Default: 2.
+      pwm_bits: Integer PWM bits per color channel. Default: 11.
+
+    Raises:
+      Exception if a setting is out of range.
+    """
+    if not 1 <= pwm_bits <= MAX_PWM_BITS:
+      raise Exception('PanelModel: pwm_bits must be 1 - %d.' % MAX_PWM_BITS)
+    if write_cycles < 1 or chain_length < 1:
+      raise Exception('PanelModel: write_cycles and chain_length must be 1 '
+                      'or more.')
+    GetDisplaySize(led_rows, chain_length)
+    self.led_rows = led_rows
+    self.chain_length = chain_length
+    self.write_cycles = write_cycles
+    self.pwm_bits = pwm_bits
+
+  def GetScanRows(self):
+    """ Returns Integer row pairs multiplexed, e.g. 16 for 1:16 scan. """
+    return self.led_rows // 2
+
+  def GetColumns(self):
+    """ Returns Integer pixels clocked into the chain per row. """
+    return PANEL_COLUMNS * self.chain_length
+
+  def GetRefreshTime(self, pwm_bits=None):
+    """ Returns Float seconds to refresh the whole panel once.
+
+    Args:
+      pwm_bits: Integer PWM bits to model. Default: None (model's bits).
+    """
+    bits = pwm_bits or self.pwm_bits
+    shift = (self.GetColumns() * self.write_cycles * self.CLOCK_NANOSECONDS +
+             self.ROW_NANOSECONDS)
+    lit = self.PWM_LSB_NANOSECONDS * (2 ** bits - 1)
+    return self.GetScanRows() * (bits * shift + lit) / 1e9
+
+  def GetRefreshRate(self, pwm_bits=None):
+    """ Returns Float panel refreshes per second.
+
+    Args:
+      pwm_bits: Integer PWM bits to model. Default: None (model's bits).
+    """
+    return 1.0 / self.GetRefreshTime(pwm_bits)
+
+  def GetMaxPwmBits(self, refresh_rate):
+    """ Returns Integer most PWM bits refreshing fast enough, 0 if none.
+
+    Args:
+      refresh_rate: Float lowest acceptable refreshes per second.
+    """
+    for bits in range(MAX_PWM_BITS, 0, -1):
+      if self.GetRefreshRate(bits) >= refresh_rate:
+        return bits
+    return 0
+
+
+class RenderCosts(object):
+  """ Per-frame render stage costs measured on this host.
+
+  Attributes:
+    size: Tuple (Integer: X, Integer: Y) display size measured for.
+    stages: Dictionary of String stage name to Float seconds per frame:
+        'render' (tiles filling the display), 'composite',
+        'color_correction' and 'dither'.
+  """
+  STAGES = ('render', 'composite', 'color_correction', 'dither')
+
+  def __init__(self, size, stages):
+    """ Initalize render costs.
+
+    Args:
+      size: Tuple (Integer: X, Integer: Y) display size.
+      stages: Dictionary of String stage name to Float seconds per frame.
+    """
+    self.size = size
+    self.stages = stages
+
+  @classmethod
+  def Measure(cls, size, tiles=None, frames=50, clock=time.perf_counter):
+    """ Returns RenderCosts timed on this host.
+
+    Tiles are rendered and stepped for a number of frames. Their cost is
+    scaled by area to tiles filling the whole display.
+
+    Args:
+      size: Tuple (Integer: X, Integer: Y) display size.
+      tiles: List of BaseTile subclassed objects representative of the
+          displayed content. Default: None (sample weather, route and
+          ticker tiles).
+      frames: Integer number of frames to time each stage over.
+          Default: 50.
+      clock: Function returning a monotonic time in seconds.
+          Default: time.perf_counter.
+    """
+    tiles = tiles or cls._GetSampleTiles()
+    pixel_time = 0.0
+    for tile in tiles:
+      tile.OnSchedule()
+      start = clock()
+      for frame in range(frames):
+        tile.Render()
+        tile.StepFrame()
+      (width, height) = tile.GetTileDiemensions()
+      pixel_time += (clock() - start) / frames / (width * height)
+      tile.OnHide()
+    stages = {'render': pixel_time / len(tiles) * size[0] * size[1]}
+
+    frame = Image.new('RGB', size)
+    image = Image.new('RGB', (base_tile.BaseTile.TILE_WIDTH,
+                              base_tile.BaseTile.TILE_HEIGHT))
+    start = clock()
+    for index in range(frames):
+      for y in range(0, size[1], image.size[1]):
+        for x in range(0, size[0], image.size[0]):
+          frame.paste(image, (x, y))
+    stages['composite'] = (clock() - start) / frames
+
+    for (name, stage) in (
+        ('color_correction', color_correction.ColorCorrection(gamma=2.2)),
+        ('dither', dithering.OrderedDither(bits=5, temporal=True))):
+      start = clock()
+      for index in range(frames):
+        stage.Apply(frame)
+      stages[name] = (clock() - start) / frames
+    return cls(size, stages)
+
+  @staticmethod
+  def _GetSampleTiles():
+    """ Returns List of BaseTile typical of a transit and weather display. """
+    now = datetime.datetime.now(pytz.utc)
+    return [weather.WeatherTile32x32(SAMPLE_WEATHER),
+            route.RouteTile32x32(route_name='N', stops=[
+                now + datetime.timedelta(minutes=minutes)
+                for minutes in (3, 12, 25)]),
+            ticker.TickerTile64x32(['Service alert: delays on all lines.'])]
+
+  def GetFrameTime(self, color_correction=False, dither=False):
+    """ Returns Float seconds of host time to produce one frame.
+
+    Args:
+      color_correction: Boolean True if frames are color corrected.
+          Default: False.
+      dither: Boolean True if frames are dithered. Default: False.
+    """
+    total = self.stages['render'] + self.stages['composite']
+    if color_correction:
+      total += self.stages['color_correction']
+    if dither:
+      total += self.stages['dither']
+    return total
+
+  def GetMaxFps(self, color_correction=False, dither=False):
+    """ Returns Float most frames per second the host can produce.
+
+    Args:
+      color_correction: Boolean True if frames are color corrected.
+          Default: False.
+      dither: Boolean True if frames are dithered. Default: False.
+    """
+    return 1.0 / self.GetFrameTime(color_correction, dither)
+
+
+class Recommendation(object):
+  """ Settings recommended for a display.
+
+  Attributes:
+    model: PanelModel with the recommended PWM bits.
+    target_refresh: Float lowest acceptable refreshes per second.
+    feasible: Boolean True if the target refresh rate can be reached.
+    dither: Boolean True if the PWM bits are lowered with a dither stage.
+    refresh_rate: Float modeled refreshes per second.
+    max_fps: Float most content frames per second, or None if not
+        calibrated.
+    fps: Integer content frames per second asked for, or None.
+    load: Float fraction of a host core producing frames at fps, or None.
+    max_chain_length: Integer longest chain reaching the target refresh
+        rate with MIN_DITHER_BITS, at most MAX_CHAIN_LENGTH.
+    MIN_DITHER_BITS: Integer lowest PWM bits recommended. Default: 5.
+    MAX_CHAIN_LENGTH: Integer longest chain searched. Default: 32.
+  """
+  MIN_DITHER_BITS = 5
+  MAX_CHAIN_LENGTH = 32
+
+  def __init__(self, led_rows, chain_length, write_cycles, target_refresh,
+               costs=None, fps=None, color_correction=False):
+    """ Recommend PWM bits for a target refresh rate.
+
+    Args:
+      led_rows: Integer rows of each panel.
+      chain_length: Integer number of panels chained.
+      write_cycles: Integer lowest write cycle speed the Pi runs reliably.
+      target_refresh: Float lowest acceptable refreshes per second.
+      costs: RenderCosts measured for the display. Default: None.
+      fps: Integer content frames per second. Default: None.
+      color_correction: Boolean True if frames are color corrected.
+          Default: False.
+
+    Raises:
+      Exception if the target refresh rate is not positive.
+    """
+    if target_refresh <= 0:
+      raise Exception('Recommendation: target refresh must be positive.')
+    model = PanelModel(led_rows, chain_length, write_cycles)
+    bits = model.GetMaxPwmBits(target_refresh)
+    self.target_refresh = target_refresh
+    self.feasible = bits > 0
+    # Panels run at full PWM depth unless frames are dithered, which sets the
+    # PWM bits to the dither depth of 8 bits or less. At 8 bits frames pass
+    # unchanged at no cost; below, dithering keeps colors from banding.
+    self.dither = 0 < bits < MAX_PWM_BITS
+    if self.dither:
+      bits = min(bits, MAX_DITHER_BITS)
+    model.pwm_bits = max(bits, 1)
+    self.model = model
+    self.refresh_rate = model.GetRefreshRate()
+    self.max_fps = None
+    self.fps = fps
+    self.load = None
+    if costs:
+      frame_time = costs.GetFrameTime(
+          color_correction, self.dither and bits < MAX_DITHER_BITS)
+      self.max_fps = 1.0 / frame_time
+      if fps:
+        self.load = fps * frame_time
+    self.max_chain_length = 0
+    while (self.max_chain_length < self.MAX_CHAIN_LENGTH and
+           PanelModel(led_rows, self.max_chain_length + 1, write_cycles,
+                      self.MIN_DITHER_BITS).GetRefreshRate() >=
+           target_refresh):
+      self.max_chain_length += 1
+
+  def GetArguments(self):
+    """ Returns String display_daemon.py arguments for the settings. """
+    model = self.model
+    arguments = ['--led-rows %d' % model.led_rows,
+                 '--chain-length %d' % model.chain_length,
+                 '--write-cycles %d' % model.write_cycles]
+    if self.dither:
+      arguments.append('--pwm-bits %d' % model.pwm_bits)
+    if self.fps:
+      arguments.append('--fps %d' % self.fps)
+    return ' '.join(arguments)
+
+
+def main():
+  """ Print refresh rates and recommended settings for a display. """
+  parser = argparse.ArgumentParser(
+      description='Recommend display settings for a flicker free refresh '
+                  'rate.')
+  parser.add_argument('--led-rows', type=int, default=32)
+  parser.add_argument('--chain-length', type=int, default=2)
+  parser.add_argument('--write-cycles', type=int, default=2,
+                      help='lowest write cycles the Pi runs reliably')
+  parser.add_argument('--target-refresh', type=float, default=120,
+                      help='lowest acceptable panel refreshes per second')
+  parser.add_argument('--fps', type=int, default=None,
+                      help='content frames per second to check')
+  parser.add_argument('--color-correction', action='store_true',
+                      help='frames are color corrected')
+  parser.add_argument('--no-calibrate', action='store_true',
+                      help='skip timing render stages on this host')
+  args = parser.parse_args()
+  if args.target_refresh <= 0:
+    parser.error('--target-refresh must be positive')
+
+  model = PanelModel(args.led_rows, args.chain_length, args.write_cycles)
+  size = GetDisplaySize(args.led_rows, args.chain_length)
+  print('Display %dx%d: %d x %d row panels, 1:%d scan, write cycles %d.' % (
+      size[0], size[1], args.chain_length, args.led_rows,
+      model.GetScanRows(), args.write_cycles))
+  for bits in range(MAX_PWM_BITS, 0, -1):
+    rate = model.GetRefreshRate(bits)
+    print('  %2d PWM bits: %7.0f Hz%s' % (
+        bits, rate, '' if rate >= args.target_refresh else '  (flickers)'))
+
+  costs = None
+  if not args.no_calibrate:
+    costs = RenderCosts.Measure(size)
+    print('Render costs per frame on this host:')
+    for name in RenderCosts.STAGES:
+      print('  %-16s %7.2f ms' % (name, costs.stages[name] * 1000))
+
+  recommendation = Recommendation(args.led_rows, args.chain_length,
+                                  args.write_cycles, args.target_refresh,
+                                  costs, args.fps, args.color_correction)
+  if not recommendation.feasible:
+    print('No PWM depth refreshes at %.0f Hz; chain at most %d panels, or '
+          'lower the write cycles.' % (args.target_refresh,
+                                       recommendation.max_chain_length))
+    return
+  print('Recommended: %s' % recommendation.GetArguments())
+  print('  %d PWM bits%s refresh at %.0f Hz; up to %d panels reach %.0f Hz '
+        'with %d bits.' % (
+            recommendation.model.pwm_bits,
+            (' (dithered)' if recommendation.model.pwm_bits < MAX_DITHER_BITS
+             else ''),
+            recommendation.refresh_rate, recommendation.max_chain_length,
+            args.target_refresh, Recommendation.MIN_DITHER_BITS))
+  if recommendation.max_fps:
+    print('  Content: up to %.0f fps.' % recommendation.max_fps)
+  if recommendation.load is not None:
+    print('  %d fps uses %.0f%% of a core%s.' % (
+        args.fps, recommendation.load * 100,
+        '' if recommendation.load < 1 else ', too slow for this host'))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,163 @@
+#
+# Capacity planner unittest.
+#
+
+import base_tile
+import capacity_planner
+import unittest
+
+
+class FakeClock(object):
+  """ Clock advancing a millisecond every time it is read. """
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    self.now += 0.001
+    return self.now
+
+
+class TestPanelModel(unittest.TestCase):
+  """ Test modeling the panel refresh rate. """
+
+  def testRefreshTime(self):
+    """ Ensure a refresh shifts and lights every bit plane of every row. """
+    model = capacity_planner.PanelModel(32, 1, 2, 11)
+    self.assertEqual((model.GetScanRows(), model.GetColumns()), (16, 32))
+    # 16 rows * (11 bits * (32 columns * 2 * 50ns + 500ns) + 130ns * 2047).
+    self.assertAlmostEqual(model.GetRefreshTime(), 16 * 306810 / 1e9)
+    self.assertAlmostEqual(model.GetRefreshRate(), 203.7, places=1)
+
+  def testSlowerSettings(self):
+    """ Ensure longer chains, more write cycles and bits refresh slower. """
+    rate = capacity_planner.PanelModel(32, 2, 2, 8).GetRefreshRate()
+    for (chain_length, write_cycles, bits) in ((4, 2, 8), (2, 3, 8),
+                                               (2, 2, 9)):
+      self.assertLess(capacity_planner.PanelModel(
+          32, chain_length, write_cycles, bits).GetRefreshRate(), rate)
+    self.assertGreater(capacity_planner.PanelModel(16, 2, 2, 8)
+                       .GetRefreshRate(), rate)
+
+  def testMaxPwmBits(self):
+    """ Ensure the most bits reaching the target refresh rate are found. """
+    model = capacity_planner.PanelModel(32, 4, 2)
+    bits = model.GetMaxPwmBits(300)
+    self.assertGreaterEqual(model.GetRefreshRate(bits), 300)
+    self.assertLess(model.GetRefreshRate(bits + 1), 300)
+    self.assertEqual(model.GetMaxPwmBits(1), 11)
+    self.assertEqual(model.GetMaxPwmBits(1e6), 0)
+
+  def testInvalidSettings(self):
+    """ Ensure unsupported settings are rejected. """
+    for settings in ((24, 2, 2, 11), (32, 2, 2, 12), (32, 2, 0, 8),
+                     (32, 0, 2, 8)):
+      with self.assertRaises(Exception):
+        capacity_planner.PanelModel(*settings)
+
+  def testDisplaySize(self):
+    """ Ensure the display size matches the matrix interface. """
+    self.assertEqual(capacity_planner.GetDisplaySize(32, 2), (64, 32))
+    self.assertEqual(capacity_planner.GetDisplaySize(16, 4), (64, 16))
+    self.assertEqual(capacity_planner.GetDisplaySize(64, 2), (64, 64))
+
+
+class TestRenderCosts(unittest.TestCase):
+  """ Test calibrating render costs on the host. """
+
+  def testMeasure(self):
+    """ Ensure every stage is timed per frame. """
+    costs = capacity_planner.RenderCosts.Measure((64, 32), frames=2)
+    self.assertEqual(costs.size, (64, 32))
+    self.assertEqual(sorted(costs.stages),
+                     sorted(capacity_planner.RenderCosts.STAGES))
+    for cost in costs.stages.values():
+      self.assertGreater(cost, 0)
+
+  def testRenderScaledByArea(self):
+    """ Ensure tile render costs are scaled to fill the display. """
+    tile = base_tile.BaseTile()
+    small = capacity_planner.RenderCosts.Measure(
+        (32, 32), [tile], frames=4, clock=FakeClock())
+    large = capacity_planner.RenderCosts.Measure(
+        (128, 32), [tile], frames=4, clock=FakeClock())
+    # Four renders between two clock reads: a quarter millisecond each.
+    self.assertAlmostEqual(small.stages['render'], 0.00025)
+    self.assertAlmostEqual(large.stages['render'], 0.001)
+
+  def testFrameTime(self):
+    """ Ensure optional stages only count when enabled. """
+    costs = capacity_planner.RenderCosts((64, 32), {
+        'render': 0.004, 'composite': 0.001, 'color_correction': 0.002,
+        'dither': 0.003})
+    self.assertAlmostEqual(costs.GetFrameTime(), 0.005)
+    self.assertAlmostEqual(costs.GetFrameTime(True, True), 0.010)
+    self.assertAlmostEqual(costs.GetMaxFps(dither=True), 125)
+
+
+class TestRecommendation(unittest.TestCase):
+  """ Test recommending settings. """
+
+  def setUp(self):
+    """ Initalize Recommendation test setup. """
+    self.costs = capacity_planner.RenderCosts((128, 32), {
+        'render': 0.008, 'composite': 0.001, 'color_correction': 0.001,
+        'dither': 0.001})
+
+  def testFullDepth(self):
+    """ Ensure short chains keep full PWM depth without dithering. """
+    recommendation = capacity_planner.Recommendation(32, 1, 2, 120)
+    self.assertTrue(recommendation.feasible)
+    self.assertFalse(recommendation.dither)
+    self.assertEqual(recommendation.model.pwm_bits, 11)
+    self.assertEqual(recommendation.GetArguments(),
+                     '--led-rows 32 --chain-length 1 --write-cycles 2')
+
+  def testDithered(self):
+    """ Ensure long chains are dithered to reach the target refresh rate. """
+    recommendation = capacity_planner.Recommendation(
+        32, 4, 2, 500, self.costs, fps=20)
+    self.assertTrue(recommendation.dither)
+    self.assertLessEqual(recommendation.model.pwm_bits, 8)
+    self.assertGreaterEqual(recommendation.refresh_rate, 500)
+    self.assertIn('--pwm-bits %d' % recommendation.model.pwm_bits,
+                  recommendation.GetArguments())
+    self.assertAlmostEqual(recommendation.max_fps, 100)
+    self.assertAlmostEqual(recommendation.load, 0.2)
+
+  def testEightBitsNotDithered(self):
+    """ Ensure 8 bit frames, passed through, do not count the dither cost.
+    """
+    recommendation = capacity_planner.Recommendation(
+        32, 4, 2, 400, self.costs, fps=20)
+    self.assertTrue(recommendation.dither)
+    self.assertEqual(recommendation.model.pwm_bits, 8)
+    self.assertIn('--pwm-bits 8', recommendation.GetArguments())
+    self.assertAlmostEqual(recommendation.max_fps, 1 / 0.009)
+    self.assertAlmostEqual(recommendation.load, 0.18)
+
+  def testInfeasible(self):
+    """ Ensure the longest usable chain is reported when out of reach. """
+    recommendation = capacity_planner.Recommendation(32, 32, 4, 400)
+    self.assertFalse(recommendation.feasible)
+    self.assertGreater(recommendation.max_chain_length, 0)
+    self.assertGreaterEqual(capacity_planner.PanelModel(
+        32, recommendation.max_chain_length, 4, 5).GetRefreshRate(), 400)
+    self.assertLess(capacity_planner.PanelModel(
+        32, recommendation.max_chain_length + 1, 4, 5).GetRefreshRate(), 400)
+
+  def testInvalidTarget(self):
+    """ Ensure non-positive target refresh rates are rejected. """
+    for target in (0, -100):
+      with self.assertRaises(Exception):
+        capacity_planner.Recommendation(32, 2, 2, target)
+
+  def testChainLengthCapped(self):
+    """ Ensure the longest usable chain search stops. """
+    recommendation = capacity_planner.Recommendation(32, 1, 2, 1)
+    self.assertEqual(recommendation.max_chain_length,
+                     capacity_planner.Recommendation.MAX_CHAIN_LENGTH)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,115 @@
+#
+# Clocks for Tile Manager and time-sensitive tiles.
+#
+# TileManager paces frames and route/departures tiles color their stops from
+# a clock object instead of calling time and datetime directly. The real clock
+# is used by default. A virtual clock only advances when slept on or advanced
+# explicitly, so a whole day of departures can be displayed in seconds:
+#
+#   clock = clocks.VirtualClock(datetime.datetime(2017, 7, 3, 6, 0,
+#                                                 tzinfo=pytz.utc))
+#   manager = tile_manager.TileManager(tiles, 32, 2, fps=1, clock=clock)
+#   while clock.GetElapsed() < 24 * 60 * 60:
+#     manager._RenderFrame()
+#
+
+import datetime
+import threading
+import time
+
+
+class RealClock(object):
+  """ Wall clock time, sleeping for real. """
+
+  def Time(self):
+    """ Returns Float seconds since the epoch. """
+    return time.time()
+
+  def Sleep(self, seconds):
+    """ Wait for a number of seconds.
+
+    Args:
+      seconds: Float seconds to wait.
+    """
+    time.sleep(seconds)
+
+  def Now(self, timezone):
+    """ Returns datetime timezone aware current time.
+
+    Args:
+      timezone: tzinfo (e.g. pytz.timezone) to return the time in.
+    """
+    return datetime.datetime.now(timezone)
+
+
+class VirtualClock(RealClock):
+  """ Simulated time, advancing instantly when slept on.
+
+  Attributes:
+    start: Float seconds since the epoch the clock started at.
+    sleeps: Integer number of Sleep() calls.
+  """
+
+  def __init__(self, start=None):
+    """ Initalize virtual clock.
+
+    Args:
+      start: datetime timezone aware time, or Float seconds since the epoch,
+          the clock starts at. Default: None (the current time).
+    """
+    if start is None:
+      start = time.time()
+    elif isinstance(start, datetime.datetime):
+      start = start.timestamp()
+    self.start = float(start)
+    self.sleeps = 0
+    self._time = self.start
+    self._lock = threading.Lock()
+
+  def Time(self):
+    """ Returns Float simulated seconds since the epoch. """
+    with self._lock:
+      return self._time
+
+  def Advance(self, seconds):
+    """ Move the clock forward.
+
+    Args:
+      seconds: Float seconds to move forward.
+
+    Raises:
+      Exception if seconds is negative; the clock is monotonic.
+    """
+    if seconds < 0:
+      raise Exception('VirtualClock: cannot go back %s seconds.' % seconds)
+    with self._lock:
+      self._time += seconds
+
+  def Sleep(self, seconds):
+    """ Advance the clock by a number of seconds, without waiting.
+
+    Args:
+      seconds: Float seconds to advance.
+    """
+    self.sleeps += 1
+    self.Advance(max(0.0, seconds))
+
+  def Now(self, timezone):
+    """ Returns datetime timezone aware simulated time.
+
+    Args:
+      timezone: tzinfo (e.g. pytz.timezone) to return the time in.
+    """
+    return datetime.datetime.fromtimestamp(self.Time(), timezone)
+
+  def GetElapsed(self):
+    """ Returns Float simulated seconds since the clock started. """
+    return self.Time() - self.start
+
+
+_CLOCK = RealClock()
+
+
+def GetClock():
+  """ Returns RealClock shared by everything not given a clock. """
+  return _CLOCK
@@ -0,0 +1,107 @@
+#
+# Clocks unittest.
+#
+
+import base_tile
+import clocks
+import datetime
+import pickle
+import pytz
+import route
+import tile_manager
+import unittest
+
+TIMEZONE = pytz.timezone('America/Los_Angeles')
+START = TIMEZONE.localize(datetime.datetime(2017, 7, 3, 8, 0))
+
+
+class TestVirtualClock(unittest.TestCase):
+  """ Test simulated time. """
+
+  def setUp(self):
+    """ Initalize VirtualClock test setup. """
+    self.clock = clocks.VirtualClock(START)
+
+  def testSleepAdvances(self):
+    """ Ensure sleeping advances the clock instantly. """
+    self.clock.Sleep(90)
+    self.clock.Sleep(-5)
+    self.assertEqual(self.clock.GetElapsed(), 90)
+    self.assertEqual(self.clock.sleeps, 2)
+    self.assertEqual(self.clock.Now(TIMEZONE),
+                     START + datetime.timedelta(seconds=90))
+    self.assertEqual(self.clock.Now(pytz.utc).hour, 15)
+
+  def testMonotonic(self):
+    """ Ensure the clock cannot go back. """
+    with self.assertRaises(Exception):
+      self.clock.Advance(-1)
+
+  def testRealClock(self):
+    """ Ensure the real clock is the default for tiles. """
+    self.assertIs(base_tile.BaseTile.CLOCK, clocks.GetClock())
+    self.assertEqual(clocks.GetClock().Now(TIMEZONE).tzinfo.zone,
+                     TIMEZONE.zone)
+
+  def testTilePickle(self):
+    """ Ensure tiles with a virtual clock can be pickled. """
+    tile = base_tile.BaseTile()
+    tile.SetClock(self.clock)
+    copy = pickle.loads(pickle.dumps(tile))
+    self.assertIs(copy.CLOCK, clocks.GetClock())
+
+
+class TestSimulation(unittest.TestCase):
+  """ Test running TileManager faster than real time. """
+
+  def setUp(self):
+    """ Initalize a tile manager on a virtual clock. """
+    self.clock = clocks.VirtualClock(START)
+    self.tile = route.RouteTile32x32(
+        route_name='N', stops=[START + datetime.timedelta(minutes=30)])
+    self.manager = tile_manager.TileManager([self.tile], 32, 2, fps=2,
+                                            clock=self.clock)
+
+  def _Run(self, seconds, frame_callback=None):
+    """ Display the tiles looping for a number of simulated seconds. """
+    while self.clock.GetElapsed() < seconds:
+      self.manager._RenderFrame()
+      if frame_callback:
+        frame_callback()
+      if self.manager._AllTilesDisplayed():
+        self.manager._ResetTiles()
+        self.manager.render_pipeline = self.manager.matrix.shape
+
+  def testTilesUseManagerClock(self):
+    """ Ensure the manager sets its clock on the tiles. """
+    self.assertIs(self.tile.CLOCK, self.clock)
+    self.assertEqual(self.tile._Now(), START)
+
+  def testNoDrift(self):
+    """ Ensure frames are paced exactly at the frame rate. """
+    frames = []
+    self._Run(600, lambda: frames.append(self.clock.GetElapsed()))
+    self.assertEqual(len(frames), 1201)
+    self.assertEqual(frames[-1], 600.0)
+
+  def testColorTransitions(self):
+    """ Ensure stops change color when due, then depart. """
+    changes = []
+
+    def Record():
+      fills = self.tile._fills
+      if not changes or changes[-1][1] != fills:
+        changes.append((self.clock.GetElapsed(), fills))
+
+    self._Run(31 * 60, Record)
+    # Recorded after each frame's sleep: the first frame rendered past a
+    # change, half a second later, is recorded a second after it.
+    self.assertEqual(changes, [(0.0, (base_tile.GREEN,)),
+                               (20 * 60 + 1.0, (base_tile.YELLOW,)),
+                               (25 * 60 + 1.0, (base_tile.RED,)),
+                               (30 * 60 + 1.0, ())])
+    self.assertEqual(self.tile.stops, [])
+
+
+if __name__ == '__main__':
+  unittest.main()
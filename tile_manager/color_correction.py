@@ -0,0 +1,139 @@
+#
+# Color correction stage for the LED RGB Matrix Display.
+#
+# Panels from different batches have different color balance, and dimming for
+# night mode needs to be applied to every pixel pushed to the matrix. Instead
+# of doing this per pixel in Python, a single 3x256 lookup table is
+# precomputed and applied with Image.point() which walks the image once in C.
+#
+
+import threading
+
+
+class ColorCorrection(object):
+  """ Applies gamma, per-channel gain and global brightness to a frame.
+
+  The lookup table is a flat list of 768 entries (256 red, 256 green, 256
+  blue), the format expected by Image.point() for RGB images. For a given
+  channel c and input value v the output is:
+
+    255 * brightness * gain[c] * (v / 255) ** gamma
+
+  The table is only rebuilt when a setting changes. A new table is built
+  first and then swapped in with a single assignment, so brightness can be
+  changed from another thread while the render loop is running without
+  locking the render loop or stuttering.
+
+  Attributes:
+    gamma: Float gamma exponent applied to all channels. Default: 1.0.
+    gains: Tuple (Float: R, Float: G, Float: B) per-channel gain for panel
+        color balance. Default: (1.0, 1.0, 1.0).
+    brightness: Float global brightness, 0.0 (off) to 1.0 (full).
+        Default: 1.0.
+  """
+
+  def __init__(self, gamma=1.0, gains=(1.0, 1.0, 1.0), brightness=1.0):
+    """ Initalize color correction stage.
+
+    Args:
+      gamma: Float gamma exponent applied to all channels. Default: 1.0.
+      gains: Tuple (Float: R, Float: G, Float: B) per-channel gain.
+          Default: (1.0, 1.0, 1.0).
+      brightness: Float global brightness, 0.0 to 1.0. Default: 1.0.
+
+    Raises:
+      Exception if any setting is out of range.
+    """
+    self._lock = threading.Lock()
+    self.gamma = None
+    self.gains = None
+    self.brightness = None
+    self._table = (None, True)
+    self.Configure(gamma=gamma, gains=gains, brightness=brightness)
+
+  def _BuildTable(self, gamma, gains, brightness):
+    """ Returns a 768 entry lookup table for the given settings.
+
+    Args:
+      gamma: Float gamma exponent.
+      gains: Tuple (Float: R, Float: G, Float: B) per-channel gain.
+      brightness: Float global brightness.
+
+    Returns:
+      List of 768 Integers in the range 0-255.
+    """
+    curve = [(v / 255.0) ** gamma for v in range(256)]
+    lut = []
+    for gain in gains:
+      scale = 255.0 * brightness * gain
+      lut.extend(min(255, int(round(scale * c))) for c in curve)
+    return lut
+
+  def Configure(self, gamma=None, gains=None, brightness=None):
+    """ Change one or more settings, rebuilding the table if needed.
+
+    Settings not specified are left unchanged. If no setting actually changes
+    the existing table is kept.
+
+    Args:
+      gamma: Float gamma exponent. Default: None (unchanged).
+      gains: Tuple (Float: R, Float: G, Float: B) per-channel gain.
+          Default: None (unchanged).
+      brightness: Float global brightness, 0.0 to 1.0. Default: None
+          (unchanged).
+
+    Raises:
+      Exception if any setting is out of range.
+    """
+    with self._lock:
+      gamma = self.gamma if gamma is None else float(gamma)
+      gains = self.gains if gains is None else tuple(float(g) for g in gains)
+      brightness = (self.brightness if brightness is None
+                    else float(brightness))
+      if gamma <= 0:
+        raise Exception('ColorCorrection: gamma must be positive.')
+      if len(gains) != 3 or min(gains) < 0:
+        raise Exception('ColorCorrection: gains must be 3 non-negative values.')
+      if not 0.0 <= brightness <= 1.0:
+        raise Exception('ColorCorrection: brightness must be 0.0 - 1.0.')
+      if (gamma, gains, brightness) == (self.gamma, self.gains,
+                                        self.brightness):
+        return
+      lut = self._BuildTable(gamma, gains, brightness)
+      identity = lut == list(range(256)) * 3
+      (self.gamma, self.gains, self.brightness) = (gamma, gains, brightness)
+      self._table = (lut, identity)
+
+  def SetBrightness(self, brightness):
+    """ Change the global brightness at runtime.
+
+    Args:
+      brightness: Float global brightness, 0.0 to 1.0.
+    """
+    self.Configure(brightness=brightness)
+
+  def GetTable(self):
+    """ Returns List of 768 Integers for the current lookup table. """
+    return self._table[0]
+
+  def IsIdentity(self):
+    """ Boolean True if the current table does not change any pixel. """
+    return self._table[1]
+
+  def Apply(self, image):
+    """ Apply color correction to a frame.
+
+    The source image is never modified, as it is the compositing buffer the
+    next frame is drawn into.
+
+    Args:
+      image: PIL.Image RGB frame to correct.
+
+    Returns:
+      PIL.Image corrected frame. This is the source image if the current
+      table would not change any pixel.
+    """
+    (lut, identity) = self._table
+    if identity:
+      return image
+    return image.point(lut)
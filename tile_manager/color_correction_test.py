@@ -0,0 +1,74 @@
+#
+# Color correction unittest.
+#
+
+import color_correction
+import unittest
+from PIL import Image
+
+
+class TestColorCorrection(unittest.TestCase):
+  """ Test the color correction lookup table stage. """
+
+  def setUp(self):
+    """ Initalize ColorCorrection test setup. """
+    self.correction = color_correction.ColorCorrection()
+    self.image = Image.new('RGB', (4, 4), (200, 100, 50))
+
+  def testDefaultIsIdentity(self):
+    """ Ensure default settings do not touch the frame. """
+    self.assertTrue(self.correction.IsIdentity())
+    self.assertEqual(len(self.correction.GetTable()), 768)
+    self.assertIs(self.correction.Apply(self.image), self.image)
+
+  def testBrightness(self):
+    """ Ensure brightness scales all channels. """
+    self.correction.SetBrightness(0.5)
+    self.assertFalse(self.correction.IsIdentity())
+    result = self.correction.Apply(self.image)
+    self.assertEqual(result.getpixel((0, 0)), (100, 50, 25))
+    self.assertEqual(self.image.getpixel((0, 0)), (200, 100, 50))
+
+  def testGains(self):
+    """ Ensure per-channel gains are applied to the correct channel. """
+    self.correction.Configure(gains=(1.0, 0.5, 0.0))
+    result = self.correction.Apply(self.image)
+    self.assertEqual(result.getpixel((3, 3)), (200, 50, 0))
+
+  def testGainsClamped(self):
+    """ Ensure gains above 1.0 are clamped to the channel maximum. """
+    self.correction.Configure(gains=(2.0, 2.0, 2.0))
+    result = self.correction.Apply(self.image)
+    self.assertEqual(result.getpixel((0, 0)), (255, 200, 100))
+
+  def testGamma(self):
+    """ Ensure gamma keeps the end points and darkens the midtones. """
+    self.correction.Configure(gamma=2.2)
+    table = self.correction.GetTable()
+    self.assertEqual(table[0], 0)
+    self.assertEqual(table[255], 255)
+    self.assertLess(table[128], 128)
+
+  def testTableOnlyRebuiltOnChange(self):
+    """ Ensure the table is kept when settings do not change. """
+    self.correction.SetBrightness(0.5)
+    table = self.correction.GetTable()
+    self.correction.SetBrightness(0.5)
+    self.assertIs(self.correction.GetTable(), table)
+    self.correction.SetBrightness(0.25)
+    self.assertIsNot(self.correction.GetTable(), table)
+
+  def testInvalidSettings(self):
+    """ Ensure out of range settings are rejected. """
+    with self.assertRaises(Exception):
+      self.correction.SetBrightness(1.5)
+    with self.assertRaises(Exception):
+      self.correction.Configure(gamma=0)
+    with self.assertRaises(Exception):
+      self.correction.Configure(gains=(1.0, 1.0))
+    with self.assertRaises(Exception):
+      self.correction.Configure(gains=(1.0, -0.5, 1.0))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,184 @@
+#
+# Departures Board Tile for Tile Manager.
+#
+# One tile showing the next departures of many routes, one route per row,
+# scrolling through all the routes:
+#
+#   [route] [stop1] [stop2]
+#   [route] [stop1] [stop2]
+#   [route] [stop1] [stop2]
+#
+# Rows are only rasterized when they scroll into view (or change color), and
+# are dropped once they scroll out, so memory and per-frame work depend on
+# the tile size, not on the number of routes.
+#
+
+import base_tile
+import bisect
+import route
+from PIL import ImageDraw
+
+
+class AbstractDeparturesTile(base_tile.BaseTile):
+  """ Abstract departures board tile, scrolling through many routes.
+
+  Stops are colored the same as route tiles. The tile and its rows are
+  palette-indexed, see BaseTile.
+
+  Attributes:
+    SHORT_TIME: datetime.timedelta stops departing sooner are colored red.
+        Default: route.SHORT_TIME.
+    LONG_TIME: datetime.timedelta stops departing sooner are colored yellow.
+        Default: route.LONG_TIME.
+    TIME_FORMAT: String datetime strftime format for stops.
+        Default: route.AbstractRouteTile.TIME_FORMAT.
+    TIME_ZONE: pytz.timezone timezone to display time in.
+        Default: route.AbstractRouteTile.TIME_ZONE.
+    ROW_HEIGHT: Integer height of a route row, in pixels. Default: 11.
+    NAME_WIDTH: Integer width reserved for route names, in pixels.
+        Default: 14.
+    rasterized_rows: Integer number of rows rasterized since created.
+  """
+  SHORT_TIME = route.SHORT_TIME
+  LONG_TIME = route.LONG_TIME
+  TIME_FORMAT = route.AbstractRouteTile.TIME_FORMAT
+  TIME_ZONE = route.AbstractRouteTile.TIME_ZONE
+  ROW_HEIGHT = 11
+  NAME_WIDTH = 14
+  BUFFER_MODE = 'P'
+
+  def __init__(self, routes=None, x=0, y=0, scrolling=(0, -1)):
+    """ Initalize departures tile object.
+
+    Args:
+      routes: List of Tuple (String: route name, List: datetime timezone
+          aware stops) to display. Default: None (no routes).
+      x: Integer absolute X position of tile. Default: 0.
+      y: Integer absolute Y position of tile. Default: 0.
+      scrolling: Tuple (Integer: X, Integer: Y) containing scrolling
+          information. Default: (0, -1) (scroll up).
+    """
+    base_tile.BaseTile.__init__(self, x, y, scrolling)
+    self.rasterized_rows = 0
+    self._stop_width = self.FONT.getsize(
+        self._Now().strftime(self.TIME_FORMAT))[0] + 3
+    self.SetRoutes(routes or [])
+
+  def _Now(self):
+    """ Returns datetime timezone aware current time. """
+    return self.CLOCK.Now(self.TIME_ZONE)
+
+  def SetRoutes(self, routes):
+    """ Replace all displayed routes.
+
+    Args:
+      routes: List of Tuple (String: route name, List: datetime timezone
+          aware stops).
+    """
+    self._routes = [(name, sorted(stops)) for (name, stops) in routes]
+    self._rows = {}
+    if self.scrolling[1]:
+      self._max_frame_count = None
+
+  def SetStops(self, route_name, stops):
+    """ Replace the stops of one route, adding the route if new.
+
+    Only that route's row is rasterized again.
+
+    Args:
+      route_name: String route name.
+      stops: List of datetime timezone aware stops.
+    """
+    for (index, (name, old_stops)) in enumerate(self._routes):
+      if name == route_name:
+        self._routes[index] = (name, sorted(stops))
+        self._rows.pop(index, None)
+        return
+    self._routes.append((route_name, sorted(stops)))
+    if self.scrolling[1]:
+      self._max_frame_count = None
+
+  def OnHide(self):
+    """ Release the image buffer and the rasterized rows. """
+    base_tile.BaseTile.OnHide(self)
+    self._rows = {}
+
+  def _GetRenderSize(self):
+    """ Returns Tuple (Integer: X, Integer: Y) size of all route rows. """
+    return (self.TILE_WIDTH, len(self._routes) * self.ROW_HEIGHT)
+
+  def _RasterizeRow(self, index, now):
+    """ Render one route row, dropping departed stops.
+
+    Args:
+      index: Integer route index.
+      now: datetime timezone aware current time.
+
+    Returns:
+      Tuple (PIL.Image: row, datetime: next instant a displayed stop changes
+      color or departs, or None).
+    """
+    (name, stops) = self._routes[index]
+    del stops[:bisect.bisect_left(stops, now)]
+    row = self._NewImage((self.TILE_WIDTH, self.ROW_HEIGHT))
+    draw = ImageDraw.Draw(row)
+    draw.text((0, self.FONT_Y_OFFSET), '%s ' % name, font=self.FONT,
+              fill=base_tile.WHITE)
+    draw.rectangle((self.NAME_WIDTH, 0, self.TILE_WIDTH, self.ROW_HEIGHT),
+                   fill=base_tile.BLACK)
+    next_change = None
+    x = self.NAME_WIDTH
+    for stop in stops:
+      if x >= self.TILE_WIDTH:
+        break
+      fill = route.GetStopFill(stop, now, self.SHORT_TIME, self.LONG_TIME)
+      draw.text((x, self.FONT_Y_OFFSET),
+                '%s ' % stop.astimezone(tz=self.TIME_ZONE)
+                            .strftime(self.TIME_FORMAT),
+                font=self.FONT, fill=fill)
+      x += self._stop_width
+      for change in (stop - self.LONG_TIME, stop - self.SHORT_TIME, stop):
+        if change >= now:
+          if next_change is None or change < next_change:
+            next_change = change
+          break
+    self.rasterized_rows += 1
+    return (row, next_change)
+
+  def GetVisibleRows(self):
+    """ Returns range of Integer route indexes currently in view. """
+    first = max(0, -self.y // self.ROW_HEIGHT)
+    last = min(len(self._routes),
+               -((self.y - self.TILE_HEIGHT) // self.ROW_HEIGHT))
+    return range(first, max(first, last))
+
+  def Render(self):
+    """ Returns Image buffer for tile to render.
+
+    Render can be called multiple times, but it is not garanteed that a
+    specific time has elapsed; meaning you have would have to determine
+    to advance the frame before rendering.
+
+    Returns:
+      Image containing rendered tile to display.
+    """
+    self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
+                                fill=base_tile.BLACK)
+    now = self._Now()
+    visible = self.GetVisibleRows()
+    for index in list(self._rows):
+      if index not in visible:
+        del self._rows[index]
+    for index in visible:
+      row = self._rows.get(index)
+      if row is None or (row[1] is not None and now > row[1]):
+        row = self._rows[index] = self._RasterizeRow(index, now)
+      self._image_buffer.paste(row[0],
+                               (self.x, self.y + index * self.ROW_HEIGHT))
+    self.displayed = True
+    return self._image_buffer
+
+
+class DeparturesTile64x32(AbstractDeparturesTile):
+  """ 64x32 pixel departures tile, two stops per route. """
+  TILE_WIDTH = 64
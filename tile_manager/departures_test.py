@@ -0,0 +1,126 @@
+#
+# Departures Board Tile unittest.
+#
+
+import base_tile
+import datetime
+import departures
+import pytz
+import route
+import unittest
+import unittest_tiletest
+from PIL import Image
+from PIL import ImageDraw
+
+TIMEZONE = pytz.timezone('America/Los_Angeles')
+NOW = TIMEZONE.localize(datetime.datetime(2017, 7, 3, 8, 0))
+
+
+def Routes(count):
+  """ Returns List of Tuple (String: route name, List: stops) for tests. """
+  return [('%d' % index,
+           [NOW + datetime.timedelta(minutes=minutes + index)
+            for minutes in (3, 8, 30)])
+          for index in range(count)]
+
+
+class TestDeparturesTile64x32(unittest_tiletest.TileTest):
+  """ Ensure departures board functionality works. """
+
+  def setUp(self):
+    """ Initalize DeparturesTile64x32 test setup. """
+    self.now = NOW
+    self.tile = departures.DeparturesTile64x32(Routes(100))
+    self.tile._Now = lambda: self.now
+
+  def Reference(self, routes):
+    """ Returns PIL.Image of every route row, drawn without virtualization. """
+    tile = self.tile
+    image = Image.new('RGB', (tile.TILE_WIDTH, len(routes) * tile.ROW_HEIGHT))
+    draw = ImageDraw.Draw(image)
+    for (index, (name, stops)) in enumerate(routes):
+      y = index * tile.ROW_HEIGHT + tile.FONT_Y_OFFSET
+      draw.text((0, y), '%s ' % name, font=tile.FONT, fill=base_tile.WHITE)
+      for (column, stop) in enumerate(stops[:2]):
+        draw.text((tile.NAME_WIDTH + column * tile._stop_width, y),
+                  '%s ' % stop.strftime('%H:%M'), font=tile.FONT,
+                  fill=route.GetStopFill(stop, self.now))
+    return image
+
+  def testGetRenderSize(self):
+    """ Ensure the render size covers every route. """
+    self.assertEqual(self.tile._GetRenderSize(), (64, 1100))
+    self.assertEqual(self.tile.GetMaxFrames(), 1100)
+
+  def testRenderMatchesReference(self):
+    """ Ensure scrolled frames match drawing every route at once. """
+    routes = Routes(6)
+    self.tile.SetRoutes(routes)
+    reference = self.Reference(routes)
+    for frame in range(self.tile.GetMaxFrames()):
+      expected = Image.new('RGB', (64, 32))
+      expected.paste(reference, (0, self.tile.y))
+      image = self.tile.Render()
+      self.assertEqual(image.mode, 'P')
+      self.assertEqual(image.convert('RGB').tobytes(), expected.tobytes())
+      self.tile.StepFrame()
+
+  def testConstantWorkPerFrame(self):
+    """ Ensure only rows entering the view are rasterized. """
+    for frame in range(self.tile.GetMaxFrames()):
+      self.tile.Render()
+      self.assertLessEqual(len(self.tile._rows), 4)
+      self.tile.StepFrame()
+    self.assertEqual(self.tile.rasterized_rows, 100)
+
+  def testGetVisibleRows(self):
+    """ Ensure partially visible rows are in view. """
+    self.assertEqual(self.tile.GetVisibleRows(), range(0, 3))
+    self.tile.y = -1
+    self.assertEqual(self.tile.GetVisibleRows(), range(0, 3))
+    self.tile.y = -2
+    self.assertEqual(self.tile.GetVisibleRows(), range(0, 4))
+    self.tile.y = -11
+    self.assertEqual(self.tile.GetVisibleRows(), range(1, 4))
+    self.tile.y = -1095
+    self.assertEqual(self.tile.GetVisibleRows(), range(99, 100))
+    self.tile.y = 40
+    self.assertEqual(self.tile.GetVisibleRows(), range(0, 0))
+
+  def testRerasterizeOnColorChange(self):
+    """ Ensure rows are only rasterized again when a stop changes color. """
+    self.tile.Render()
+    self.assertEqual(self.tile.rasterized_rows, 3)
+    self.tile.Render()
+    self.assertEqual(self.tile.rasterized_rows, 3)
+    # Route 2 departs in 5 minutes, turning red.
+    self.now += datetime.timedelta(seconds=30)
+    self.tile.Render()
+    self.assertEqual(self.tile.rasterized_rows, 4)
+    self.now += datetime.timedelta(minutes=1)
+    self.tile.Render()
+    self.assertEqual(self.tile.rasterized_rows, 4)
+    # Route 0 departs.
+    self.now = NOW + datetime.timedelta(minutes=3, seconds=1)
+    self.tile.Render()
+    self.assertEqual(self.tile.rasterized_rows, 5)
+    self.assertEqual(len(self.tile._routes[0][1]), 2)
+
+  def testSetStops(self):
+    """ Ensure updating one route only rasterizes its row again. """
+    self.tile.Render()
+    self.tile.SetStops('1', [NOW + datetime.timedelta(minutes=20)])
+    self.tile.Render()
+    self.assertEqual(self.tile.rasterized_rows, 4)
+    self.tile.SetStops('new', [])
+    self.assertEqual(self.tile._GetRenderSize(), (64, 1111))
+
+  def testRender(self):
+    """ Ensure render works properly. """
+    image = self.tile.Render()
+    self.assertTrue(self.tile.displayed)
+    self.assertIsInstance(image, Image.Image)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,564 @@
+#
+# Multi-node sharded display coordinator for Tile Manager.
+#
+# Large installations span several Pi's, each driving its own panels. Instead
+# of each Pi running an independent TileManager with its own drifting timing,
+# one coordinator owns a single logical render pipeline spanning all nodes
+# (left to right) and drives them with a shared frame clock:
+#
+#   coordinator = display_coordinator.DisplayCoordinator(
+#       tiles, [('10.0.0.20', 9998), ('10.0.0.21', 9998)], 32, 2,
+#       key=open('/etc/rgb-matrix-display.key', 'rb').read().strip())
+#   coordinator.Run(loop=True)
+#
+#   (on each Pi)
+#   python display_coordinator.py --host 0.0.0.0 --port 9998 \
+#       --key-file /etc/rgb-matrix-display.key --led-rows 32 --chain-length 2
+#
+# Tiles are placed by the standard TileManager logic on the logical pipeline.
+# A tile is sent (pickled) to a node once, the first time it is placed on
+# that node's columns. Every frame the coordinator broadcasts a tick with the
+# frame index, the pixel layout with each visible tile's frame and a swap
+# deadline.
+# Nodes step their tile copies to that frame, render their columns and swap
+# the buffer to the panels at the deadline, then acknowledge. The coordinator
+# waits for all acknowledgements before starting the next frame, so nodes can
+# never drift apart by more than one frame.
+#
+# Tiles are pickled, so every message is signed with an HMAC of a key shared
+# by the coordinator and its nodes; nodes drop connections sending a message
+# with a bad signature before anything in it is loaded. Nodes only listen on
+# localhost unless given another address.
+#
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import pickle
+import socket
+import struct
+import threading
+import tile_manager
+import time
+
+MESSAGE = struct.Struct('!BI')
+DIGEST_SIZE = hashlib.sha256().digest_size
+HELLO = 1
+TILE = 2
+TICK = 3
+ACK = 4
+BYE = 5
+
+
+def _Sign(key, message):
+  """ Returns bytes HMAC-SHA256 digest of a message with a shared key. """
+  return hmac.new(key, message, hashlib.sha256).digest()
+
+
+def SendMessage(connection, key, message_type, payload):
+  """ Send a length prefixed, signed message.
+
+  Args:
+    connection: socket.socket connected stream socket.
+    key: bytes key shared by the coordinator and its nodes.
+    message_type: Integer message type.
+    payload: bytes message payload.
+  """
+  message = MESSAGE.pack(message_type, len(payload)) + payload
+  connection.sendall(message + _Sign(key, message))
+
+
+def _ReadExactly(connection, size):
+  """ Returns bytes read from a stream socket, or None if it closed. """
+  chunks = []
+  while size:
+    chunk = connection.recv(size)
+    if not chunk:
+      return None
+    chunks.append(chunk)
+    size -= len(chunk)
+  return b''.join(chunks)
+
+
+def ReceiveMessage(connection, key):
+  """ Returns Tuple (Integer: type, bytes: payload), or (None, None) on close.
+
+  Args:
+    connection: socket.socket connected stream socket.
+    key: bytes key shared by the coordinator and its nodes.
+
+  Raises:
+    Exception if the message is not signed with the key.
+  """
+  header = _ReadExactly(connection, MESSAGE.size)
+  if header is None:
+    return (None, None)
+  (message_type, length) = MESSAGE.unpack(header)
+  payload = _ReadExactly(connection, length + DIGEST_SIZE)
+  if payload is None:
+    return (None, None)
+  (payload, digest) = (payload[:length], payload[length:])
+  if not hmac.compare_digest(digest, _Sign(key, header + payload)):
+    raise Exception('ReceiveMessage: bad message signature.')
+  return (message_type, payload)
+
+
+def _CheckKey(name, key):
+  """ Raises Exception if a shared key is missing or not bytes. """
+  if not key or not isinstance(key, bytes):
+    raise Exception('%s: a shared key (bytes) is required.' % name)
+
+
+def IterateLayout(render_pipeline, tiles, tile_size):
+  """ Yields the pixel position of every tile in a render pipeline.
+
+  Large tiles span several pipeline slots, but are only yielded once.
+
+  Args:
+    render_pipeline: List of Lists (matrix) of tile indexes, see TileManager.
+    tiles: List of BaseTile objects indexed by the pipeline.
+    tile_size: Integer pipeline slot size in pixels.
+
+  Yields:
+    Tuple (Integer: tile index, Integer: X, Integer: Y, Integer: width). The
+    tile index may be -1 for a blank slot.
+  """
+  for y_index, y_list in enumerate(render_pipeline):
+    y = y_index * tile_size
+    last_tile_index = None
+    for x_index, tile_index in enumerate(y_list):
+      if tile_index is None or tile_index == last_tile_index != -1:
+        continue
+      last_tile_index = tile_index
+      width = tile_size
+      if tile_index != -1:
+        width = tiles[tile_index].GetTileDiemensions()[0]
+      yield (tile_index, x_index * tile_size, y, width)
+
+
+class LogicalMatrix(object):
+  """ Matrix shape spanning all nodes, used by TileManager for layout.
+
+  Nothing is drawn on the coordinator, so this only provides the geometry
+  of MatrixInterface.
+
+  Attributes:
+    node_width: Integer width of a single node's matrix, in pixels.
+    node_count: Integer number of nodes, left to right.
+    width: Integer width of the entire logical screen, in pixels.
+    height: Integer height of the entire logical screen, in pixels.
+    tile_size: Integer minimum square tile size in pixels.
+  """
+
+  def __init__(self, node_width, height, node_count, tile_size):
+    """ Initalize logical matrix.
+
+    Args:
+      node_width: Integer width of a single node's matrix, in pixels.
+      height: Integer height of a node's matrix, in pixels.
+      node_count: Integer number of nodes.
+      tile_size: Integer minimum square tile size in pixels.
+    """
+    self.node_width = node_width
+    self.node_count = node_count
+    self.width = node_width * node_count
+    self.height = height
+    self.tile_size = tile_size
+
+  @property
+  def shape(self):
+    """ List of Lists (matrix) of None, the empty logical pipeline. """
+    return [[None for i in range(int(self.width / self.tile_size))]
+            for i in range(int(self.height / self.tile_size))]
+
+  def NodesForSpan(self, x, width):
+    """ Returns List of Integer node indexes a horizontal span is shown on.
+
+    Args:
+      x: Integer logical X position of the span.
+      width: Integer width of the span.
+    """
+    first = max(0, int(x / self.node_width))
+    last = min(self.node_count - 1, int((x + width - 1) / self.node_width))
+    return list(range(first, last + 1))
+
+  def FillScreen(self, fill=(0, 0, 0)):
+    """ Nodes clear their own screens when they connect. """
+    pass
+
+  def Render(self):
+    """ Nodes render their own screens on each tick. """
+    pass
+
+
+class DisplayCoordinator(tile_manager.TileManager):
+  """ Drives one logical render pipeline across several display nodes.
+
+  Every node must have the same panel geometry; nodes are placed left to
+  right in the order given.
+
+  Attributes:
+    nodes: List of Tuples (String: host, Integer: port) for each node.
+    swap_delay: Float seconds between sending a tick and the nodes swapping
+        buffers. This must cover rendering and network latency. Default: 0.05.
+    ack_timeout: Float seconds to wait for a node to acknowledge a frame.
+        Default: 5.
+    frame: Integer index of the last frame sent to the nodes.
+  """
+
+  def __init__(self, tiles, nodes, led_rows=32, chain_length=2,
+               tile_size=None, fps=1, static_lifespan=5, swap_delay=0.05,
+               ack_timeout=5, key=None):
+    """ Initalize display coordinator.
+
+    Args:
+      tiles: List of BaseTile subclassed objects with data to display.
+      nodes: List of Tuples (String: host, Integer: port) for each node, left
+          to right.
+      led_rows: Integer size of each node's RGB matrix panel. Default: 32.
+      chain_length: Integer number of matrix's attached to each node.
+          Default: 2.
+      tile_size: Integer minimum square tile size in pixels. Default: None
+          (same as led_rows).
+      fps: Integer max number of frames to render a second. Default: 1.
+      static_lifespan: Integer number of seconds a static tile should be
+          displayed. Default: 5 seconds.
+      swap_delay: Float seconds from tick to buffer swap. Default: 0.05.
+      ack_timeout: Float seconds to wait for frame acknowledgements.
+          Default: 5.
+      key: bytes key shared with the nodes, signing every message.
+
+    Raises:
+      Exception if no nodes or no key are given, or a tile is larger than
+      the screen.
+    """
+    if not nodes:
+      raise Exception('DisplayCoordinator: at least one node is required.')
+    _CheckKey('DisplayCoordinator', key)
+    if led_rows == 64 or led_rows == 8:
+      (node_width, node_height) = (led_rows, led_rows)
+    else:
+      (node_width, node_height) = (led_rows * chain_length, led_rows)
+    self.nodes = list(nodes)
+    self.swap_delay = swap_delay
+    self.ack_timeout = ack_timeout
+    self.frame = 0
+    self._key = key
+    self._connections = []
+    self._clock_offsets = []
+    self._sent_tiles = []
+    matrix = LogicalMatrix(node_width, node_height, len(self.nodes),
+                           tile_size or led_rows)
+    tile_manager.TileManager.__init__(self, tiles, fps=fps,
+                                      static_lifespan=static_lifespan,
+                                      matrix=matrix)
+
+  def Connect(self):
+    """ Connect to every node and estimate its clock offset.
+
+    Raises:
+      Exception if a node does not answer the handshake.
+    """
+    for (index, (host, port)) in enumerate(self.nodes):
+      connection = socket.create_connection((host, port),
+                                            timeout=self.ack_timeout)
+      connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+      sent = time.time()
+      SendMessage(connection, self._key, HELLO, json.dumps({
+          'node': index,
+          'x_offset': index * self.matrix.node_width,
+          'tile_size': self.matrix.tile_size}).encode())
+      (message_type, payload) = ReceiveMessage(connection, self._key)
+      received = time.time()
+      if message_type != HELLO:
+        raise Exception('DisplayCoordinator: node %s:%s failed handshake.' %
+                        (host, port))
+      node_time = json.loads(payload.decode())['time']
+      self._clock_offsets.append(node_time - (sent + received) / 2.0)
+      self._connections.append(connection)
+      self._sent_tiles.append(set())
+
+  def Close(self):
+    """ Tell every node the show is over and disconnect. """
+    for connection in self._connections:
+      try:
+        SendMessage(connection, self._key, BYE, b'')
+      except (OSError, socket.error):
+        pass
+      connection.close()
+    self._connections = []
+    self._clock_offsets = []
+    self._sent_tiles = []
+
+  def UpdateTile(self, tile_index):
+    """ Re-send a tile to the nodes after its data has changed.
+
+    Args:
+      tile_index: Integer index into self.tiles.
+    """
+    for sent in self._sent_tiles:
+      sent.discard(tile_index)
+
+  def _RenderToMatrix(self):
+    """ Distribute new tiles and broadcast the frame tick to all nodes.
+
+    Raises:
+      Exception if a node disconnects or does not acknowledge the frame.
+    """
+    self.frame += 1
+    layout = []
+    for (tile_index, x, y, width) in IterateLayout(
+        self.render_pipeline, self.tiles, self.matrix.tile_size):
+      if tile_index == -1:
+        layout.append((tile_index, x, y, width, 0))
+        continue
+      layout.append((tile_index, x, y, width,
+                     self.tiles[tile_index].current_frame))
+      for node in self.matrix.NodesForSpan(x, width):
+        if tile_index not in self._sent_tiles[node]:
+          SendMessage(self._connections[node], self._key, TILE,
+                      pickle.dumps((tile_index, self.tiles[tile_index])))
+          self._sent_tiles[node].add(tile_index)
+
+    swap_at = time.time() + self.swap_delay
+    for (node, connection) in enumerate(self._connections):
+      SendMessage(connection, self._key, TICK, json.dumps({
+          'frame': self.frame,
+          'swap_at': swap_at + self._clock_offsets[node],
+          'layout': layout}).encode())
+    for (node, connection) in enumerate(self._connections):
+      (message_type, payload) = ReceiveMessage(connection, self._key)
+      if message_type != ACK:
+        raise Exception('DisplayCoordinator: node %d lost.' % node)
+      ack = json.loads(payload.decode())
+      if ack['frame'] != self.frame:
+        logging.error('DisplayCoordinator: node %d acknowledged frame %d, '
+                      'expected %d', node, ack['frame'], self.frame)
+
+  def Run(self, loop=False):
+    """ Connect to the nodes and run through all loaded tiles.
+
+    Args:
+      loop: Boolean True to loop infinitely, else loop once. Default: False.
+    """
+    if not self._connections:
+      self.Connect()
+    try:
+      tile_manager.TileManager.Run(self, loop)
+    finally:
+      self.Close()
+
+
+class DisplayNode(object):
+  """ Displays a coordinator's frames on this node's matrix.
+
+  Attributes:
+    matrix: matrix_manager.MatrixInterface for this node's panels.
+    port: Integer port listened on.
+    tiles: Dictionary of Integer tile index to BaseTile received.
+    node: Integer node index assigned by the coordinator.
+    x_offset: Integer logical X position of this node's left edge.
+    last_frame: Integer index of the last frame swapped to the matrix.
+    swap_times: List of Float times each frame was swapped, if recording.
+  """
+
+  def __init__(self, matrix, port, host='127.0.0.1', record_swaps=False,
+               key=None):
+    """ Initalize display node and bind the listening socket.
+
+    Args:
+      matrix: matrix_manager.MatrixInterface to display on.
+      port: Integer port to listen on, 0 to pick a free port.
+      host: String address to listen on, '0.0.0.0' for all.
+          Default: '127.0.0.1' (local only).
+      record_swaps: Boolean True to record (frame, swap time) for every
+          frame in swap_times. Default: False.
+      key: bytes key shared with the coordinator; messages not signed with
+          it are refused.
+
+    Raises:
+      Exception if no key is given.
+    """
+    _CheckKey('DisplayNode', key)
+    self.matrix = matrix
+    self.tiles = {}
+    self.node = None
+    self.x_offset = 0
+    self.tile_size = matrix.tile_size
+    self.last_frame = 0
+    self.swap_times = [] if record_swaps else None
+    self._key = key
+    self._running = threading.Event()
+    self._running.set()
+    self._connection = None
+    self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._socket.bind((host, port))
+    self._socket.listen(1)
+    self._socket.settimeout(0.2)
+    self.port = self._socket.getsockname()[1]
+
+  def _StepTile(self, tile, frame):
+    """ Step a tile copy to the coordinator's frame for that tile.
+
+    Args:
+      tile: BaseTile to step.
+      frame: Integer target current_frame.
+    """
+    if frame < tile.current_frame:
+      tile.Reset()
+    while tile.current_frame < frame:
+      tile.StepFrame()
+
+  def _Compose(self, tick):
+    """ Render this node's columns of the logical pipeline.
+
+    Args:
+      tick: Dictionary tick message from the coordinator.
+    """
+    buffer = self.matrix.offscreen_buffer
+    for (tile_index, x, y, width, frame) in tick['layout']:
+      x -= self.x_offset
+      if x + width <= 0 or x >= self.matrix.width:
+        continue
+      if tile_index == -1 or tile_index not in self.tiles:
+        self.matrix.offscreen_draw.rectangle(
+            (x, y, x + width - 1, y + self.tile_size - 1), fill=(0, 0, 0))
+        continue
+      tile = self.tiles[tile_index]
+      self._StepTile(tile, frame)
+      buffer.paste(tile.Render(), (x, y))
+
+  def _HandleTick(self, connection, tick):
+    """ Compose a frame, swap it at the deadline and acknowledge it.
+
+    Args:
+      connection: socket.socket coordinator connection.
+      tick: Dictionary tick message from the coordinator.
+    """
+    self._Compose(tick)
+    delay = tick['swap_at'] - time.time()
+    if delay > 0:
+      time.sleep(delay)
+    swapped = time.time()
+    self.matrix.Render()
+    self.last_frame = tick['frame']
+    if self.swap_times is not None:
+      self.swap_times.append((tick['frame'], swapped))
+    SendMessage(connection, self._key, ACK, json.dumps({
+        'frame': tick['frame'],
+        'late': max(0.0, swapped - tick['swap_at'])}).encode())
+
+  def ServeOnce(self):
+    """ Serve a single coordinator session until it says goodbye.
+
+    Returns:
+      Boolean True if a session was served, False if stopped first.
+    """
+    while self._running.is_set():
+      try:
+        (connection, _) = self._socket.accept()
+      except socket.timeout:
+        continue
+      except OSError:
+        break
+      # Stop() checks the connection after clearing the flag, so one of the
+      # two always sees the other.
+      self._connection = connection
+      if not self._running.is_set():
+        connection.close()
+        break
+      try:
+        self._ServeSession(connection)
+      except Exception as e:
+        logging.error('DisplayNode: session dropped: %s', e)
+      finally:
+        self._connection = None
+      return True
+    return False
+
+  def _ServeSession(self, connection):
+    """ Apply a coordinator's messages until it says goodbye.
+
+    Args:
+      connection: socket.socket coordinator connection.
+
+    Raises:
+      Exception if a message is not signed with the shared key.
+    """
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with connection:
+      while True:
+        (message_type, payload) = ReceiveMessage(connection, self._key)
+        if message_type is None or message_type == BYE:
+          break
+        if message_type == HELLO:
+          hello = json.loads(payload.decode())
+          self.node = hello['node']
+          self.x_offset = hello['x_offset']
+          self.tile_size = hello['tile_size']
+          self.tiles = {}
+          self.matrix.FillScreen()
+          SendMessage(connection, self._key, HELLO,
+                      json.dumps({'time': time.time()}).encode())
+        elif message_type == TILE:
+          (tile_index, tile) = pickle.loads(payload)
+          self.tiles[tile_index] = tile
+        elif message_type == TICK:
+          self._HandleTick(connection, json.loads(payload.decode()))
+
+  def Serve(self):
+    """ Serve coordinator sessions until stopped. """
+    while self.ServeOnce():
+      pass
+
+  def Stop(self):
+    """ Stop serving, ending the current session. Safe from any thread. """
+    self._running.clear()
+    connection = self._connection
+    if connection:
+      try:
+        connection.shutdown(socket.SHUT_RDWR)
+      except OSError:
+        pass
+
+  def Close(self):
+    """ Stop serving and close the listening socket. """
+    self.Stop()
+    self._socket.close()
+
+
+def main():
+  """ Run a display node driving the local matrix. """
+  parser = argparse.ArgumentParser(
+      description='Display frames from a DisplayCoordinator.')
+  parser.add_argument('--port', type=int, default=9998)
+  parser.add_argument('--host', default='127.0.0.1',
+                      help='address to listen on, 0.0.0.0 for all')
+  parser.add_argument('--key-file', required=True,
+                      help='file holding the key shared with the coordinator')
+  parser.add_argument('--led-rows', type=int, default=32)
+  parser.add_argument('--chain-length', type=int, default=2)
+  parser.add_argument('--write-cycles', type=int, default=2)
+  parser.add_argument('--tile-size', type=int, default=None)
+  args = parser.parse_args()
+
+  with open(args.key_file, 'rb') as key_file:
+    key = key_file.read().strip()
+  import matrix_manager
+  with matrix_manager.MatrixInterface(args.led_rows, args.chain_length,
+                                      args.write_cycles,
+                                      args.tile_size) as matrix:
+    node = DisplayNode(matrix, args.port, args.host, key=key)
+    try:
+      node.Serve()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      node.Close()
+
+
+if __name__ == '__main__':
+  main()
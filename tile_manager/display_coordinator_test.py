@@ -0,0 +1,175 @@
+#
+# Display coordinator unittest.
+#
+
+import blank
+import display_coordinator
+import matrix_manager
+import multiprocessing
+import pickle
+import route
+import socket
+import threading
+import time
+import unittest
+import weather
+
+WEATHER = {'id': 208,
+           'main': 'sunny',
+           'description': 'sunny and clear.',
+           'icon': '01d',
+           'temp': 72,
+           'temp_min': 68,
+           'temp_max': 78,
+           'humidity': 23}
+KEY = b'shared test key'
+
+
+def _RunNode(queue):
+  """ Run a 32x32 display node in a separate process for one session. """
+  matrix = matrix_manager.MatrixInterface(32, 1)
+  node = display_coordinator.DisplayNode(matrix, 0, '127.0.0.1',
+                                         record_swaps=True, key=KEY)
+  queue.put(node.port)
+  node.ServeOnce()
+  node.Close()
+  queue.put((node.swap_times, sorted(node.tiles)))
+
+
+class TestLayout(unittest.TestCase):
+  """ Test logical layout helpers. """
+
+  def setUp(self):
+    """ Initalize layout test setup. """
+    self.matrix = display_coordinator.LogicalMatrix(32, 32, 3, 32)
+
+  def testShape(self):
+    """ Ensure the logical shape spans all nodes and is a new list. """
+    self.assertEqual(self.matrix.shape, [[None, None, None]])
+    self.assertIsNot(self.matrix.shape, self.matrix.shape)
+
+  def testNodesForSpan(self):
+    """ Ensure spans are assigned to the nodes they overlap. """
+    self.assertEqual(self.matrix.NodesForSpan(0, 32), [0])
+    self.assertEqual(self.matrix.NodesForSpan(32, 64), [1, 2])
+    self.assertEqual(self.matrix.NodesForSpan(16, 32), [0, 1])
+
+  def testIterateLayout(self):
+    """ Ensure large tiles are yielded once and blanks each slot. """
+    tiles = [weather.WeatherTile64x32(WEATHER), route.RouteTile32x32()]
+    layout = list(display_coordinator.IterateLayout([[0, 0, -1, -1, 1]],
+                                                    tiles, 32))
+    self.assertEqual(layout, [(0, 0, 0, 64),
+                              (-1, 64, 0, 32),
+                              (-1, 96, 0, 32),
+                              (1, 128, 0, 32)])
+
+  def testCoordinatorRequiresNodes(self):
+    """ Ensure a coordinator without nodes is rejected. """
+    with self.assertRaises(Exception):
+      display_coordinator.DisplayCoordinator([], [], key=KEY)
+    with self.assertRaises(Exception):
+      display_coordinator.DisplayCoordinator([], [('127.0.0.1', 1)])
+
+  def testCoordinatorLogicalSize(self):
+    """ Ensure tiles are checked against the logical screen size. """
+    tiles = [weather.WeatherTile64x32(WEATHER)]
+    coordinator = display_coordinator.DisplayCoordinator(
+        tiles, [('127.0.0.1', 1), ('127.0.0.1', 2)], 32, 1, key=KEY)
+    self.assertEqual(coordinator.matrix.width, 64)
+    self.assertEqual(coordinator.render_pipeline, [[None, None]])
+    with self.assertRaises(Exception):
+      display_coordinator.DisplayCoordinator(tiles, [('127.0.0.1', 1)], 32, 1,
+                                             key=KEY)
+
+
+class TestDisplayNode(unittest.TestCase):
+  """ Test a display node refusing unsigned messages. """
+
+  def setUp(self):
+    """ Start a display node serving in a thread. """
+    matrix = matrix_manager.MatrixInterface(32, 1)
+    self.node = display_coordinator.DisplayNode(matrix, 0, key=KEY)
+    self.thread = threading.Thread(target=self.node.Serve)
+    self.thread.start()
+    self.addCleanup(self.thread.join, 5)
+    self.addCleanup(self.node.Close)
+
+  def testRequiresKey(self):
+    """ Ensure a node cannot be started without a key. """
+    with self.assertRaises(Exception):
+      display_coordinator.DisplayNode(matrix_manager.MatrixInterface(32, 1), 0)
+
+  def testLocalOnly(self):
+    """ Ensure nodes listen on localhost by default. """
+    self.assertEqual(self.node._socket.getsockname()[0], '127.0.0.1')
+
+  def testBadSignature(self):
+    """ Ensure tiles signed with another key are never loaded. """
+    with socket.create_connection(('127.0.0.1', self.node.port)) as client:
+      display_coordinator.SendMessage(
+          client, b'other key', display_coordinator.TILE,
+          pickle.dumps((0, blank.BlankTile())))
+      # The node drops the connection without answering.
+      self.assertEqual(client.recv(1), b'')
+    self.assertEqual(self.node.tiles, {})
+
+  def testStop(self):
+    """ Ensure Serve returns once stopped, also during a session. """
+    client = socket.create_connection(('127.0.0.1', self.node.port))
+    self.addCleanup(client.close)
+    display_coordinator.SendMessage(client, KEY, display_coordinator.TILE,
+                                    pickle.dumps((3, blank.BlankTile())))
+    deadline = time.time() + 5
+    while 3 not in self.node.tiles and time.time() < deadline:
+      time.sleep(0.01)
+    self.node.Stop()
+    self.thread.join(5)
+    self.assertFalse(self.thread.is_alive())
+
+
+class TestDisplayCoordinator(unittest.TestCase):
+  """ Drive two local node processes from one coordinator. """
+
+  def setUp(self):
+    """ Start two node processes. """
+    self.queues = []
+    self.processes = []
+    for i in range(2):
+      queue = multiprocessing.Queue()
+      process = multiprocessing.Process(target=_RunNode, args=(queue,))
+      process.start()
+      self.queues.append(queue)
+      self.processes.append(process)
+    self.ports = [queue.get(timeout=10) for queue in self.queues]
+
+  def tearDown(self):
+    """ Stop node processes. """
+    for process in self.processes:
+      process.join(timeout=10)
+      if process.is_alive():
+        process.terminate()
+
+  def testSynchronizedFrames(self):
+    """ Ensure both nodes swap every frame, in lockstep. """
+    tiles = [weather.WeatherTile64x32(WEATHER, scrolling=(0, -4)),
+             blank.BlankTile()]
+    coordinator = display_coordinator.DisplayCoordinator(
+        tiles, [('127.0.0.1', port) for port in self.ports], 32, 1, fps=60,
+        key=KEY)
+    coordinator.Run()
+    results = [queue.get(timeout=10) for queue in self.queues]
+    frames = [[frame for (frame, swapped) in swaps]
+              for (swaps, tiles) in results]
+    self.assertEqual(frames[0], list(range(1, coordinator.frame + 1)))
+    self.assertEqual(frames[0], frames[1])
+    for ((frame, left), (other, right)) in zip(results[0][0],
+                                               results[1][0]):
+      self.assertLess(abs(left - right), 0.02)
+    # The large tile spans both nodes, so it was sent to both.
+    for (swaps, tiles) in results:
+      self.assertIn(0, tiles)
+
+
+if __name__ == '__main__':
+  unittest.main()
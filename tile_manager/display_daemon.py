@@ -0,0 +1,626 @@
+#
+# Long running display daemon with a local control socket.
+#
+# The daemon keeps the matrix and fonts initialized and displays tiles until
+# stopped; other processes change what is displayed by sending batches of
+# updates over a Unix socket, one JSON object per line:
+#
+#   {"id": 1, "ops": [
+#     {"op": "add", "name": "n", "type": "route",
+#      "args": {"route": "N", "stops": ["2017-07-03T08:00:00-07:00"]}},
+#     {"op": "update", "name": "n",
+#      "args": {"stops": ["2017-07-03T08:10:00-07:00"]}},
+#     {"op": "remove", "name": "n"},
+#     {"op": "brightness", "value": 0.5},
+#     {"op": "fps", "value": 10},
+#     {"op": "stats"}]}
+#
+# Batches are queued and applied in order between two frames, so a frame
+# never shows half a batch. Each batch is answered with one JSON line:
+#
+#   {"id": 1, "ok": true, "frame": 1234, "latency": 0.012}
+#
+# latency is the seconds from receiving the batch to applying it; ControlClient
+# adds the full round trip as seen by the client. On failure "ok" is false,
+# "error" describes the failed op and "applied" counts the ops applied before
+# it.
+#
+
+import argparse
+import collections
+import datetime
+import departures
+import dithering
+import errno
+import frame_tap
+import json
+import logging
+import matrix_manager
+import memory_monitor
+import os
+import queue
+import render_cache
+import render_watchdog
+import route
+import socket
+import threading
+import ticker
+import tile_manager
+import time
+import weather
+
+
+def _ParseTimes(values):
+  """ Returns List of datetime timezone aware times from ISO 8601 Strings.
+
+  Raises:
+    Exception if a time has no UTC offset.
+  """
+  times = [datetime.datetime.fromisoformat(value) for value in values]
+  for value in times:
+    if value.tzinfo is None:
+      raise Exception('DisplayDaemon: stop time %s has no UTC offset.' % value)
+  return times
+
+
+def _Position(args):
+  """ Returns Dictionary of optional x, y and scrolling tile arguments. """
+  position = {}
+  for name in ('x', 'y'):
+    if name in args:
+      position[name] = int(args[name])
+  if 'scrolling' in args:
+    position['scrolling'] = tuple(int(value) for value in args['scrolling'])
+  return position
+
+
+def _CreateRoute(args):
+  """ Returns route.RouteTile32x32 from add args. """
+  return route.RouteTile32x32(route_name=args.get('route'),
+                              stops=_ParseTimes(args.get('stops', [])),
+                              **_Position(args))
+
+
+def _UpdateRoute(tile, args):
+  """ Replace the stops of a route tile. """
+  tile.SetStops(_ParseTimes(args['stops']))
+
+
+def _CreateDepartures(args):
+  """ Returns departures.DeparturesTile64x32 from add args. """
+  return departures.DeparturesTile64x32(
+      [(name, _ParseTimes(stops)) for (name, stops) in args.get('routes', [])],
+      **_Position(args))
+
+
+def _UpdateDepartures(tile, args):
+  """ Replace the routes of a departures tile. """
+  tile.SetRoutes([(name, _ParseTimes(stops))
+                  for (name, stops) in args['routes']])
+
+
+def _CreateWeather32x32(args):
+  """ Returns weather.WeatherTile32x32 from add args. """
+  return weather.WeatherTile32x32(args['weather'], **_Position(args))
+
+
+def _CreateWeather64x32(args):
+  """ Returns weather.WeatherTile64x32 from add args. """
+  return weather.WeatherTile64x32(args['weather'], **_Position(args))
+
+
+def _UpdateWeather(tile, args):
+  """ Replace the weather of a weather tile. """
+  tile.SetWeather(args['weather'])
+
+
+def _ParseMessages(values):
+  """ Returns List of ticker messages from Strings or [String, color] Lists.
+  """
+  return [value if isinstance(value, str) else (value[0], tuple(value[1]))
+          for value in values]
+
+
+def _CreateTicker(args):
+  """ Returns ticker.TickerTile64x32 fed by a queue from add args. """
+  tile = ticker.TickerTile64x32(queue.Queue(), **_Position(args))
+  _UpdateTicker(tile, args)
+  return tile
+
+
+def _UpdateTicker(tile, args):
+  """ Queue messages on a ticker tile, ending the stream if 'end' is set. """
+  for message in _ParseMessages(args.get('messages', [])):
+    tile.AddMessage(message)
+  if args.get('end'):
+    tile.AddMessage(None)
+
+
+# Tile type name to Tuple (Function: create tile from args, Function: update
+# tile from args).
+TILE_TYPES = {
+    'route': (_CreateRoute, _UpdateRoute),
+    'departures': (_CreateDepartures, _UpdateDepartures),
+    'weather32x32': (_CreateWeather32x32, _UpdateWeather),
+    'weather64x32': (_CreateWeather64x32, _UpdateWeather),
+    'ticker': (_CreateTicker, _UpdateTicker),
+}
+
+
+class DisplayDaemon(tile_manager.TileManager):
+  """ Displays tiles until stopped, applying updates from a control socket.
+
+  Attributes:
+    socket_path: String location of the Unix control socket.
+    names: Dictionary of String tile name to BaseTile, for tiles added over
+        the control socket.
+    frame_count: Integer number of frames displayed.
+    LATENCY_SAMPLES: Integer number of recent update latencies kept.
+    ACCEPT_RETRY: Float seconds to wait before accepting again when out of
+        file descriptors. Default: 1.0.
+  """
+  LATENCY_SAMPLES = 256
+  ACCEPT_RETRY = 1.0
+
+  def __init__(self, tiles, socket_path, led_rows=32, chain_length=2,
+               write_cycles=2, tile_size=None, fps=1, static_lifespan=5,
+               color_correction=None, sinks=None, matrix=None, watchdog=None,
+               render_cache=None, clock=None, scale=1, memory_monitor=None):
+    """ Initalize display daemon and bind the control socket.
+
+    Args:
+      tiles: List of BaseTile subclassed objects to display initially.
+      socket_path: String location of the Unix control socket, replaced if
+          it exists.
+
+    See tile_manager.TileManager for the remaining arguments.
+    """
+    self.socket_path = socket_path
+    self.names = {}
+    self.frame_count = 0
+    self._types = {}
+    self._static_tiles = set()
+    for tile in tiles:
+      if tile.GetMaxFrames() == 0:
+        self._static_tiles.add(tile)
+    tile_manager.TileManager.__init__(self, tiles, led_rows, chain_length,
+                                      write_cycles, tile_size, fps,
+                                      static_lifespan, color_correction, sinks,
+                                      matrix, watchdog,
+                                      render_cache=render_cache, clock=clock,
+                                      scale=scale,
+                                      memory_monitor=memory_monitor)
+    self._updates = queue.Queue()
+    self._latencies = collections.deque(maxlen=self.LATENCY_SAMPLES)
+    self._update_count = 0
+    self._running = threading.Event()
+    self._connections = []
+    self._connections_lock = threading.Lock()
+    if os.path.exists(socket_path):
+      os.unlink(socket_path)
+    self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self._socket.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    self._socket.listen(4)
+    self._socket.settimeout(0.2)
+    self._thread = None
+
+  def _Accept(self):
+    """ Accept control connections until stopped. """
+    while self._running.is_set():
+      try:
+        (connection, _) = self._socket.accept()
+      except socket.timeout:
+        continue
+      except OSError as e:
+        if e.errno in (errno.EMFILE, errno.ENFILE):
+          # Out of file descriptors: wait for connections to close.
+          logging.error('DisplayDaemon: cannot accept connection: %s', e)
+          time.sleep(self.ACCEPT_RETRY)
+          continue
+        break
+      with self._connections_lock:
+        self._connections.append(connection)
+      threading.Thread(target=self._Read, args=(connection,),
+                       daemon=True).start()
+
+  def _Read(self, connection):
+    """ Queue every batch received on a connection, then close it.
+
+    Args:
+      connection: socket.socket control connection.
+    """
+    try:
+      with connection.makefile('rb') as lines:
+        for line in lines:
+          if line.strip():
+            self._updates.put((time.perf_counter(), connection, line))
+    except OSError:
+      pass
+    finally:
+      with self._connections_lock:
+        if connection in self._connections:
+          self._connections.remove(connection)
+      connection.close()
+
+  def _Respond(self, connection, response):
+    """ Send a response line, ignoring clients that went away. """
+    try:
+      connection.sendall(json.dumps(response).encode('utf-8') + b'\n')
+    except OSError:
+      pass
+
+  def _PrepareTile(self, tile):
+    """ Check a new tile fits and set its lifespan if static.
+
+    Raises:
+      Exception if the tile is larger than the screen, or taller than a cell.
+    """
+    (width, height) = self.scaler.GetFootprint(tile)
+    if width > self.matrix.width or height > self.matrix.height:
+      raise Exception('DisplayDaemon: A tile cannot be bigger than the screen.')
+    if height > self.matrix.tile_size:
+      raise Exception('DisplayDaemon: A tile cannot be taller than tile_size.')
+    tile.SetClock(self.clock)
+    if self.render_cache:
+      self.render_cache.Prime(tile)
+    if tile.GetMaxFrames() == 0:
+      self._static_tiles.add(tile)
+      tile.SetMaxFrameCount(self.static_lifespan * self.fps)
+    self.max_tile_width = max(self.max_tile_width, width)
+    self.max_tile_height = max(self.max_tile_height, height)
+
+  def _GetNamedTile(self, name):
+    """ Returns BaseTile added with a name.
+
+    Raises:
+      Exception if no tile has the name.
+    """
+    tile = self.names.get(name)
+    if tile is None:
+      raise Exception('DisplayDaemon: no tile named %s.' % name)
+    return tile
+
+  def _RemoveTile(self, tile):
+    """ Remove a tile, clearing it from the render pipeline. """
+    index = self.tiles.index(tile)
+    del self.tiles[index]
+    self._static_tiles.discard(tile)
+    if self.watchdog:
+      self.watchdog.Forget(tile)
+    if self.render_cache:
+      self.render_cache.Forget(tile)
+    self.scaler.Forget(tile)
+    if self.transitions:
+      self.transitions.TileRemoved(index)
+    tile.OnHide()
+    for row in self.render_pipeline:
+      for (x_index, tile_index) in enumerate(row):
+        if tile_index == index:
+          row[x_index] = None
+        elif tile_index is not None and tile_index > index:
+          row[x_index] = tile_index - 1
+
+  def SetFps(self, fps):
+    """ Change the frame rate, and the lifespan of static tiles with it.
+
+    Args:
+      fps: Integer frames per second, 1 to 60.
+
+    Raises:
+      Exception if the frame rate is out of range.
+    """
+    if not 1 <= fps <= 60:
+      raise Exception('DisplayDaemon: fps %s out of range.' % fps)
+    self.fps = fps
+    for tile in self._static_tiles:
+      tile.SetMaxFrameCount(self.static_lifespan * self.fps)
+
+  def _ApplyOp(self, op):
+    """ Apply one update.
+
+    Args:
+      op: Dictionary update, see module documentation.
+
+    Returns:
+      Dictionary of values to add to the response.
+
+    Raises:
+      Exception if the update is invalid.
+    """
+    kind = op.get('op')
+    if kind == 'add':
+      name = op['name']
+      if name in self.names:
+        raise Exception('DisplayDaemon: tile %s already exists.' % name)
+      if op.get('type') not in TILE_TYPES:
+        raise Exception('DisplayDaemon: unknown tile type %s.' %
+                        op.get('type'))
+      tile = TILE_TYPES[op['type']][0](op.get('args', {}))
+      self._PrepareTile(tile)
+      self.tiles.append(tile)
+      self.names[name] = tile
+      self._types[name] = op['type']
+    elif kind == 'update':
+      tile = self._GetNamedTile(op['name'])
+      TILE_TYPES[self._types[op['name']]][1](tile, op.get('args', {}))
+    elif kind == 'remove':
+      self._RemoveTile(self._GetNamedTile(op['name']))
+      del self.names[op['name']]
+      del self._types[op['name']]
+    elif kind == 'brightness':
+      value = float(op['value'])
+      if not 0.0 <= value <= 1.0:
+        raise Exception('DisplayDaemon: brightness %s out of range.' % value)
+      self.matrix.SetBrightness(value)
+    elif kind == 'fps':
+      self.SetFps(int(op['value']))
+    elif kind == 'stats':
+      return {'stats': self.GetStats()}
+    else:
+      raise Exception('DisplayDaemon: unknown op %s.' % kind)
+    return {}
+
+  def _ApplyBatch(self, received, line):
+    """ Apply a batch of updates, stopping at the first failure.
+
+    Args:
+      received: Float time.perf_counter() the batch was received.
+      line: bytes JSON batch.
+
+    Returns:
+      Dictionary response for the batch.
+    """
+    response = {'id': None, 'ok': True}
+    applied = 0
+    try:
+      batch = json.loads(line.decode('utf-8'))
+      response['id'] = batch.get('id')
+      for op in batch.get('ops', []):
+        response.update(self._ApplyOp(op))
+        applied += 1
+    except Exception as e:
+      response.update({'ok': False, 'error': str(e), 'applied': applied})
+      logging.error('DisplayDaemon: update failed: %s', e)
+    latency = time.perf_counter() - received
+    self._latencies.append(latency)
+    self._update_count += 1
+    response.update({'frame': self.frame_count, 'latency': latency})
+    return response
+
+  def ApplyUpdates(self):
+    """ Apply every queued batch; called between frames.
+
+    Returns:
+      Integer number of batches applied.
+    """
+    count = 0
+    while True:
+      try:
+        (received, connection, line) = self._updates.get_nowait()
+      except queue.Empty:
+        return count
+      self._Respond(connection, self._ApplyBatch(received, line))
+      count += 1
+
+  def GetStats(self):
+    """ Returns Dictionary of frame and update latency statistics.
+
+    Latencies are seconds from receiving a batch to applying it, over the
+    most recent LATENCY_SAMPLES batches. With a watchdog, 'render' has the
+    render statistics of every tile, slowest first.
+    """
+    latencies = sorted(self._latencies)
+    stats = {
+        'frames': self.frame_count,
+        'updates': self._update_count,
+        'tiles': len(self.tiles),
+        'fps': self.fps,
+        'mean_latency': (sum(latencies) / len(latencies)
+                         if latencies else None),
+        'p95_latency': (latencies[int(0.95 * (len(latencies) - 1))]
+                        if latencies else None),
+        'max_latency': latencies[-1] if latencies else None,
+    }
+    if self.watchdog:
+      stats['render'] = self.watchdog.GetStats()
+    return stats
+
+  def Start(self):
+    """ Start accepting control connections on a background thread. """
+    if self._thread:
+      return
+    self._running.set()
+    self._thread = threading.Thread(target=self._Accept, daemon=True)
+    self._thread.start()
+
+  def Stop(self):
+    """ Stop Run() after the current frame. """
+    self._running.clear()
+
+  def Close(self):
+    """ Stop accepting updates and remove the control socket. """
+    self._running.clear()
+    if self._thread:
+      self._thread.join()
+      self._thread = None
+    with self._connections_lock:
+      connections = self._connections
+      self._connections = []
+    for connection in connections:
+      try:
+        connection.shutdown(socket.SHUT_RDWR)
+      except OSError:
+        pass
+      connection.close()
+    self._socket.close()
+    if os.path.exists(self.socket_path):
+      os.unlink(self.socket_path)
+
+  def Run(self, loop=True):
+    """ Display tiles and apply updates until Stop() is called.
+
+    Args:
+      loop: Ignored, tiles are always looped.
+    """
+    self.Start()
+    self.matrix.FillScreen()
+    try:
+      while self._running.is_set():
+        self.ApplyUpdates()
+        self._RenderFrame()
+        self.frame_count += 1
+        if self._AllTilesDisplayed():
+          self._ResetTiles()
+          self.render_pipeline = self.matrix.shape
+    finally:
+      self.Close()
+
+
+class ControlClient(object):
+  """ Sends update batches to a DisplayDaemon.
+
+  Attributes:
+    socket_path: String location of the daemon control socket.
+  """
+
+  def __init__(self, socket_path, timeout=10):
+    """ Initalize control client, connecting to the daemon.
+
+    Args:
+      socket_path: String location of the daemon control socket.
+      timeout: Float seconds to wait for a response. Default: 10.
+    """
+    self.socket_path = socket_path
+    self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self._socket.settimeout(timeout)
+    self._socket.connect(socket_path)
+    self._lines = self._socket.makefile('rb')
+    self._next_id = 0
+
+  def __enter__(self):
+    """ Enter runtime context for the client. """
+    return self
+
+  def __exit__(self, type, value, traceback):
+    """ Exit runtime context for the client, closing the connection. """
+    self.Close()
+
+  def Send(self, ops):
+    """ Send a batch of updates and wait until it is applied.
+
+    Args:
+      ops: List of Dictionary updates, see module documentation.
+
+    Returns:
+      Dictionary daemon response, with 'round_trip' Float seconds from
+      sending the batch to receiving the response.
+    """
+    self._next_id += 1
+    start = time.perf_counter()
+    self._socket.sendall(json.dumps({'id': self._next_id, 'ops': ops})
+                         .encode('utf-8') + b'\n')
+    line = self._lines.readline()
+    if not line:
+      raise Exception('ControlClient: daemon closed the connection.')
+    response = json.loads(line.decode('utf-8'))
+    response['round_trip'] = time.perf_counter() - start
+    return response
+
+  def Close(self):
+    """ Close the connection. """
+    self._lines.close()
+    self._socket.close()
+
+
+def main():
+  """ Run the display daemon, or send it one batch of updates. """
+  parser = argparse.ArgumentParser(
+      description='Display tiles, updated through a control socket.')
+  parser.add_argument('--socket', default='/tmp/rgb-matrix-display.sock')
+  parser.add_argument('--send', metavar='JSON',
+                      help='send a JSON list of ops to a running daemon and '
+                           'print the response')
+  parser.add_argument('--led-rows', type=int, default=32)
+  parser.add_argument('--chain-length', type=int, default=2)
+  parser.add_argument('--write-cycles', type=int, default=2)
+  parser.add_argument('--tile-size', type=int, default=None)
+  parser.add_argument('--fps', type=int, default=1)
+  parser.add_argument('--static-lifespan', type=int, default=5)
+  parser.add_argument('--render-budget', type=float, default=None,
+                      help='seconds a tile render may take before the tile '
+                           'is degraded')
+  parser.add_argument('--pwm-bits', type=int, default=None,
+                      help='dither frames down to this many bits per color')
+  parser.add_argument('--temporal-dither', action='store_true',
+                      help='rotate dithering thresholds every frame')
+  parser.add_argument('--scale', type=int, default=1,
+                      help='show tiles scaled up by this integer factor, '
+                           'e.g. 2 for 32 pixel tiles on 64 pixel panels')
+  parser.add_argument('--render-cache', metavar='DIRECTORY', default=None,
+                      help='keep rendered tile frames in this directory, '
+                           'reused after a restart')
+  parser.add_argument('--render-cache-size', type=int, default=16,
+                      help='megabytes the render cache may use on disk')
+  parser.add_argument('--preview-port', type=int, default=None,
+                      help='serve a live preview of the display over HTTP '
+                           'on this port')
+  parser.add_argument('--preview-host', default='127.0.0.1',
+                      help='address the live preview listens on')
+  parser.add_argument('--memory-interval', type=int, default=None,
+                      help='measure memory growth over one display loop out '
+                           'of this many (the loop before it is traced too)')
+  parser.add_argument('--memory-threshold', type=int, default=256,
+                      help='kilobytes of memory growth per loop logged as a '
+                           'warning')
+  args = parser.parse_args()
+
+  if args.send:
+    with ControlClient(args.socket) as client:
+      print(json.dumps(client.Send(json.loads(args.send))))
+    return
+
+  watchdog = None
+  if args.render_budget:
+    watchdog = render_watchdog.RenderWatchdog(args.render_budget)
+  cache = None
+  if args.render_cache:
+    cache = render_cache.RenderCache(
+        args.render_cache, args.render_cache_size * 1024 * 1024)
+  monitor = None
+  if args.memory_interval:
+    monitor = memory_monitor.MemoryMonitor(args.memory_interval,
+                                           args.memory_threshold * 1024)
+  sinks = []
+  preview = None
+  if args.preview_port is not None:
+    tap = frame_tap.FrameTap()
+    sinks.append(tap)
+    preview = frame_tap.PreviewServer(tap, args.preview_host,
+                                      args.preview_port)
+    logging.info('Live preview at %s', preview.url)
+  matrix = None
+  if args.pwm_bits:
+    matrix = matrix_manager.MatrixInterface(
+        args.led_rows, args.chain_length, args.write_cycles, args.tile_size,
+        sinks=sinks, dither=dithering.OrderedDither(args.pwm_bits,
+                                       temporal=args.temporal_dither))
+  daemon = DisplayDaemon([], args.socket, args.led_rows, args.chain_length,
+                         args.write_cycles, args.tile_size, args.fps,
+                         args.static_lifespan, sinks=sinks, matrix=matrix,
+                         watchdog=watchdog, render_cache=cache,
+                         scale=args.scale, memory_monitor=monitor)
+  try:
+    daemon.Run()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    if monitor:
+      monitor.Stop()
+    if preview:
+      preview.Stop()
+    daemon.matrix.TurnOffScreen()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,222 @@
+#
+# Display daemon unittest.
+#
+
+import blank
+import display_daemon
+import errno
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+STOP = '2017-07-03T08:00:00-07:00'
+WEATHER = {'id': 800, 'main': 'Clear', 'description': 'clear sky',
+           'icon': '01d', 'temp': 72, 'temp_min': 68, 'temp_max': 78,
+           'humidity': 23}
+
+
+class FakeConnection(object):
+  """ Collects responses sent to a control connection. """
+
+  def __init__(self):
+    self.responses = []
+
+  def sendall(self, data):
+    self.responses.append(json.loads(data.decode('utf-8')))
+
+
+class ExhaustedSocket(object):
+  """ Listening socket out of file descriptors, then stopping the daemon.
+  """
+
+  def __init__(self, daemon, failures):
+    self.daemon = daemon
+    self.failures = failures
+    self.accepts = 0
+
+  def accept(self):
+    self.accepts += 1
+    if self.accepts <= self.failures:
+      raise OSError(errno.EMFILE, 'Too many open files')
+    self.daemon._running.clear()
+    raise socket.timeout()
+
+
+class TestDisplayDaemon(unittest.TestCase):
+  """ Test applying updates to a display daemon. """
+
+  def setUp(self):
+    """ Initalize DisplayDaemon test setup. """
+    self.directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.directory)
+    self.socket_path = os.path.join(self.directory, 'control.sock')
+    self.daemon = display_daemon.DisplayDaemon([], self.socket_path, fps=60)
+    self.addCleanup(self.daemon.Close)
+    self.connection = FakeConnection()
+
+  def Apply(self, ops):
+    """ Returns Dictionary response after queuing and applying a batch. """
+    line = json.dumps({'id': 7, 'ops': ops}).encode('utf-8')
+    self.daemon._updates.put((time.perf_counter(), self.connection, line))
+    self.assertEqual(self.daemon.ApplyUpdates(), 1)
+    return self.connection.responses[-1]
+
+  def testAcceptOutOfDescriptors(self):
+    """ Ensure connections are accepted again once descriptors are freed.
+    """
+    listener = ExhaustedSocket(self.daemon, 3)
+    (listener_socket, self.daemon._socket) = (self.daemon._socket, listener)
+    self.addCleanup(setattr, self.daemon, '_socket', listener_socket)
+    self.daemon.ACCEPT_RETRY = 0
+    self.daemon._running.set()
+    with self.assertLogs(level='ERROR'):
+      self.daemon._Accept()
+    self.assertEqual(listener.accepts, 4)
+
+  def testSocketPermissions(self):
+    """ Ensure only the owner can use the control socket. """
+    self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+  def testAddUpdateRemove(self):
+    """ Ensure tiles are added, updated and removed by name. """
+    response = self.Apply([
+        {'op': 'add', 'name': 'n', 'type': 'route',
+         'args': {'route': 'N', 'stops': [STOP], 'scrolling': [0, 0]}},
+        {'op': 'add', 'name': 'sky', 'type': 'weather32x32',
+         'args': {'weather': WEATHER}}])
+    self.assertTrue(response['ok'])
+    self.assertEqual(response['id'], 7)
+    self.assertGreaterEqual(response['latency'], 0)
+    tile = self.daemon.names['n']
+    self.assertEqual(self.daemon.tiles, [tile, self.daemon.names['sky']])
+    self.assertEqual(tile.route, 'N')
+    # Static tiles get the static lifespan.
+    self.assertEqual(tile.GetMaxFrames(), 5 * 60)
+
+    self.Apply([{'op': 'update', 'name': 'n',
+                 'args': {'stops': ['2017-07-03T09:00:00-07:00']}}])
+    self.assertEqual(tile.stops[0].hour, 9)
+    self.Apply([{'op': 'update', 'name': 'sky',
+                 'args': {'weather': dict(WEATHER, temp=50)}}])
+    self.assertEqual(self.daemon.names['sky'].weather['temp'], 50)
+
+    self.Apply([{'op': 'remove', 'name': 'n'}])
+    self.assertEqual(self.daemon.tiles, [self.daemon.names['sky']])
+    self.assertNotIn('n', self.daemon.names)
+
+  def testTicker(self):
+    """ Ensure ticker messages are queued by updates. """
+    self.Apply([{'op': 'add', 'name': 'news', 'type': 'ticker',
+                 'args': {'messages': ['hello', ['alert', [255, 0, 0]]]}}])
+    tile = self.daemon.names['news']
+    self.assertFalse(tile.IsExpired())
+    self.Apply([{'op': 'update', 'name': 'news',
+                 'args': {'messages': ['bye'], 'end': True}}])
+    while not tile.IsExpired():
+      tile.Render()
+      tile.StepFrame()
+    self.assertEqual(tile.messages, 3)
+
+  def testRemoveShiftsRenderPipeline(self):
+    """ Ensure the render pipeline still points at the right tiles. """
+    self.Apply([{'op': 'add', 'name': name, 'type': 'route',
+                 'args': {'stops': [STOP]}} for name in ('a', 'b')])
+    self.daemon.render_pipeline[0][:] = [0, 1]
+    self.Apply([{'op': 'remove', 'name': 'a'}])
+    self.assertEqual(self.daemon.render_pipeline[0], [None, 0])
+
+  def testBatchStopsAtFailure(self):
+    """ Ensure a failing op is reported with the ops applied before it. """
+    response = self.Apply([
+        {'op': 'brightness', 'value': 0.5},
+        {'op': 'update', 'name': 'missing', 'args': {}},
+        {'op': 'fps', 'value': 2}])
+    self.assertFalse(response['ok'])
+    self.assertEqual(response['applied'], 1)
+    self.assertIn('missing', response['error'])
+    self.assertEqual(self.daemon.matrix.color_correction.brightness, 0.5)
+    self.assertEqual(self.daemon.fps, 60)
+
+  def testInvalidOps(self):
+    """ Ensure invalid ops are rejected. """
+    for op in ({'op': 'explode'},
+               {'op': 'add', 'name': 'x', 'type': 'unknown'},
+               {'op': 'add', 'name': 'x', 'type': 'route',
+                'args': {'stops': ['2017-07-03T08:00:00']}},
+               {'op': 'brightness', 'value': 2},
+               {'op': 'fps', 'value': 0}):
+      self.assertFalse(self.Apply([op])['ok'], op)
+    self.assertEqual(self.daemon.tiles, [])
+
+  def testSetFps(self):
+    """ Ensure static tile lifespans follow the frame rate. """
+    self.Apply([{'op': 'add', 'name': 'n', 'type': 'route',
+                 'args': {'stops': [STOP], 'scrolling': [0, 0]}},
+                {'op': 'fps', 'value': 2}])
+    self.assertEqual(self.daemon.fps, 2)
+    self.assertEqual(self.daemon.names['n'].GetMaxFrames(), 10)
+
+  def testStats(self):
+    """ Ensure update latencies are reported. """
+    self.Apply([])
+    stats = self.Apply([{'op': 'stats'}])['stats']
+    self.assertEqual(stats['updates'], 1)
+    self.assertEqual(stats['tiles'], 0)
+    self.assertGreaterEqual(stats['max_latency'], stats['mean_latency'])
+
+
+class TestDisplayDaemonRun(unittest.TestCase):
+  """ Test a running daemon with a control client. """
+
+  def setUp(self):
+    """ Initalize running DisplayDaemon test setup. """
+    self.directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.directory)
+    self.socket_path = os.path.join(self.directory, 'control.sock')
+    self.daemon = display_daemon.DisplayDaemon([blank.BlankTile()],
+                                               self.socket_path, fps=60)
+    self.thread = threading.Thread(target=self.daemon.Run)
+    self.thread.start()
+
+  def tearDown(self):
+    """ Stop the daemon. """
+    self.daemon.Stop()
+    self.thread.join()
+
+  def testRoundTrip(self):
+    """ Ensure batches are applied between frames and answered. """
+    with display_daemon.ControlClient(self.socket_path) as client:
+      response = client.Send([{'op': 'add', 'name': 'n', 'type': 'route',
+                               'args': {'stops': [STOP]}}])
+      self.assertTrue(response['ok'])
+      self.assertGreaterEqual(response['round_trip'], response['latency'])
+      frame = response['frame']
+      response = client.Send([{'op': 'stats'}])
+      self.assertGreaterEqual(response['frame'], frame)
+      self.assertEqual(response['stats']['tiles'], 2)
+    self.assertIn(self.daemon.names['n'], self.daemon.tiles)
+
+  def testConnectionsClosed(self):
+    """ Ensure connections are closed once clients disconnect. """
+    for client in range(20):
+      with display_daemon.ControlClient(self.socket_path) as client:
+        self.assertTrue(client.Send([{'op': 'stats'}])['ok'])
+    deadline = time.time() + 5
+    while self.daemon._connections and time.time() < deadline:
+      time.sleep(0.01)
+    self.assertEqual(self.daemon._connections, [])
+
+  def testCloseRemovesSocket(self):
+    """ Ensure the control socket is removed once stopped. """
+    self.daemon.Stop()
+    self.thread.join()
+    self.assertFalse(os.path.exists(self.socket_path))
+
+
+if __name__ == '__main__':
+  unittest.main()
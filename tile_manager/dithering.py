@@ -0,0 +1,153 @@
+#
+# Ordered dithering stage for reduced color depth output.
+#
+# Long panel chains need fewer PWM bits to keep the refresh rate flicker free,
+# which bands gradients and icon colors. Frames are dithered down to the
+# output bit depth with an ordered (Bayer) threshold matrix before they are
+# pushed, so the panel shows averaged colors instead of bands.
+#
+# The threshold matrix is tiled to the frame size once and cached, and a
+# frame is dithered with three passes in C: a lookup table scaling each
+# channel, a saturating add of the threshold image and a lookup table
+# quantizing to the output levels. Nothing is done per pixel in Python.
+#
+# Temporal dithering rotates the thresholds every frame, so each pixel also
+# averages over consecutive frames.
+#
+
+import time
+from PIL import Image
+from PIL import ImageChops
+
+
+def BayerMatrix(size):
+  """ Returns List of Lists of Integer Bayer threshold ranks.
+
+  Ranks are 0 to size * size - 1, ordered so consecutive ranks are spread as
+  far apart as possible.
+
+  Args:
+    size: Integer matrix width and height, a power of 2.
+
+  Raises:
+    Exception if size is not a power of 2.
+  """
+  if size < 1 or size & (size - 1):
+    raise Exception('BayerMatrix: size must be a power of 2.')
+  matrix = [[0]]
+  while len(matrix) < size:
+    matrix = ([[4 * rank for rank in row] + [4 * rank + 2 for rank in row]
+               for row in matrix] +
+              [[4 * rank + 3 for rank in row] + [4 * rank + 1 for rank in row]
+               for row in matrix])
+  return matrix
+
+
+class OrderedDither(object):
+  """ Dithers frames to a reduced output bit depth.
+
+  Output values are spread over the full 0-255 range, so the panel keeping
+  only the top bits of each channel shows exactly the dithered level.
+
+  Attributes:
+    bits: Integer output bits per channel, 1 to 8.
+    matrix_size: Integer Bayer matrix width and height.
+    temporal: Boolean True to rotate thresholds every frame.
+    frames: Integer number of frames dithered.
+    total_time: Float seconds spent dithering frames.
+    TEMPORAL_PHASES: Integer number of frames thresholds rotate over.
+        Default: 4.
+  """
+  TEMPORAL_PHASES = 4
+
+  def __init__(self, bits=4, matrix_size=4, temporal=False,
+               clock=time.perf_counter):
+    """ Initalize ordered dithering stage.
+
+    Args:
+      bits: Integer output bits per channel, 1 to 8. Default: 4.
+      matrix_size: Integer Bayer matrix size, a power of 2 up to 16.
+          Default: 4.
+      temporal: Boolean True to rotate thresholds every frame.
+          Default: False.
+      clock: Function returning a monotonic time in seconds, to measure the
+          dithering cost. Default: time.perf_counter.
+
+    Raises:
+      Exception if bits or matrix_size are out of range.
+    """
+    if not 1 <= bits <= 8:
+      raise Exception('OrderedDither: bits must be 1 - 8.')
+    if matrix_size > 16:
+      raise Exception('OrderedDither: matrix size must be 16 or less.')
+    self.bits = bits
+    self.matrix_size = matrix_size
+    self.temporal = temporal
+    self.frames = 0
+    self.total_time = 0.0
+    self._clock = clock
+    self._matrix = BayerMatrix(matrix_size)
+    levels = 2 ** bits
+    self._step = 256 // levels
+    # Channels are scaled so the highest level plus the largest threshold
+    # never saturates, then quantized to levels spread over 0-255.
+    self._scale_table = [round(value * (levels - 1) * self._step / 255.0)
+                         for value in range(256)] * 3
+    self._output_table = [
+        round(min(levels - 1, value // self._step) * 255.0 / (levels - 1))
+        for value in range(256)] * 3
+    self._thresholds = {}
+
+  def IsIdentity(self):
+    """ Boolean True if frames are output unchanged (8 bits). """
+    return self.bits == 8
+
+  def _GetThresholds(self, size, phase):
+    """ Returns PIL.Image RGB thresholds tiled to a frame size, cached.
+
+    Args:
+      size: Tuple (Integer: X, Integer: Y) frame size.
+      phase: Integer temporal phase, 0 for still thresholds.
+    """
+    thresholds = self._thresholds.get((size, phase))
+    if thresholds is None:
+      cells = self.matrix_size * self.matrix_size
+      offset = phase * cells // self.TEMPORAL_PHASES
+      tile = Image.new('L', (self.matrix_size, self.matrix_size))
+      tile.putdata([int(((rank + offset) % cells + 0.5) * self._step / cells)
+                    for row in self._matrix for rank in row])
+      plane = Image.new('L', size)
+      for y in range(0, size[1], self.matrix_size):
+        for x in range(0, size[0], self.matrix_size):
+          plane.paste(tile, (x, y))
+      thresholds = self._thresholds[(size, phase)] = Image.merge(
+          'RGB', (plane, plane, plane))
+    return thresholds
+
+  def Apply(self, image):
+    """ Dither a frame to the output bit depth.
+
+    The source image is never modified.
+
+    Args:
+      image: PIL.Image RGB frame.
+
+    Returns:
+      PIL.Image dithered frame. This is the source image for 8 bits.
+    """
+    if self.IsIdentity():
+      return image
+    start = self._clock()
+    phase = self.frames % self.TEMPORAL_PHASES if self.temporal else 0
+    frame = ImageChops.add(image.point(self._scale_table),
+                           self._GetThresholds(image.size, phase))
+    frame = frame.point(self._output_table)
+    self.frames += 1
+    self.total_time += self._clock() - start
+    return frame
+
+  def GetMeanTime(self):
+    """ Returns Float mean seconds spent dithering a frame, or None. """
+    if not self.frames:
+      return None
+    return self.total_time / self.frames
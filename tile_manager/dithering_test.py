@@ -0,0 +1,126 @@
+#
+# Ordered dithering stage unittest.
+#
+
+import dithering
+import matrix_manager
+import unittest
+from PIL import Image
+from PIL import ImageStat
+
+
+class FakeClock(object):
+  """ Clock advancing a set time per call. """
+
+  def __init__(self, step):
+    self.now = 0.0
+    self.step = step
+
+  def Time(self):
+    self.now += self.step
+    return self.now
+
+
+class TestOrderedDither(unittest.TestCase):
+  """ Test dithering frames to a reduced bit depth. """
+
+  def Gray(self, value, size=(32, 32)):
+    """ Returns PIL.Image RGB filled with one gray value. """
+    return Image.new('RGB', size, (value, value, value))
+
+  def testBayerMatrix(self):
+    """ Ensure Bayer matrices are generated. """
+    self.assertEqual(dithering.BayerMatrix(2), [[0, 2], [3, 1]])
+    matrix = dithering.BayerMatrix(4)
+    self.assertEqual(matrix[0], [0, 8, 2, 10])
+    self.assertEqual(sorted(rank for row in matrix for rank in row),
+                     list(range(16)))
+    with self.assertRaises(Exception):
+      dithering.BayerMatrix(3)
+
+  def testInvalidSettings(self):
+    """ Ensure out of range settings raise. """
+    for (bits, size) in ((0, 4), (9, 4), (4, 32), (4, 6)):
+      with self.assertRaises(Exception):
+        dithering.OrderedDither(bits, size)
+
+  def testOutputLevels(self):
+    """ Ensure only values of the output bit depth are produced. """
+    dither = dithering.OrderedDither(bits=2)
+    gradient = Image.new('RGB', (256, 4))
+    gradient.putdata([(x, 255 - x, x // 2) for y in range(4)
+                      for x in range(256)])
+    frame = dither.Apply(gradient)
+    colors = set(value for pixel in frame.getdata() for value in pixel)
+    self.assertEqual(colors, {0, 85, 170, 255})
+    # The panel keeps the top bits, which are exactly the level.
+    self.assertEqual(sorted(value >> 6 for value in colors), [0, 1, 2, 3])
+
+  def testPreservesAverage(self):
+    """ Ensure flat colors keep their average brightness. """
+    dither = dithering.OrderedDither(bits=3)
+    for value in (0, 20, 100, 128, 200, 255):
+      mean = ImageStat.Stat(dither.Apply(self.Gray(value))).mean[0]
+      self.assertAlmostEqual(mean, value, delta=4, msg=value)
+
+  def testExtremesExact(self):
+    """ Ensure black and white stay solid. """
+    dither = dithering.OrderedDither(bits=1)
+    self.assertEqual(dither.Apply(self.Gray(0)).getextrema(),
+                     ((0, 0),) * 3)
+    self.assertEqual(dither.Apply(self.Gray(255)).getextrema(),
+                     ((255, 255),) * 3)
+
+  def testIdentity(self):
+    """ Ensure 8 bit output leaves frames untouched. """
+    dither = dithering.OrderedDither(bits=8)
+    image = self.Gray(77)
+    self.assertIs(dither.Apply(image), image)
+
+  def testThresholdsCached(self):
+    """ Ensure threshold images are built once per frame size. """
+    dither = dithering.OrderedDither()
+    dither.Apply(self.Gray(50))
+    thresholds = dither._GetThresholds((32, 32), 0)
+    dither.Apply(self.Gray(60))
+    self.assertIs(dither._GetThresholds((32, 32), 0), thresholds)
+    self.assertEqual(len(dither._thresholds), 1)
+
+  def testTemporal(self):
+    """ Ensure temporal dithering rotates thresholds every frame. """
+    dither = dithering.OrderedDither(bits=2, temporal=True)
+    frames = [dither.Apply(self.Gray(100)).tobytes() for frame in range(5)]
+    self.assertEqual(len(set(frames[:4])), 4)
+    self.assertEqual(frames[4], frames[0])
+    # Every pixel averages close to the source over the rotation.
+    sums = [sum(values) / 4.0 for values in
+            zip(*(frame[::3] for frame in frames[:4]))]
+    self.assertLess(max(sums) - min(sums), 50)
+
+  def testCostMeasured(self):
+    """ Ensure the time spent dithering is measured. """
+    clock = FakeClock(0.001)
+    dither = dithering.OrderedDither(clock=clock.Time)
+    self.assertIsNone(dither.GetMeanTime())
+    dither.Apply(self.Gray(10))
+    dither.Apply(self.Gray(10))
+    self.assertEqual(dither.frames, 2)
+    self.assertAlmostEqual(dither.GetMeanTime(), 0.001)
+
+  def testMatrixInterface(self):
+    """ Ensure dithering is applied to pushed frames, after correction. """
+    dither = dithering.OrderedDither(bits=1)
+    matrix = matrix_manager.MatrixInterface(32, 1, dither=dither)
+    self.assertEqual(matrix._matrix.pwm_bits, 1)
+    matrix.SetBrightness(0.5)
+    matrix.offscreen_draw.rectangle((0, 0, 31, 31), fill=(255, 255, 255))
+    matrix.Render()
+    frame = matrix._matrix.GetFrameImage()
+    self.assertEqual(set(frame.getdata()), {(0, 0, 0), (255, 255, 255)})
+    self.assertAlmostEqual(ImageStat.Stat(frame).mean[0], 128, delta=8)
+    self.assertEqual(matrix.offscreen_buffer.getpixel((0, 0)),
+                     (255, 255, 255))
+
+
+if __name__ == '__main__':
+  unittest.main()
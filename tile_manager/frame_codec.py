@@ -0,0 +1,173 @@
+#
+# Keyframe and delta frame codec for composited matrix frames.
+#
+# Consecutive frames on a matrix display are usually almost identical (a few
+# scrolled text columns change), so frames are sent as an occasional raw
+# keyframe followed by deltas. A delta is the XOR of the previous and current
+# frame bytes, with runs of unchanged (zero) bytes run length encoded. Both
+# the XOR and the zero run search are done in C (integer XOR and re), never
+# per pixel in Python.
+#
+
+import re
+import struct
+
+KEYFRAME = 0
+DELTA = 1
+
+# Zero runs shorter than a run record are cheaper to keep as literals.
+_RUN_RECORD = struct.Struct('!II')
+_ZERO_RUN = re.compile(b'\x00{%d,}' % _RUN_RECORD.size)
+
+
+def XorBytes(a, b):
+  """ Returns bytes a XOR b, both must be the same length.
+
+  Args:
+    a: bytes first operand.
+    b: bytes second operand.
+  """
+  length = len(a)
+  return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(
+      length, 'big')
+
+
+def EncodeDelta(previous, current):
+  """ Encodes the difference between two frames.
+
+  The delta is a sequence of records, each a (literal length, zero run
+  length) pair followed by the literal XOR bytes.
+
+  Args:
+    previous: bytes raw previous frame.
+    current: bytes raw current frame, same length as previous.
+
+  Returns:
+    bytes encoded delta.
+  """
+  xor = XorBytes(previous, current)
+  records = []
+  position = 0
+  for run in _ZERO_RUN.finditer(xor):
+    records.append(_RUN_RECORD.pack(run.start() - position,
+                                    run.end() - run.start()))
+    records.append(xor[position:run.start()])
+    position = run.end()
+  if position < len(xor):
+    records.append(_RUN_RECORD.pack(len(xor) - position, 0))
+    records.append(xor[position:])
+  return b''.join(records)
+
+
+def ApplyDelta(previous, delta):
+  """ Reconstructs a frame from the previous frame and an encoded delta.
+
+  Args:
+    previous: bytes raw previous frame.
+    delta: bytes encoded delta from EncodeDelta.
+
+  Returns:
+    bytes raw current frame.
+
+  Raises:
+    Exception if the delta does not fit the previous frame.
+  """
+  xor = bytearray(len(previous))
+  position = offset = 0
+  while offset < len(delta):
+    (literal, run) = _RUN_RECORD.unpack_from(delta, offset)
+    offset += _RUN_RECORD.size
+    if position + literal + run > len(xor):
+      raise Exception('FrameCodec: delta larger than frame.')
+    xor[position:position + literal] = delta[offset:offset + literal]
+    offset += literal
+    position += literal + run
+  return XorBytes(previous, bytes(xor))
+
+
+class FrameEncoder(object):
+  """ Encodes a stream of frames into keyframes and deltas.
+
+  A keyframe is emitted for the first frame, when the frame size changes,
+  every keyframe_interval frames, when forced, or when a delta would be
+  larger than the raw frame.
+
+  Attributes:
+    keyframe_interval: Integer maximum frames between keyframes, 0 to only
+        send keyframes when required. Default: 30.
+  """
+
+  def __init__(self, keyframe_interval=30):
+    """ Initalize frame encoder.
+
+    Args:
+      keyframe_interval: Integer maximum frames between keyframes.
+          Default: 30.
+    """
+    self.keyframe_interval = keyframe_interval
+    self._previous = None
+    self._size = None
+    self._since_keyframe = 0
+    self._force_keyframe = False
+
+  def ForceKeyframe(self):
+    """ Emit a keyframe for the next encoded frame. """
+    self._force_keyframe = True
+
+  def Encode(self, image):
+    """ Encode a frame.
+
+    Args:
+      image: PIL.Image RGB frame to encode.
+
+    Returns:
+      Tuple (Integer: frame type, bytes: payload), frame type is KEYFRAME or
+      DELTA.
+    """
+    data = image.tobytes()
+    frame_type = KEYFRAME
+    payload = data
+    if (self._previous is not None and not self._force_keyframe and
+        image.size == self._size and
+        (not self.keyframe_interval or
+         self._since_keyframe < self.keyframe_interval)):
+      delta = EncodeDelta(self._previous, data)
+      if len(delta) < len(data):
+        (frame_type, payload) = (DELTA, delta)
+
+    self._since_keyframe = (self._since_keyframe + 1
+                            if frame_type == DELTA else 1)
+    self._force_keyframe = False
+    self._previous = data
+    self._size = image.size
+    return (frame_type, payload)
+
+
+class FrameDecoder(object):
+  """ Decodes a stream of keyframes and deltas back into raw frames. """
+
+  def __init__(self):
+    """ Initalize frame decoder. """
+    self._previous = None
+
+  def Reset(self):
+    """ Forget the previous frame, waiting for the next keyframe. """
+    self._previous = None
+
+  def Decode(self, frame_type, payload):
+    """ Decode a frame.
+
+    Args:
+      frame_type: Integer KEYFRAME or DELTA.
+      payload: bytes encoded frame.
+
+    Returns:
+      bytes raw frame, or None if a delta arrived without a base frame.
+    """
+    if frame_type == KEYFRAME:
+      self._previous = bytes(payload)
+    elif self._previous is None:
+      return None
+    else:
+      self._previous = ApplyDelta(self._previous, payload)
+    return self._previous
@@ -0,0 +1,86 @@
+#
+# Frame codec unittest.
+#
+
+import frame_codec
+import unittest
+from PIL import Image
+from PIL import ImageDraw
+
+
+class TestFrameCodec(unittest.TestCase):
+  """ Test keyframe and delta encoding of frames. """
+
+  def setUp(self):
+    """ Initalize frame codec test setup. """
+    self.first = Image.new('RGB', (64, 32))
+    self.second = self.first.copy()
+    ImageDraw.Draw(self.second).rectangle((10, 10, 20, 20), fill=(1, 2, 3))
+
+  def testXorBytes(self):
+    """ Ensure XOR is applied byte for byte. """
+    self.assertEqual(frame_codec.XorBytes(b'\x00\x0f\xff', b'\x0f\x0f\x00'),
+                     b'\x0f\x00\xff')
+
+  def testDeltaRoundTrip(self):
+    """ Ensure a delta reconstructs the current frame exactly. """
+    previous = self.first.tobytes()
+    current = self.second.tobytes()
+    delta = frame_codec.EncodeDelta(previous, current)
+    self.assertLess(len(delta), len(current))
+    self.assertEqual(frame_codec.ApplyDelta(previous, delta), current)
+
+  def testDeltaUnchangedFrame(self):
+    """ Ensure an unchanged frame encodes to almost nothing. """
+    data = self.second.tobytes()
+    delta = frame_codec.EncodeDelta(data, data)
+    self.assertLessEqual(len(delta), 8)
+    self.assertEqual(frame_codec.ApplyDelta(data, delta), data)
+
+  def testDeltaTrailingChange(self):
+    """ Ensure a change in the last bytes of a frame is encoded. """
+    previous = bytes(100)
+    current = bytes(99) + b'\x01'
+    delta = frame_codec.EncodeDelta(previous, current)
+    self.assertEqual(frame_codec.ApplyDelta(previous, delta), current)
+
+  def testEncoderKeyframeInterval(self):
+    """ Ensure keyframes are emitted first and on the interval. """
+    encoder = frame_codec.FrameEncoder(keyframe_interval=3)
+    types = [encoder.Encode(self.second)[0] for i in range(7)]
+    self.assertEqual(types, [frame_codec.KEYFRAME,
+                             frame_codec.DELTA,
+                             frame_codec.DELTA,
+                             frame_codec.KEYFRAME,
+                             frame_codec.DELTA,
+                             frame_codec.DELTA,
+                             frame_codec.KEYFRAME])
+
+  def testEncoderForceKeyframe(self):
+    """ Ensure a keyframe can be forced and a size change forces one. """
+    encoder = frame_codec.FrameEncoder()
+    encoder.Encode(self.first)
+    encoder.ForceKeyframe()
+    self.assertEqual(encoder.Encode(self.first)[0], frame_codec.KEYFRAME)
+    self.assertEqual(encoder.Encode(self.first)[0], frame_codec.DELTA)
+    self.assertEqual(encoder.Encode(Image.new('RGB', (32, 32)))[0],
+                     frame_codec.KEYFRAME)
+
+  def testDecoderStream(self):
+    """ Ensure a stream of frames decodes to the original frames. """
+    encoder = frame_codec.FrameEncoder()
+    decoder = frame_codec.FrameDecoder()
+    for image in (self.first, self.second, self.first):
+      self.assertEqual(decoder.Decode(*encoder.Encode(image)),
+                       image.tobytes())
+
+  def testDecoderDeltaWithoutKeyframe(self):
+    """ Ensure a delta without a base frame is rejected. """
+    encoder = frame_codec.FrameEncoder()
+    encoder.Encode(self.first)
+    decoder = frame_codec.FrameDecoder()
+    self.assertIsNone(decoder.Decode(*encoder.Encode(self.second)))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,276 @@
+#
+# Compact frame recording and memory-mapped replay.
+#
+# Composited frames are recorded into a single file instead of one PNG per
+# frame. A recording can be made from any TileManager by adding a writer as a
+# sink, then replayed to a matrix at the original or an accelerated rate; so
+# a playlist can be rendered once and played back with almost no CPU:
+#
+#   with frame_recorder.FrameRecordWriter('show.rgbr') as recorder:
+#     tile_manager.TileManager(tiles, 32, 2, sinks=[recorder]).Run()
+#
+#   with frame_recorder.FrameReplayer('show.rgbr') as replayer:
+#     replayer.Play(matrix, loop=True)
+#
+# File format (all values big endian):
+#
+#   header: magic 'RGBR', version, width, height
+#   frames: type (keyframe/delta), timestamp seconds, payload length, payload
+#   index:  offset, timestamp, type for every frame
+#   footer: index offset, frame count, magic 'RGBI'
+#
+# Payloads are raw RGB keyframes or XOR/RLE deltas, see frame_codec. The
+# index and footer are written on Close(); a recording that was not closed
+# (e.g. power loss) is still readable, the index is rebuilt by scanning the
+# frame records.
+#
+
+import bisect
+import frame_codec
+import mmap
+import os
+import struct
+import time
+from PIL import Image
+
+MAGIC = b'RGBR'
+INDEX_MAGIC = b'RGBI'
+VERSION = 1
+HEADER = struct.Struct('!4sHHH')
+FRAME = struct.Struct('!BdI')
+INDEX_ENTRY = struct.Struct('!QdB')
+FOOTER = struct.Struct('!QI4s')
+
+
+class FrameRecordWriter(object):
+  """ Streams frames into a recording file.
+
+  A writer is a MatrixInterface sink; Push() is called with every frame.
+
+  Attributes:
+    path: String location of the recording.
+    frame_count: Integer number of frames written.
+  """
+
+  def __init__(self, path, keyframe_interval=30, clock=time.time):
+    """ Initalize frame record writer, creating the file.
+
+    Args:
+      path: String location of the recording, overwritten if it exists.
+      keyframe_interval: Integer maximum frames between keyframes, this bounds
+          the work to seek to a random frame. Default: 30.
+      clock: Function returning the current time in seconds. Default:
+          time.time.
+    """
+    self.path = path
+    self.frame_count = 0
+    self._clock = clock
+    self._encoder = frame_codec.FrameEncoder(keyframe_interval)
+    self._file = open(path, 'wb')
+    self._size = None
+    self._start = None
+    self._index = []
+
+  def __enter__(self):
+    """ Enter runtime context for the writer. """
+    return self
+
+  def __exit__(self, type, value, traceback):
+    """ Exit runtime context for the writer, finishing the file. """
+    self.Close()
+
+  def Push(self, image):
+    """ Append a frame to the recording.
+
+    Args:
+      image: PIL.Image RGB frame to record.
+
+    Raises:
+      Exception if the frame size differs from the first frame recorded.
+    """
+    now = self._clock()
+    if self._size is None:
+      self._size = image.size
+      self._start = now
+      self._file.write(HEADER.pack(MAGIC, VERSION, image.size[0],
+                                   image.size[1]))
+    elif image.size != self._size:
+      raise Exception('FrameRecordWriter: frame size %s differs from %s.' %
+                      (image.size, self._size))
+    (frame_type, payload) = self._encoder.Encode(image)
+    timestamp = now - self._start
+    self._index.append(INDEX_ENTRY.pack(self._file.tell(), timestamp,
+                                        frame_type))
+    self._file.write(FRAME.pack(frame_type, timestamp, len(payload)))
+    self._file.write(payload)
+    self.frame_count += 1
+
+  def Close(self):
+    """ Write the index and footer, and close the file. """
+    if self._file.closed:
+      return
+    if self._size is not None:
+      index_offset = self._file.tell()
+      self._file.write(b''.join(self._index))
+      self._file.write(FOOTER.pack(index_offset, self.frame_count,
+                                   INDEX_MAGIC))
+    self._file.close()
+
+
+class FrameReplayer(object):
+  """ Reads frames from a memory-mapped recording.
+
+  Frames are decoded directly from the mapped file; only the current frame
+  is held in memory. Sequential reads apply one delta per frame, random reads
+  seek to the closest keyframe before the frame.
+
+  Attributes:
+    path: String location of the recording.
+    width: Integer frame width, in pixels.
+    height: Integer frame height, in pixels.
+    offsets: List of Integer file offsets of each frame record.
+    timestamps: List of Float seconds from the first frame for each frame.
+    keyframes: List of Integer indexes of keyframes.
+  """
+
+  def __init__(self, path):
+    """ Initalize replayer, mapping the recording.
+
+    Args:
+      path: String location of the recording.
+
+    Raises:
+      Exception if the file is not a recording.
+    """
+    self.path = path
+    if os.path.getsize(path) < HEADER.size:
+      raise Exception('FrameReplayer: %s is not a recording.' % path)
+    self._file = open(path, 'rb')
+    self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+    self._data = memoryview(self._map)
+    (magic, version, self.width, self.height) = HEADER.unpack_from(self._map)
+    if magic != MAGIC or version != VERSION:
+      self.Close()
+      raise Exception('FrameReplayer: %s is not a recording.' % path)
+    self.offsets = []
+    self.timestamps = []
+    self.keyframes = []
+    if not self._ReadIndex():
+      self._ScanFrames()
+    self._decoder = frame_codec.FrameDecoder()
+    self._current = None
+    self._frame = None
+
+  def __enter__(self):
+    """ Enter runtime context for the replayer. """
+    return self
+
+  def __exit__(self, type, value, traceback):
+    """ Exit runtime context for the replayer, unmapping the file. """
+    self.Close()
+
+  def __len__(self):
+    """ Returns Integer number of frames in the recording. """
+    return len(self.offsets)
+
+  def _ReadIndex(self):
+    """ Read the index written on Close().
+
+    Returns:
+      Boolean True if a valid index was found.
+    """
+    if len(self._map) < HEADER.size + FOOTER.size:
+      return False
+    (index_offset, count, magic) = FOOTER.unpack_from(
+        self._map, len(self._map) - FOOTER.size)
+    if (magic != INDEX_MAGIC or index_offset + count * INDEX_ENTRY.size !=
+        len(self._map) - FOOTER.size):
+      return False
+    for (index, (offset, timestamp, frame_type)) in enumerate(
+        INDEX_ENTRY.iter_unpack(self._data[index_offset:-FOOTER.size])):
+      self.offsets.append(offset)
+      self.timestamps.append(timestamp)
+      if frame_type == frame_codec.KEYFRAME:
+        self.keyframes.append(index)
+    return True
+
+  def _ScanFrames(self):
+    """ Rebuild the index by walking the frame records.
+
+    A truncated final frame is ignored.
+    """
+    offset = HEADER.size
+    while offset + FRAME.size <= len(self._map):
+      (frame_type, timestamp, length) = FRAME.unpack_from(self._map, offset)
+      if offset + FRAME.size + length > len(self._map):
+        break
+      if frame_type == frame_codec.KEYFRAME:
+        self.keyframes.append(len(self.offsets))
+      self.offsets.append(offset)
+      self.timestamps.append(timestamp)
+      offset += FRAME.size + length
+
+  def _Payload(self, index):
+    """ Returns Tuple (Integer: type, memoryview: payload) for a frame. """
+    offset = self.offsets[index]
+    (frame_type, timestamp, length) = FRAME.unpack_from(self._map, offset)
+    start = offset + FRAME.size
+    return (frame_type, self._data[start:start + length])
+
+  def GetFrame(self, index):
+    """ Returns PIL.Image RGB frame at an index.
+
+    Args:
+      index: Integer frame index.
+
+    Raises:
+      IndexError if the index is out of range.
+    """
+    if not 0 <= index < len(self.offsets):
+      raise IndexError('FrameReplayer: frame %d out of range.' % index)
+    if index == self._current:
+      return self._frame
+    start = self.keyframes[bisect.bisect_right(self.keyframes, index) - 1]
+    if self._current is not None and start <= self._current < index:
+      # Continue from the current frame instead of the keyframe.
+      start = self._current + 1
+    for position in range(start, index + 1):
+      data = self._decoder.Decode(*self._Payload(position))
+    self._current = index
+    self._frame = Image.frombytes('RGB', (self.width, self.height), data)
+    return self._frame
+
+  def Play(self, matrix, speed=1.0, loop=False, clock=time.time,
+           sleep=time.sleep):
+    """ Push frames to a matrix at the recorded rate.
+
+    Frames are recorded as displayed, so they are shown as is: color
+    correction and dithering of the matrix are not applied again.
+
+    Args:
+      matrix: matrix_manager.MatrixInterface to display on.
+      speed: Float playback rate, 2.0 is twice as fast. 0 plays as fast as
+          possible. Default: 1.0.
+      loop: Boolean True to loop infinitely, else play once. Default: False.
+      clock: Function returning the current time in seconds. Default:
+          time.time.
+      sleep: Function sleeping for a number of seconds. Default: time.sleep.
+    """
+    while True:
+      start = clock()
+      for index in range(len(self.offsets)):
+        if speed:
+          delay = start + self.timestamps[index] / speed - clock()
+          if delay > 0:
+            sleep(delay)
+        matrix.ShowFrame(self.GetFrame(index))
+      if not loop:
+        break
+
+  def Close(self):
+    """ Unmap and close the recording. """
+    if self._file.closed:
+      return
+    self._data.release()
+    self._map.close()
+    self._file.close()
@@ -0,0 +1,150 @@
+#
+# Frame recorder unittest.
+#
+
+import color_correction
+import frame_codec
+import frame_recorder
+import matrix_manager
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from PIL import ImageDraw
+
+
+class FakeClock(object):
+  """ Clock advancing only when slept. """
+
+  def __init__(self):
+    self.now = 1000.0
+    self.sleeps = []
+
+  def Time(self):
+    return self.now
+
+  def Sleep(self, seconds):
+    self.sleeps.append(seconds)
+    self.now += seconds
+
+
+class FakeMatrix(object):
+  """ Minimal MatrixInterface recording shown frames. """
+
+  def __init__(self):
+    self.rendered = []
+
+  def ShowFrame(self, frame):
+    self.rendered.append(frame.tobytes())
+
+
+class TestFrameRecorder(unittest.TestCase):
+  """ Test recording and replaying frames. """
+
+  def setUp(self):
+    """ Initalize frame recorder test setup. """
+    self.directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.directory)
+    self.path = os.path.join(self.directory, 'test.rgbr')
+    self.clock = FakeClock()
+    self.frames = []
+    for index in range(10):
+      image = Image.new('RGB', (64, 32))
+      ImageDraw.Draw(image).rectangle((index * 4, 0, index * 4 + 8, 8),
+                                      fill=(255, index * 20, 0))
+      self.frames.append(image)
+
+  def _Record(self, close=True):
+    """ Record the test frames, 0.5 seconds apart. """
+    writer = frame_recorder.FrameRecordWriter(self.path, keyframe_interval=4,
+                                              clock=self.clock.Time)
+    for image in self.frames:
+      writer.Push(image)
+      self.clock.now += 0.5
+    if close:
+      writer.Close()
+    else:
+      writer._file.flush()
+      self.addCleanup(writer._file.close)
+
+  def testRoundTrip(self):
+    """ Ensure every frame is read back exactly, in any order. """
+    self._Record()
+    with frame_recorder.FrameReplayer(self.path) as replayer:
+      self.assertEqual(len(replayer), 10)
+      self.assertEqual((replayer.width, replayer.height), (64, 32))
+      self.assertEqual(replayer.keyframes, [0, 4, 8])
+      self.assertEqual(replayer.timestamps[3], 1.5)
+      for index in [0, 1, 2, 9, 5, 3, 3, 7]:
+        self.assertEqual(replayer.GetFrame(index).tobytes(),
+                         self.frames[index].tobytes())
+      with self.assertRaises(IndexError):
+        replayer.GetFrame(10)
+
+  def testCompact(self):
+    """ Ensure deltas make the recording smaller than raw frames. """
+    self._Record()
+    raw = sum(len(image.tobytes()) for image in self.frames)
+    self.assertLess(os.path.getsize(self.path), raw / 2)
+
+  def testUnclosedRecording(self):
+    """ Ensure a recording without an index is rebuilt by scanning. """
+    self._Record(close=False)
+    with frame_recorder.FrameReplayer(self.path) as replayer:
+      self.assertEqual(len(replayer), 10)
+      self.assertEqual(replayer.GetFrame(9).tobytes(),
+                       self.frames[9].tobytes())
+
+  def testFrameSizeChange(self):
+    """ Ensure frames of a different size are rejected. """
+    with frame_recorder.FrameRecordWriter(self.path) as writer:
+      writer.Push(self.frames[0])
+      with self.assertRaises(Exception):
+        writer.Push(Image.new('RGB', (32, 32)))
+
+  def testNotARecording(self):
+    """ Ensure other files are rejected. """
+    with open(self.path, 'wb') as f:
+      f.write(b'not a recording at all')
+    with self.assertRaises(Exception):
+      frame_recorder.FrameReplayer(self.path)
+    open(self.path, 'wb').close()
+    with self.assertRaises(Exception):
+      frame_recorder.FrameReplayer(self.path)
+
+  def testPlay(self):
+    """ Ensure frames are pushed at the recorded rate. """
+    self._Record()
+    matrix = FakeMatrix()
+    clock = FakeClock()
+    with frame_recorder.FrameReplayer(self.path) as replayer:
+      replayer.Play(matrix, speed=2.0, clock=clock.Time, sleep=clock.Sleep)
+    self.assertEqual(matrix.rendered,
+                     [image.tobytes() for image in self.frames])
+    self.assertEqual(clock.sleeps, [0.25] * 9)
+
+  def testPlayNotCorrectedTwice(self):
+    """ Ensure recorded frames are replayed as displayed. """
+    correction = color_correction.ColorCorrection(gamma=2.2,
+                                                  gains=(1.0, 0.5, 0.8))
+    writer = frame_recorder.FrameRecordWriter(self.path, clock=self.clock.Time)
+    matrix = matrix_manager.MatrixInterface(32, 2,
+                                            color_correction=correction,
+                                            sinks=[writer])
+    displayed = []
+    for image in self.frames[:3]:
+      matrix.offscreen_buffer.paste(image, (0, 0))
+      matrix.Render()
+      displayed.append(matrix._matrix.GetFrameImage().tobytes())
+    writer.Close()
+    matrix.sinks = []
+    with frame_recorder.FrameReplayer(self.path) as replayer:
+      replayer.Play(matrix, speed=0)
+    self.assertEqual([matrix._matrix.GetFrameImage(index).tobytes()
+                      for index in range(-3, 0)], displayed)
+    self.assertNotEqual(displayed[-1], self.frames[2].tobytes())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,326 @@
+#
+# Frame tap for live previews of the display.
+#
+# A FrameTap is a MatrixInterface sink handing composited frames to any
+# number of subscribers (e.g. a web preview for remote ops) without slowing
+# the render loop down. Push() only copies the frame and appends it to every
+# subscriber's bounded queue; when a subscriber is slower than the display
+# its oldest frames are dropped, so it always gets the most recent ones and
+# never makes the render loop wait. Subscribers read and encode frames on
+# their own threads.
+#
+#   tap = frame_tap.FrameTap()
+#   m = tile_manager.TileManager(tiles, 32, 2, sinks=[tap])
+#   with frame_tap.PreviewServer(tap, port=8080) as server:
+#     m.Run(loop=True)
+#
+# The preview server answers:
+#
+#   /            HTML page showing the stream, scaled up without blurring
+#   /frame.png   latest frame as PNG
+#   /stream.mjpg frames as a multipart JPEG (MJPEG) stream
+#
+
+import collections
+import http.server
+import io
+import threading
+import time
+
+
+class TappedFrame(object):
+  """ Frame handed to subscribers.
+
+  Attributes:
+    sequence: Integer number of the frame since the tap was created.
+    time: Float time.time() the frame was pushed.
+    image: PIL.Image RGB frame, shared by subscribers: do not modify.
+  """
+
+  def __init__(self, sequence, time, image):
+    self.sequence = sequence
+    self.time = time
+    self.image = image
+
+  def Encode(self, format='PNG', quality=90):
+    """ Returns bytes frame encoded as an image file.
+
+    Args:
+      format: String Pillow image format, e.g. 'PNG' or 'JPEG'.
+          Default: 'PNG'.
+      quality: Integer JPEG quality. Default: 90.
+    """
+    data = io.BytesIO()
+    if format == 'JPEG':
+      self.image.save(data, format, quality=quality)
+    else:
+      self.image.save(data, format)
+    return data.getvalue()
+
+
+class Subscription(object):
+  """ Bounded queue of frames for one subscriber, dropping the oldest.
+
+  Attributes:
+    max_frames: Integer frames queued at most.
+    received: Integer number of frames queued.
+    dropped: Integer number of frames dropped unread.
+    closed: Boolean True once unsubscribed.
+  """
+
+  def __init__(self, max_frames):
+    """ Initalize subscription.
+
+    Args:
+      max_frames: Integer frames queued at most, 1 or more.
+    """
+    self.max_frames = max_frames
+    self.received = 0
+    self.dropped = 0
+    self.closed = False
+    self._frames = collections.deque()
+    self._ready = threading.Condition()
+
+  def Put(self, frame):
+    """ Queue a frame, dropping the oldest if full. Never blocks for long.
+
+    Args:
+      frame: TappedFrame to queue.
+    """
+    with self._ready:
+      if len(self._frames) >= self.max_frames:
+        self._frames.popleft()
+        self.dropped += 1
+      self._frames.append(frame)
+      self.received += 1
+      self._ready.notify()
+
+  def Get(self, timeout=None):
+    """ Returns the oldest queued TappedFrame, waiting for one.
+
+    Args:
+      timeout: Float seconds to wait at most. Default: None (forever).
+
+    Returns:
+      TappedFrame, or None on timeout or once closed.
+    """
+    with self._ready:
+      if not self._ready.wait_for(lambda: self._frames or self.closed,
+                                  timeout):
+        return None
+      if self._frames:
+        return self._frames.popleft()
+      return None
+
+  def Close(self):
+    """ Stop the subscription, waking up a waiting Get(). """
+    with self._ready:
+      self.closed = True
+      self._frames.clear()
+      self._ready.notify_all()
+
+
+class FrameTap(object):
+  """ Hands frames pushed to the matrix to subscribers.
+
+  Attributes:
+    frames: Integer number of frames pushed.
+    push_time: Float seconds spent in Push(), to check the tap's cost to the
+        render loop.
+  """
+
+  def __init__(self, clock=time.time):
+    """ Initalize frame tap.
+
+    Args:
+      clock: Function returning the current time in seconds, for frame
+          times. Default: time.time.
+    """
+    self.frames = 0
+    self.push_time = 0.0
+    self._clock = clock
+    self._latest = None
+    self._subscriptions = []
+    self._lock = threading.Lock()
+
+  def Subscribe(self, max_frames=2):
+    """ Returns a new Subscription receiving every frame from now on.
+
+    Args:
+      max_frames: Integer frames queued before the oldest are dropped.
+          Default: 2.
+
+    Raises:
+      Exception if max_frames is less than 1.
+    """
+    if max_frames < 1:
+      raise Exception('FrameTap: max_frames must be 1 or more.')
+    subscription = Subscription(max_frames)
+    with self._lock:
+      self._subscriptions = self._subscriptions + [subscription]
+    return subscription
+
+  def Unsubscribe(self, subscription):
+    """ Stop sending frames to a subscription, and close it.
+
+    Args:
+      subscription: Subscription from Subscribe().
+    """
+    with self._lock:
+      self._subscriptions = [existing for existing in self._subscriptions
+                             if existing is not subscription]
+    subscription.Close()
+
+  def GetSubscriberCount(self):
+    """ Returns Integer number of subscriptions. """
+    return len(self._subscriptions)
+
+  def GetLatest(self):
+    """ Returns the most recent TappedFrame, or None before the first. """
+    return self._latest
+
+  def Push(self, image):
+    """ Hand a frame to every subscriber.
+
+    The frame is copied, as the matrix keeps drawing into the same buffer.
+
+    Args:
+      image: PIL.Image RGB frame being displayed.
+    """
+    start = time.perf_counter()
+    self.frames += 1
+    self._latest = TappedFrame(self.frames, self._clock(), image.copy())
+    for subscription in self._subscriptions:
+      subscription.Put(self._latest)
+    self.push_time += time.perf_counter() - start
+
+  def Close(self):
+    """ Close every subscription. """
+    with self._lock:
+      (subscriptions, self._subscriptions) = (self._subscriptions, [])
+    for subscription in subscriptions:
+      subscription.Close()
+
+
+PAGE = b'''<!DOCTYPE html>
+<html><head><title>Matrix preview</title>
+<style>
+  body { background: #222; margin: 0; }
+  img { width: 100%%; image-rendering: pixelated; }
+</style></head>
+<body><img src="/stream.mjpg" alt="matrix preview"></body></html>
+'''.replace(b'%%', b'%')
+
+BOUNDARY = 'frame'
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+  """ Serves the preview page, the latest frame and the MJPEG stream. """
+
+  def do_GET(self):
+    """ Answer a preview request. """
+    path = self.path.split('?')[0]
+    if path == '/':
+      self._Send('text/html', PAGE)
+    elif path == '/frame.png':
+      frame = self.server.tap.GetLatest()
+      if frame is None:
+        self.send_error(503, 'No frame displayed yet')
+      else:
+        self._Send('image/png', frame.Encode('PNG'))
+    elif path == '/stream.mjpg':
+      self._Stream()
+    else:
+      self.send_error(404)
+
+  def _Send(self, content_type, body):
+    """ Send a complete response. """
+    self.send_response(200)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('Cache-Control', 'no-store')
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _Stream(self):
+    """ Send frames as JPEG parts until the client or server goes away.
+
+    Frames are encoded on this connection's thread. A slow client only
+    falls behind on its own subscription, losing its oldest frames.
+    """
+    preview = self.server.preview
+    subscription = preview.tap.Subscribe(preview.max_frames)
+    try:
+      self.send_response(200)
+      self.send_header('Content-Type',
+                       'multipart/x-mixed-replace; boundary=%s' % BOUNDARY)
+      self.send_header('Cache-Control', 'no-store')
+      self.end_headers()
+      while not subscription.closed:
+        frame = subscription.Get(timeout=0.5)
+        if frame is None:
+          continue
+        body = frame.Encode('JPEG', preview.quality)
+        self.wfile.write(('--%s\r\nContent-Type: image/jpeg\r\n'
+                          'Content-Length: %d\r\n\r\n' %
+                          (BOUNDARY, len(body))).encode('ascii'))
+        self.wfile.write(body + b'\r\n')
+    except (ConnectionError, OSError):
+      pass
+    finally:
+      preview.tap.Unsubscribe(subscription)
+
+  def log_message(self, format, *args):
+    """ Keep the display's log quiet. """
+    pass
+
+
+class PreviewServer(object):
+  """ Local HTTP server previewing the frames of a FrameTap.
+
+  Attributes:
+    tap: FrameTap frames are previewed from.
+    max_frames: Integer frames queued per stream client.
+    quality: Integer JPEG quality of the stream.
+    port: Integer port the server listens on.
+    url: String URL of the preview page.
+  """
+
+  def __init__(self, tap, host='127.0.0.1', port=0, max_frames=1,
+               quality=90):
+    """ Initalize and start the preview server.
+
+    Args:
+      tap: FrameTap to preview.
+      host: String address to listen on. Default: '127.0.0.1' (local only).
+      port: Integer port to listen on, 0 to pick a free port. Default: 0.
+      max_frames: Integer frames queued per stream client. Default: 1 (only
+          the latest).
+      quality: Integer JPEG quality of the stream. Default: 90.
+    """
+    self.tap = tap
+    self.max_frames = max_frames
+    self.quality = quality
+    self._server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    self._server.daemon_threads = True
+    self._server.tap = tap
+    self._server.preview = self
+    self.port = self._server.server_address[1]
+    self.url = 'http://%s:%d/' % (host, self.port)
+    self._thread = threading.Thread(target=self._server.serve_forever,
+                                    daemon=True)
+    self._thread.start()
+
+  def __enter__(self):
+    """ Enter runtime context for the preview server. """
+    return self
+
+  def __exit__(self, type, value, traceback):
+    """ Exit runtime context for the preview server, stopping it. """
+    self.Stop()
+
+  def Stop(self):
+    """ Stop the server, ending every stream. """
+    self._server.shutdown()
+    self.tap.Close()
+    self._server.server_close()
@@ -0,0 +1,153 @@
+#
+# Frame tap unittest.
+#
+
+import frame_tap
+import io
+import socket
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from PIL import Image
+from PIL import ImageDraw
+
+
+def Frame(index):
+  """ Returns PIL.Image distinct 64x32 frame for an index. """
+  image = Image.new('RGB', (64, 32))
+  ImageDraw.Draw(image).rectangle((index % 60, 0, index % 60 + 4, 8),
+                                  fill=(255, index % 256, 0))
+  return image
+
+
+class TestFrameTap(unittest.TestCase):
+  """ Test handing frames to subscribers. """
+
+  def setUp(self):
+    """ Initalize FrameTap test setup. """
+    self.tap = frame_tap.FrameTap()
+
+  def testSubscribe(self):
+    """ Ensure subscribers receive frames in order. """
+    subscription = self.tap.Subscribe(max_frames=4)
+    for index in range(3):
+      self.tap.Push(Frame(index))
+    for index in range(3):
+      frame = subscription.Get(timeout=1)
+      self.assertEqual(frame.sequence, index + 1)
+      self.assertEqual(frame.image.tobytes(), Frame(index).tobytes())
+    self.assertIsNone(subscription.Get(timeout=0))
+
+  def testFrameCopied(self):
+    """ Ensure frames are not changed by later drawing on the buffer. """
+    subscription = self.tap.Subscribe()
+    image = Frame(1)
+    self.tap.Push(image)
+    image.paste((0, 0, 255), (0, 0, 64, 32))
+    self.assertEqual(subscription.Get(timeout=1).image.tobytes(),
+                     Frame(1).tobytes())
+    self.assertEqual(self.tap.GetLatest().image.tobytes(), Frame(1).tobytes())
+
+  def testStuckSubscriber(self):
+    """ Ensure a subscriber never reading keeps only the newest frames. """
+    subscription = self.tap.Subscribe(max_frames=2)
+    for index in range(100):
+      self.tap.Push(Frame(index))
+    self.assertEqual((subscription.received, subscription.dropped), (100, 98))
+    self.assertEqual([subscription.Get(timeout=1).sequence for index in
+                      range(2)], [99, 100])
+
+  def testUnsubscribe(self):
+    """ Ensure closing wakes up a waiting subscriber. """
+    subscription = self.tap.Subscribe()
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(subscription.Get(timeout=5)))
+    thread.start()
+    self.tap.Unsubscribe(subscription)
+    thread.join()
+    self.assertEqual(results, [None])
+    self.assertEqual(self.tap.GetSubscriberCount(), 0)
+    self.tap.Push(Frame(0))
+    self.assertEqual(subscription.received, 0)
+
+  def testInvalidQueue(self):
+    """ Ensure subscriptions queue at least a frame. """
+    with self.assertRaises(Exception):
+      self.tap.Subscribe(max_frames=0)
+
+
+class TestPreviewServer(unittest.TestCase):
+  """ Test previewing frames over HTTP on localhost. """
+
+  def setUp(self):
+    """ Start a preview server on a free port. """
+    self.tap = frame_tap.FrameTap()
+    self.server = frame_tap.PreviewServer(self.tap)
+    self.addCleanup(self.server.Stop)
+
+  def _WaitForSubscribers(self, count):
+    """ Wait until count stream clients are subscribed. """
+    deadline = time.time() + 5
+    while self.tap.GetSubscriberCount() < count and time.time() < deadline:
+      time.sleep(0.01)
+    self.assertEqual(self.tap.GetSubscriberCount(), count)
+
+  def testPage(self):
+    """ Ensure the page shows the stream. """
+    with urllib.request.urlopen(self.server.url, timeout=5) as response:
+      self.assertIn(b'/stream.mjpg', response.read())
+
+  def testLatestFrame(self):
+    """ Ensure the latest frame is served as PNG. """
+    with self.assertRaises(urllib.error.HTTPError):
+      urllib.request.urlopen(self.server.url + 'frame.png', timeout=5)
+    self.tap.Push(Frame(1))
+    self.tap.Push(Frame(2))
+    with urllib.request.urlopen(self.server.url + 'frame.png',
+                                timeout=5) as response:
+      image = Image.open(io.BytesIO(response.read()))
+      self.assertEqual(image.convert('RGB').tobytes(), Frame(2).tobytes())
+
+  def testStream(self):
+    """ Ensure the stream sends frames as JPEG parts. """
+    response = urllib.request.urlopen(self.server.url + 'stream.mjpg',
+                                      timeout=5)
+    self.addCleanup(response.close)
+    self.assertIn('multipart/x-mixed-replace',
+                  response.headers['Content-Type'])
+    self._WaitForSubscribers(1)
+    self.tap.Push(Frame(3))
+    self.assertEqual(response.readline(), b'--frame\r\n')
+    self.assertEqual(response.readline(), b'Content-Type: image/jpeg\r\n')
+    length = int(response.readline().split(b':')[1])
+    response.readline()
+    image = Image.open(io.BytesIO(response.read(length)))
+    self.assertEqual((image.format, image.size), ('JPEG', (64, 32)))
+
+  def testSlowClient(self):
+    """ Ensure a client never reading does not slow pushing frames down. """
+    client = socket.create_connection(('127.0.0.1', self.server.port))
+    self.addCleanup(client.close)
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    client.sendall(b'GET /stream.mjpg HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    self._WaitForSubscribers(1)
+    subscription = self.tap._subscriptions[0]
+
+    # Frames of noise encode to large JPEGs, quickly filling socket buffers.
+    noise = Image.frombytes('RGB', (64, 32), bytes(
+        (index * 7919) % 251 for index in range(64 * 32 * 3)))
+    start = time.perf_counter()
+    for index in range(2000):
+      self.tap.Push(noise)
+    elapsed = time.perf_counter() - start
+    # The render thread never waits for the client: only copies and queues.
+    self.assertLess(self.tap.push_time / self.tap.frames, 0.001)
+    self.assertLess(elapsed, 2)
+    self.assertGreater(subscription.dropped, 1000)
+
+
+if __name__ == '__main__':
+  unittest.main()
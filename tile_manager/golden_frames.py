@@ -0,0 +1,199 @@
+#
+# Golden frame manifests for verifying tile renders.
+#
+# A manifest holds every frame of a tile sequence in one file: a header with
+# the frame size and a content hash per frame, followed by the frames as one
+# keyframe plus XOR/RLE deltas (see frame_codec), zlib compressed.
+#
+# Verifying a render only hashes the rendered frames (C speed) and compares
+# them with the manifest hashes, which is exact: moved pixels change the
+# hash. Frames are only decoded to report the first differing frame and the
+# bounding box of the difference.
+#
+#   images = golden_frames.RenderFrames(tile)
+#   golden_frames.WriteManifest('testdata/weather/step_render_large.golden',
+#                               images)
+#   mismatch = golden_frames.GoldenManifest(
+#       'testdata/weather/step_render_large.golden').Compare(images)
+#
+
+import frame_codec
+import hashlib
+import json
+import struct
+import zlib
+from PIL import Image
+from PIL import ImageChops
+
+MAGIC = b'GOLDEN1\n'
+
+_RECORD = struct.Struct('!BI')
+
+
+def HashFrame(image):
+  """ Returns String hash of an image's size and RGB pixels.
+
+  Args:
+    image: PIL.Image frame to hash.
+  """
+  if image.mode != 'RGB':
+    image = image.convert('RGB')
+  digest = hashlib.sha1(b'%dx%d:' % image.size)
+  digest.update(image.tobytes())
+  return digest.hexdigest()
+
+
+def RenderFrames(tile, frames=None):
+  """ Returns List of PIL.Image copies of a tile's rendered frames.
+
+  The tile is rendered and stepped like TileManager would.
+
+  Args:
+    tile: BaseTile or subclass tile object to render.
+    frames: Integer number of frames to render.
+        Default: None (tile.GetMaxFrames()).
+  """
+  if frames is None:
+    frames = tile.GetMaxFrames()
+  images = []
+  for index in range(frames):
+    images.append(tile.Render().copy())
+    tile.StepFrame()
+  return images
+
+
+def WriteManifest(path, images):
+  """ Write a golden frame manifest, replacing an existing one.
+
+  Args:
+    path: String location of the manifest.
+    images: List of PIL.Image frames, all the same size.
+
+  Raises:
+    Exception if the frames differ in size.
+  """
+  size = images[0].size if images else (0, 0)
+  encoder = frame_codec.FrameEncoder(keyframe_interval=0)
+  hashes = []
+  records = []
+  for image in images:
+    if image.size != size:
+      raise Exception('GoldenManifest: frames must all be %dx%d.' % size)
+    if image.mode != 'RGB':
+      image = image.convert('RGB')
+    hashes.append(HashFrame(image))
+    (frame_type, payload) = encoder.Encode(image)
+    records.append(_RECORD.pack(frame_type, len(payload)))
+    records.append(payload)
+  header = json.dumps({'size': list(size), 'hashes': hashes},
+                      sort_keys=True).encode('utf-8')
+  with open(path, 'wb') as manifest:
+    manifest.write(MAGIC)
+    manifest.write(zlib.compress(header + b'\n' + b''.join(records), 9))
+
+
+class FrameMismatch(object):
+  """ First difference between rendered frames and a manifest.
+
+  Attributes:
+    index: Integer index of the first differing frame.
+    box: Tuple (Integer: left, upper, right, lower) bounding box of the
+        differing pixels, or None if the frame is missing.
+    message: String description of the difference.
+  """
+
+  def __init__(self, index, box, message):
+    """ Initalize frame mismatch.
+
+    Args:
+      index: Integer index of the first differing frame.
+      box: Tuple bounding box of the differing pixels, or None.
+      message: String description of the difference.
+    """
+    self.index = index
+    self.box = box
+    self.message = message
+
+  def __str__(self):
+    return self.message
+
+
+class GoldenManifest(object):
+  """ Golden frames of a tile sequence, loaded from a manifest.
+
+  Attributes:
+    path: String location of the manifest.
+    size: Tuple (Integer: X, Integer: Y) frame size in pixels.
+    hashes: List of String frame hashes, see HashFrame.
+  """
+
+  def __init__(self, path):
+    """ Load a golden frame manifest.
+
+    Args:
+      path: String location of the manifest.
+
+    Raises:
+      Exception if the file is not a golden frame manifest.
+    """
+    self.path = path
+    with open(path, 'rb') as manifest:
+      data = manifest.read()
+    if not data.startswith(MAGIC):
+      raise Exception('GoldenManifest: %s is not a manifest.' % path)
+    data = zlib.decompress(data[len(MAGIC):])
+    end = data.index(b'\n')
+    header = json.loads(data[:end].decode('utf-8'))
+    self.size = tuple(header['size'])
+    self.hashes = header['hashes']
+    self._records = data[end + 1:]
+    self._frames = None
+
+  def __len__(self):
+    return len(self.hashes)
+
+  def _Decode(self):
+    """ Returns List of bytes raw RGB frames, decoded once. """
+    if self._frames is None:
+      decoder = frame_codec.FrameDecoder()
+      frames = []
+      offset = 0
+      while offset < len(self._records):
+        (frame_type, length) = _RECORD.unpack_from(self._records, offset)
+        offset += _RECORD.size
+        frames.append(decoder.Decode(
+            frame_type, self._records[offset:offset + length]))
+        offset += length
+      self._frames = frames
+    return self._frames
+
+  def GetFrame(self, index):
+    """ Returns PIL.Image RGB golden frame.
+
+    Args:
+      index: Integer frame index.
+    """
+    return Image.frombytes('RGB', self.size, self._Decode()[index])
+
+  def Compare(self, images):
+    """ Returns FrameMismatch for the first frame differing, or None.
+
+    Args:
+      images: List of PIL.Image rendered frames.
+    """
+    for (index, image) in enumerate(images[:len(self.hashes)]):
+      if HashFrame(image) == self.hashes[index]:
+        continue
+      if image.size != self.size:
+        return FrameMismatch(index, None,
+                             '%s: frame %d is %dx%d, golden is %dx%d.' %
+                             ((self.path, index) + image.size + self.size))
+      box = ImageChops.difference(image.convert('RGB'),
+                                  self.GetFrame(index)).getbbox()
+      return FrameMismatch(index, box, '%s: frame %d differs in %s.' %
+                           (self.path, index, box))
+    if len(images) != len(self.hashes):
+      return FrameMismatch(min(len(images), len(self.hashes)), None,
+                           '%s: %d frames rendered, golden has %d.' %
+                           (self.path, len(images), len(self.hashes)))
+    return None
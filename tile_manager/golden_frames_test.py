@@ -0,0 +1,102 @@
+#
+# Golden frame manifest unittest.
+#
+
+import base_tile
+import golden_frames
+import os
+import shutil
+import tempfile
+import unittest
+import unittest_tiletest
+from PIL import Image
+
+
+class ScrollingTile(base_tile.BaseTile):
+  """ Tile scrolling a small square to the right. """
+
+  def __init__(self, color=base_tile.RED):
+    base_tile.BaseTile.__init__(self, scrolling=(1, 0))
+    self.color = color
+
+  def _GetRenderSize(self):
+    return (4, 4)
+
+  def Render(self):
+    self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
+                               fill=base_tile.BLACK)
+    self._image_draw.rectangle((self.x, 10, self.x + 3, 13), fill=self.color)
+    self.displayed = True
+    return self._image_buffer
+
+
+class TestGoldenFrames(unittest_tiletest.TileTest):
+  """ Test writing and verifying golden frame manifests. """
+
+  def setUp(self):
+    """ Initalize golden manifest test setup. """
+    self.directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.directory)
+    self.path = os.path.join(self.directory, 'scrolling.golden')
+    self.WriteGoldenFrames(ScrollingTile(), self.path)
+
+  def testRoundTrip(self):
+    """ Ensure manifests store every frame exactly. """
+    manifest = golden_frames.GoldenManifest(self.path)
+    images = golden_frames.RenderFrames(ScrollingTile())
+    self.assertEqual(len(manifest), 32)
+    self.assertEqual(manifest.size, (32, 32))
+    for (index, image) in enumerate(images):
+      self.assertEqual(manifest.GetFrame(index).tobytes(), image.tobytes())
+    self.assertIsNone(manifest.Compare(images))
+    self.AssertGoldenFrames(ScrollingTile(), self.path)
+
+  def testMovedPixels(self):
+    """ Ensure moved pixels are reported with the first frame and box. """
+    images = golden_frames.RenderFrames(ScrollingTile())
+    images[5] = images[6]
+    mismatch = golden_frames.GoldenManifest(self.path).Compare(images)
+    self.assertEqual(mismatch.index, 5)
+    self.assertEqual(mismatch.box, (5, 10, 10, 14))
+    self.assertIn('frame 5', str(mismatch))
+
+  def testColorChange(self):
+    """ Ensure tiles drawing other colors fail verification. """
+    with self.assertRaises(AssertionError):
+      self.AssertGoldenFrames(ScrollingTile(base_tile.GREEN), self.path)
+
+  def testFrameCount(self):
+    """ Ensure missing or extra frames are reported. """
+    manifest = golden_frames.GoldenManifest(self.path)
+    images = golden_frames.RenderFrames(ScrollingTile())
+    self.assertEqual(manifest.Compare(images[:10]).index, 10)
+    mismatch = manifest.Compare(images + [images[0]])
+    self.assertEqual(mismatch.index, 32)
+    self.assertIsNone(mismatch.box)
+
+  def testFrameSize(self):
+    """ Ensure frames of another size are reported. """
+    mismatch = golden_frames.GoldenManifest(self.path).Compare(
+        [Image.new('RGB', (64, 32))])
+    self.assertEqual(mismatch.index, 0)
+    self.assertIsNone(mismatch.box)
+
+  def testRegenerate(self):
+    """ Ensure goldens are regenerated from the environment. """
+    os.environ['REGENERATE_GOLDENS'] = '1'
+    self.addCleanup(os.environ.pop, 'REGENERATE_GOLDENS')
+    self.AssertGoldenFrames(ScrollingTile(base_tile.GREEN), self.path)
+    self.assertEqual(
+        golden_frames.GoldenManifest(self.path).GetFrame(0).getpixel((0, 10)),
+        base_tile.GREEN)
+
+  def testNotAManifest(self):
+    """ Ensure other files are rejected. """
+    path = os.path.join(self.directory, 'frame.png')
+    Image.new('RGB', (32, 32)).save(path)
+    with self.assertRaises(Exception):
+      golden_frames.GoldenManifest(path)
+
+
+if __name__ == '__main__':
+  unittest.main()
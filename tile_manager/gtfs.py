@@ -0,0 +1,521 @@
+#
+# GTFS schedule loader for route tiles.
+#
+# A static GTFS feed (a zip of CSV files, or a directory of them) is streamed
+# into compact array indexes of departure times keyed by stop, route and
+# service, so route tiles can be fed from feeds with millions of stop times:
+#
+#   feed = gtfs.GtfsFeed('muni.zip', stop_ids=['15731'])
+#   tile = feed.CreateRouteTile('15731', 'N')
+#   ...
+#   feed.LoadRealtime('trip_updates.pb')
+#   feed.UpdateRouteTile(tile, '15731', 'N')
+#
+# Departure times are stored as seconds from the start of their service day
+# (noon minus 12 hours, times may exceed 24:00:00), sorted, so the next
+# departures are found by bisecting the arrays of the services active on a
+# given day. Realtime delays are read from GTFS-realtime TripUpdates files.
+#
+
+import array
+import bisect
+import csv
+import datetime
+import heapq
+import io
+import json
+import os
+import pytz
+import route
+import zipfile
+
+try:
+  from google.transit import gtfs_realtime_pb2
+except ImportError:
+  gtfs_realtime_pb2 = None
+
+# calendar_dates.txt exception types.
+SERVICE_ADDED = '1'
+SERVICE_REMOVED = '2'
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+            'saturday', 'sunday')
+
+
+def ParseTime(value):
+  """ Returns Integer seconds from a GTFS 'HH:MM:SS' time, or None if empty.
+
+  Args:
+    value: String GTFS time, hours may be 24 or more.
+  """
+  if not value:
+    return None
+  (hours, minutes, seconds) = value.strip().split(':')
+  return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def ParseDate(value):
+  """ Returns datetime.date from a GTFS 'YYYYMMDD' date.
+
+  Args:
+    value: String GTFS date.
+  """
+  return datetime.date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+
+class GtfsFeed(object):
+  """ Indexed departures of a static GTFS feed.
+
+  Stop, route, service and trip ids are interned as Integers; departures for
+  each (stop, route, service) are kept in a pair of arrays (departure seconds
+  and trip) sorted by departure.
+
+  Attributes:
+    path: String location of the feed zip or directory.
+    timezone: pytz.timezone of the feed, from agency.txt.
+    route_names: Dictionary route id String to display name String.
+    stop_time_count: Integer number of indexed stop times.
+    ACTIVE_SERVICE_CACHE: Integer number of days of active services cached.
+  """
+  ACTIVE_SERVICE_CACHE = 7
+
+  def __init__(self, path, stop_ids=None, route_ids=None):
+    """ Initalize GTFS feed, loading and indexing the static schedule.
+
+    Args:
+      path: String location of a GTFS zip, or a directory of GTFS files.
+      stop_ids: List of String stop ids to index. Default: None (all).
+      route_ids: List of String route ids to index. Default: None (all).
+
+    Raises:
+      Exception if a required GTFS file is missing.
+    """
+    self.path = path
+    self.timezone = route.AbstractRouteTile.TIME_ZONE
+    self.route_names = {}
+    self.stop_time_count = 0
+    self._stop_filter = set(stop_ids) if stop_ids else None
+    self._route_filter = set(route_ids) if route_ids else None
+    self._stops = {}
+    self._routes = {}
+    self._services = {}
+    self._trips = {}
+    self._trip_ids = []
+    self._calendar = []
+    self._calendar_dates = {}
+    self._departures = {}
+    self._active_services = {}
+    self._delays = {}
+    self._stop_delays = {}
+    self._min_delay = 0
+    self._max_delay = 0
+    self._archive = None
+    if not os.path.isdir(path):
+      self._archive = zipfile.ZipFile(path)
+    try:
+      self._LoadAgency()
+      self._LoadRoutes()
+      self._LoadCalendar()
+      self._LoadTrips()
+      self._LoadStopTimes()
+    finally:
+      if self._archive:
+        self._archive.close()
+        self._archive = None
+
+  def _Intern(self, ids, value):
+    """ Returns Integer index for an id String, adding it if new.
+
+    Args:
+      ids: Dictionary id String to Integer index.
+      value: String id.
+    """
+    index = ids.get(value)
+    if index is None:
+      index = ids[value] = len(ids)
+    return index
+
+  def _Rows(self, filename, required=True):
+    """ Stream the rows of a GTFS file.
+
+    Args:
+      filename: String GTFS file name, e.g. 'trips.txt'.
+      required: Boolean True to raise if the file does not exist.
+
+    Yields:
+      Dictionary column name String to Integer column position, once, followed
+      by Lists of String values for each row.
+
+    Raises:
+      Exception if a required file does not exist.
+    """
+    try:
+      if self._archive:
+        data = io.TextIOWrapper(self._archive.open(filename),
+                                encoding='utf-8-sig', newline='')
+      else:
+        data = open(os.path.join(self.path, filename), encoding='utf-8-sig',
+                    newline='')
+    except (KeyError, FileNotFoundError):
+      if required:
+        raise Exception('GtfsFeed: %s missing from %s.' % (filename, self.path))
+      return
+    with data:
+      reader = csv.reader(data)
+      header = next(reader, [])
+      yield {name.strip(): index for (index, name) in enumerate(header)}
+      for row in reader:
+        if row:
+          yield row
+
+  def _LoadAgency(self):
+    """ Load the feed timezone from agency.txt. """
+    rows = self._Rows('agency.txt', required=False)
+    columns = next(rows, {})
+    for row in rows:
+      if 'agency_timezone' in columns:
+        self.timezone = pytz.timezone(row[columns['agency_timezone']])
+      break
+
+  def _LoadRoutes(self):
+    """ Load route display names from routes.txt. """
+    rows = self._Rows('routes.txt')
+    columns = next(rows)
+    for row in rows:
+      route_id = row[columns['route_id']]
+      name = ''
+      for column in ('route_short_name', 'route_long_name'):
+        if column in columns and row[columns[column]]:
+          name = row[columns[column]]
+          break
+      self.route_names[route_id] = name or route_id
+
+  def _LoadCalendar(self):
+    """ Load service days from calendar.txt and calendar_dates.txt.
+
+    Either file may be missing, as allowed by GTFS.
+    """
+    rows = self._Rows('calendar.txt', required=False)
+    columns = next(rows, {})
+    for row in rows:
+      weekdays = 0
+      for (day, name) in enumerate(WEEKDAYS):
+        if row[columns[name]] == '1':
+          weekdays |= 1 << day
+      self._calendar.append((
+          self._Intern(self._services, row[columns['service_id']]),
+          weekdays,
+          ParseDate(row[columns['start_date']]),
+          ParseDate(row[columns['end_date']])))
+
+    rows = self._Rows('calendar_dates.txt', required=False)
+    columns = next(rows, {})
+    for row in rows:
+      date = ParseDate(row[columns['date']])
+      self._calendar_dates.setdefault(date, []).append((
+          self._Intern(self._services, row[columns['service_id']]),
+          row[columns['exception_type']]))
+
+  def _LoadTrips(self):
+    """ Load the route and service of every trip from trips.txt. """
+    rows = self._Rows('trips.txt')
+    columns = next(rows)
+    for row in rows:
+      route_id = row[columns['route_id']]
+      if self._route_filter and route_id not in self._route_filter:
+        continue
+      trip_id = row[columns['trip_id']]
+      self._trips[trip_id] = (
+          len(self._trip_ids),
+          self._Intern(self._routes, route_id),
+          self._Intern(self._services, row[columns['service_id']]))
+      self._trip_ids.append(trip_id)
+
+  def _LoadStopTimes(self):
+    """ Stream stop_times.txt into sorted departure arrays. """
+    rows = self._Rows('stop_times.txt')
+    columns = next(rows)
+    trip_column = columns['trip_id']
+    stop_column = columns['stop_id']
+    departure_column = columns['departure_time']
+    arrival_column = columns.get('arrival_time')
+    for row in rows:
+      stop_id = row[stop_column]
+      if self._stop_filter and stop_id not in self._stop_filter:
+        continue
+      trip = self._trips.get(row[trip_column])
+      if trip is None:
+        continue
+      departure = ParseTime(row[departure_column])
+      if departure is None and arrival_column is not None:
+        departure = ParseTime(row[arrival_column])
+      if departure is None:
+        # Untimed stop, interpolated by consumers; not displayed.
+        continue
+      (trip_index, route_index, service_index) = trip
+      key = (self._Intern(self._stops, stop_id), route_index, service_index)
+      arrays = self._departures.get(key)
+      if arrays is None:
+        arrays = self._departures[key] = (array.array('l'), array.array('l'))
+      arrays[0].append(departure)
+      arrays[1].append(trip_index)
+      self.stop_time_count += 1
+
+    for (key, (departures, trips)) in self._departures.items():
+      order = sorted(range(len(departures)), key=departures.__getitem__)
+      self._departures[key] = (
+          array.array('l', (departures[index] for index in order)),
+          array.array('l', (trips[index] for index in order)))
+
+  def GetActiveServices(self, date):
+    """ Returns frozenset of Integer services running on a day.
+
+    Results are cached for the most recent ACTIVE_SERVICE_CACHE days.
+
+    Args:
+      date: datetime.date service day.
+    """
+    services = self._active_services.get(date)
+    if services is not None:
+      return services
+    services = set()
+    weekday = 1 << date.weekday()
+    for (service, weekdays, start, end) in self._calendar:
+      if weekdays & weekday and start <= date <= end:
+        services.add(service)
+    for (service, exception_type) in self._calendar_dates.get(date, ()):
+      if exception_type == SERVICE_ADDED:
+        services.add(service)
+      elif exception_type == SERVICE_REMOVED:
+        services.discard(service)
+    if len(self._active_services) >= self.ACTIVE_SERVICE_CACHE:
+      self._active_services.pop(min(self._active_services))
+    services = self._active_services[date] = frozenset(services)
+    return services
+
+  def _ServiceDayStart(self, date):
+    """ Returns Float timestamp GTFS times on a service day are relative to.
+
+    GTFS times count from noon minus 12 hours, which is midnight except on
+    daylight saving time changes.
+
+    Args:
+      date: datetime.date service day.
+    """
+    noon = self.timezone.localize(
+        datetime.datetime(date.year, date.month, date.day, 12))
+    return noon.timestamp() - 12 * 3600
+
+  def _GetDelay(self, trip, stop):
+    """ Returns Integer seconds of realtime delay for a trip at a stop.
+
+    Args:
+      trip: Integer trip index.
+      stop: Integer stop index.
+    """
+    delay = self._stop_delays.get((trip, stop))
+    if delay is None:
+      delay = self._delays.get(trip, 0)
+    return delay
+
+  def _Scheduled(self, stop, route_index, after):
+    """ Yields scheduled departures from a timestamp, in order.
+
+    Args:
+      stop: Integer stop index.
+      route_index: Integer route index.
+      after: Float timestamp of the earliest departure.
+
+    Yields:
+      Tuple (Float: timestamp, Integer: trip index).
+    """
+    day = datetime.datetime.fromtimestamp(after, self.timezone).date()
+    streams = []
+    # Trips of the previous service day may run past midnight.
+    for offset in range(-1, 2):
+      date = day + datetime.timedelta(days=offset)
+      start = self._ServiceDayStart(date)
+      for service in self.GetActiveServices(date):
+        arrays = self._departures.get((stop, route_index, service))
+        if arrays is None:
+          continue
+        streams.append(self._Stream(arrays, start, after))
+    return heapq.merge(*streams)
+
+  def _Stream(self, arrays, start, after):
+    """ Yields departures of one service day from a timestamp, in order.
+
+    Args:
+      arrays: Tuple (array: departure seconds, array: trip indexes).
+      start: Float timestamp of the service day start.
+      after: Float timestamp of the earliest departure.
+
+    Yields:
+      Tuple (Float: timestamp, Integer: trip index).
+    """
+    (departures, trips) = arrays
+    for index in range(bisect.bisect_left(departures, after - start),
+                       len(departures)):
+      yield (start + departures[index], trips[index])
+
+  def GetDepartures(self, stop_id, route_id, now=None,
+                    count=route.AbstractRouteTile.NUMBER_STOPS):
+    """ Returns the next departures of a route from a stop.
+
+    Realtime delays are applied, departures already gone are skipped.
+    Departures are searched until the end of the next service day.
+
+    Args:
+      stop_id: String GTFS stop id.
+      route_id: String GTFS route id.
+      now: datetime timezone aware time to find departures after.
+          Default: None (current time).
+      count: Integer maximum number of departures.
+          Default: route.AbstractRouteTile.NUMBER_STOPS.
+
+    Returns:
+      List of datetime timezone aware departures, in order.
+    """
+    stop = self._stops.get(stop_id)
+    route_index = self._routes.get(route_id)
+    if stop is None or route_index is None or count <= 0:
+      return []
+    now = (now or datetime.datetime.now(self.timezone)).timestamp()
+    departures = []
+    for (scheduled, trip) in self._Scheduled(stop, route_index,
+                                             now - self._max_delay):
+      if (len(departures) >= count and
+          scheduled + self._min_delay > departures[-1][0]):
+        break
+      departure = scheduled + self._GetDelay(trip, stop)
+      if departure < now:
+        continue
+      bisect.insort(departures, (departure, trip))
+      del departures[count:]
+    return [datetime.datetime.fromtimestamp(departure, self.timezone)
+            for (departure, trip) in departures]
+
+  def CreateRouteTile(self, stop_id, route_id, now=None,
+                      tile_class=route.RouteTile32x32, **kwargs):
+    """ Returns a route tile showing the next departures of a route.
+
+    Args:
+      stop_id: String GTFS stop id.
+      route_id: String GTFS route id.
+      now: datetime timezone aware time to find departures after.
+          Default: None (current time).
+      tile_class: route.AbstractRouteTile subclass to create.
+          Default: route.RouteTile32x32.
+      kwargs: Additional tile arguments, such as scrolling.
+    """
+    tile = tile_class(route_name=self.route_names.get(route_id, route_id),
+                      **kwargs)
+    self.UpdateRouteTile(tile, stop_id, route_id, now)
+    return tile
+
+  def UpdateRouteTile(self, tile, stop_id, route_id, now=None):
+    """ Replace the stops of a route tile with the next departures.
+
+    Args:
+      tile: route.AbstractRouteTile to update.
+      stop_id: String GTFS stop id.
+      route_id: String GTFS route id.
+      now: datetime timezone aware time to find departures after.
+          Default: None (current time).
+    """
+    tile.SetStops(self.GetDepartures(stop_id, route_id, now,
+                                     tile.NUMBER_STOPS))
+
+  def _SetDelays(self, updates):
+    """ Replace realtime delays.
+
+    A trip delay applies to every stop of the trip without its own delay;
+    without a trip delay the first stop delay of the trip is used.
+
+    Args:
+      updates: Iterable of Tuple (String: trip id, String: stop id or None,
+          Integer: delay seconds).
+    """
+    self._delays = {}
+    self._stop_delays = {}
+    for (trip_id, stop_id, delay) in updates:
+      trip = self._trips.get(trip_id)
+      if trip is None:
+        continue
+      if stop_id is None:
+        self._delays[trip[0]] = delay
+        continue
+      stop = self._stops.get(stop_id)
+      if stop is not None:
+        self._stop_delays[(trip[0], stop)] = delay
+      self._delays.setdefault(trip[0], delay)
+    delays = list(self._delays.values()) + list(self._stop_delays.values())
+    self._min_delay = min([0] + delays)
+    self._max_delay = max([0] + delays)
+
+  def _ParseRealtimeJson(self, data):
+    """ Yields delay updates from a GTFS-realtime FeedMessage as JSON.
+
+    Args:
+      data: bytes JSON FeedMessage, as produced by protobuf json_format.
+    """
+    message = json.loads(data.decode('utf-8'))
+    for entity in message.get('entity', []):
+      update = entity.get('trip_update') or entity.get('tripUpdate')
+      if not update:
+        continue
+      trip_id = update.get('trip', {}).get('trip_id',
+                                           update.get('trip', {}).get('tripId'))
+      if 'delay' in update:
+        yield (trip_id, None, int(update['delay']))
+      for stop_update in (update.get('stop_time_update') or
+                          update.get('stopTimeUpdate') or []):
+        event = stop_update.get('departure') or stop_update.get('arrival')
+        if event and 'delay' in event:
+          yield (trip_id,
+                 stop_update.get('stop_id', stop_update.get('stopId')),
+                 int(event['delay']))
+
+  def _ParseRealtimeProtobuf(self, data):
+    """ Yields delay updates from a GTFS-realtime FeedMessage protobuf.
+
+    Args:
+      data: bytes serialized FeedMessage.
+
+    Raises:
+      Exception if gtfs-realtime-bindings is not installed.
+    """
+    if gtfs_realtime_pb2 is None:
+      raise Exception('GtfsFeed: GTFS-realtime protobuf requires '
+                      'gtfs-realtime-bindings.')
+    message = gtfs_realtime_pb2.FeedMessage()
+    message.ParseFromString(data)
+    for entity in message.entity:
+      if not entity.HasField('trip_update'):
+        continue
+      update = entity.trip_update
+      trip_id = update.trip.trip_id
+      if update.HasField('delay'):
+        yield (trip_id, None, update.delay)
+      for stop_update in update.stop_time_update:
+        for event in ('departure', 'arrival'):
+          if (stop_update.HasField(event) and
+              getattr(stop_update, event).HasField('delay')):
+            yield (trip_id, stop_update.stop_id,
+                   getattr(stop_update, event).delay)
+            break
+
+  def LoadRealtime(self, path):
+    """ Load delays from a GTFS-realtime TripUpdates file.
+
+    Previously loaded delays are replaced. Files ending in '.json' are read as
+    JSON, anything else as a protobuf FeedMessage.
+
+    Args:
+      path: String location of the TripUpdates file.
+    """
+    with open(path, 'rb') as feed:
+      data = feed.read()
+    if path.endswith('.json'):
+      self._SetDelays(self._ParseRealtimeJson(data))
+    else:
+      self._SetDelays(self._ParseRealtimeProtobuf(data))
@@ -0,0 +1,165 @@
+#
+# GTFS schedule loader unittest.
+#
+
+import datetime
+import gtfs
+import os
+import pytz
+import route
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+FEED = 'testdata/gtfs'
+TIMEZONE = pytz.timezone('America/Los_Angeles')
+
+
+def Time(month, day, hour, minute=0):
+  """ Returns datetime timezone aware time in 2017 for the test feed. """
+  return TIMEZONE.localize(datetime.datetime(2017, month, day, hour, minute))
+
+
+class TestParse(unittest.TestCase):
+  """ Test parsing GTFS values. """
+
+  def testParseTime(self):
+    """ Ensure times past midnight are allowed. """
+    self.assertEqual(gtfs.ParseTime('08:05:10'), 8 * 3600 + 5 * 60 + 10)
+    self.assertEqual(gtfs.ParseTime(' 7:00:00'), 7 * 3600)
+    self.assertEqual(gtfs.ParseTime('24:30:00'), 24 * 3600 + 30 * 60)
+    self.assertIsNone(gtfs.ParseTime(''))
+
+  def testParseDate(self):
+    """ Ensure dates are parsed. """
+    self.assertEqual(gtfs.ParseDate('20170704'), datetime.date(2017, 7, 4))
+
+
+class TestGtfsFeed(unittest.TestCase):
+  """ Test loading and querying a static feed. """
+
+  def setUp(self):
+    """ Initalize GtfsFeed test setup. """
+    self.feed = gtfs.GtfsFeed(FEED)
+
+  def testLoad(self):
+    """ Ensure the feed is loaded and untimed stops are skipped. """
+    self.assertEqual(self.feed.timezone.zone, 'America/Los_Angeles')
+    self.assertEqual(self.feed.route_names, {'N': 'N', 'L': 'Taraval'})
+    self.assertEqual(self.feed.stop_time_count, 7)
+
+  def testLoadZip(self):
+    """ Ensure a zipped feed loads the same as a directory. """
+    directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, directory)
+    path = os.path.join(directory, 'feed.zip')
+    with zipfile.ZipFile(path, 'w') as archive:
+      for filename in os.listdir(FEED):
+        archive.write(os.path.join(FEED, filename), filename)
+    feed = gtfs.GtfsFeed(path)
+    self.assertEqual(feed.stop_time_count, self.feed.stop_time_count)
+    self.assertEqual(feed.GetDepartures('S1', 'N', Time(7, 3, 7)),
+                     self.feed.GetDepartures('S1', 'N', Time(7, 3, 7)))
+
+  def testLoadMissingFile(self):
+    """ Ensure a feed without required files raises. """
+    directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, directory)
+    with self.assertRaises(Exception):
+      gtfs.GtfsFeed(directory)
+
+  def testLoadFiltered(self):
+    """ Ensure only requested stops and routes are indexed. """
+    feed = gtfs.GtfsFeed(FEED, stop_ids=['S2'], route_ids=['N'])
+    self.assertEqual(feed.stop_time_count, 2)
+    self.assertEqual(feed.GetDepartures('S1', 'N', Time(7, 3, 7)), [])
+    self.assertEqual(feed.GetDepartures('S2', 'N', Time(7, 3, 7)),
+                     [Time(7, 3, 8, 10), Time(7, 3, 9, 10)])
+
+  def testGetActiveServices(self):
+    """ Ensure calendar and calendar date exceptions are applied. """
+    week = self.feed._services['WEEK']
+    weekend = self.feed._services['WEEKEND']
+    self.assertEqual(self.feed.GetActiveServices(datetime.date(2017, 7, 3)),
+                     {week})
+    self.assertEqual(self.feed.GetActiveServices(datetime.date(2017, 7, 4)),
+                     {weekend})
+    self.assertEqual(self.feed.GetActiveServices(datetime.date(2017, 7, 8)),
+                     {weekend})
+    self.assertEqual(self.feed.GetActiveServices(datetime.date(2019, 7, 8)),
+                     set())
+
+  def testActiveServicesCache(self):
+    """ Ensure only the most recent days are cached. """
+    for day in range(1, 20):
+      self.feed.GetActiveServices(datetime.date(2017, 7, day))
+    self.assertEqual(len(self.feed._active_services),
+                     self.feed.ACTIVE_SERVICE_CACHE)
+
+  def testGetDepartures(self):
+    """ Ensure departures span service days, in order. """
+    self.assertEqual(self.feed.GetDepartures('S1', 'N', Time(7, 3, 7)),
+                     [Time(7, 3, 8), Time(7, 3, 9), Time(7, 4, 0, 30),
+                      Time(7, 4, 10)])
+
+  def testGetDeparturesAfterMidnight(self):
+    """ Ensure trips of the previous service day are found. """
+    self.assertEqual(
+        self.feed.GetDepartures('S1', 'N', Time(7, 4, 0, 10), count=2),
+        [Time(7, 4, 0, 30), Time(7, 4, 10)])
+
+  def testGetDeparturesSkipsDeparted(self):
+    """ Ensure departures already gone are skipped. """
+    self.assertEqual(
+        self.feed.GetDepartures('S1', 'N', Time(7, 3, 8, 1), count=1),
+        [Time(7, 3, 9)])
+
+  def testGetDeparturesUnknown(self):
+    """ Ensure unknown stops and routes have no departures. """
+    self.assertEqual(self.feed.GetDepartures('S9', 'N', Time(7, 3, 7)), [])
+    self.assertEqual(self.feed.GetDepartures('S1', 'X', Time(7, 3, 7)), [])
+
+  def testLoadRealtime(self):
+    """ Ensure realtime delays are applied to departures. """
+    self.feed.LoadRealtime(os.path.join(FEED, 'realtime.json'))
+    self.assertEqual(
+        self.feed.GetDepartures('S1', 'N', Time(7, 3, 8, 5), count=2),
+        [Time(7, 3, 8, 10), Time(7, 3, 9, 2)])
+    # The trip delay also applies to stops without their own delay.
+    self.assertEqual(
+        self.feed.GetDepartures('S2', 'N', Time(7, 3, 8, 5), count=2),
+        [Time(7, 3, 8, 20), Time(7, 3, 9, 12)])
+
+  def testLoadRealtimeReorders(self):
+    """ Ensure delayed departures are returned in departure order. """
+    self.feed._SetDelays([('T1', 'S1', 3900)])
+    self.assertEqual(
+        self.feed.GetDepartures('S1', 'N', Time(7, 3, 7), count=2),
+        [Time(7, 3, 9), Time(7, 3, 9, 5)])
+
+  @unittest.skipIf(gtfs.gtfs_realtime_pb2, 'gtfs-realtime-bindings installed')
+  def testLoadRealtimeProtobufMissing(self):
+    """ Ensure protobuf feeds raise without gtfs-realtime-bindings. """
+    with self.assertRaises(Exception):
+      self.feed.LoadRealtime(os.path.join(FEED, 'stop_times.txt'))
+
+  def testCreateRouteTile(self):
+    """ Ensure route tiles are created with the next departures. """
+    tile = self.feed.CreateRouteTile('S1', 'L', Time(7, 3, 7), scrolling=(0, 0))
+    self.assertIsInstance(tile, route.RouteTile32x32)
+    self.assertEqual(tile.route, 'Taraval')
+    self.assertEqual(tile.scrolling, (0, 0))
+    # The holiday has no service, departures are only searched until then.
+    self.assertEqual(tile.stops, [Time(7, 3, 8, 5)])
+
+  def testUpdateRouteTile(self):
+    """ Ensure route tiles are updated with the next departures. """
+    tile = route.RouteTile32x32(route_name='N')
+    self.feed.UpdateRouteTile(tile, 'S1', 'N', Time(7, 4, 9))
+    self.assertEqual(tile.stops, [Time(7, 4, 10), Time(7, 5, 8),
+                                  Time(7, 5, 9), Time(7, 6, 0, 30)])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,125 @@
+#
+# Process-wide weather icon atlas for Tile Manager.
+#
+# Every icon in the icon library is decoded once, the first time any icon is
+# needed, into an RGB sprite plus an alpha mask. Tiles reference icons by
+# their code, so any number of weather tiles share one decoded copy and no
+# file handles are kept open.
+#
+
+import os
+import threading
+from PIL import Image
+
+ICON_LIBRARY = (os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             'openweathermap.org-icons'))
+
+
+class Sprite(object):
+  """ A decoded icon, ready to paste onto an RGB image buffer.
+
+  Attributes:
+    image: PIL.Image RGB icon pixels.
+    mask: PIL.Image L icon transparency, 0 for fully transparent pixels, or
+        None if the icon is opaque.
+    size: Tuple (Integer: X, Integer: Y) icon size in pixels.
+  """
+
+  def __init__(self, image, mask):
+    """ Initalize sprite.
+
+    Args:
+      image: PIL.Image RGB icon pixels.
+      mask: PIL.Image L icon transparency, or None if opaque.
+    """
+    self.image = image
+    self.mask = mask
+    self.size = image.size
+
+  def Paste(self, buffer, position):
+    """ Paste the sprite onto an image buffer.
+
+    Args:
+      buffer: PIL.Image RGB buffer to paste onto.
+      position: Tuple (Integer: X, Integer: Y) position to paste at.
+    """
+    buffer.paste(self.image, position, self.mask)
+
+
+class IconAtlas(object):
+  """ Decoded sprites for every icon in an icon library.
+
+  Attributes:
+    library: String directory containing '<code>.png' icons.
+  """
+
+  def __init__(self, library=ICON_LIBRARY):
+    """ Initalize icon atlas. Icons are decoded on first use.
+
+    Args:
+      library: String directory containing '<code>.png' icons.
+          Default: the bundled openweathermap.org icons.
+    """
+    self.library = library
+    self._sprites = None
+    self._lock = threading.Lock()
+
+  def _Decode(self, path):
+    """ Returns Sprite decoded from an icon file.
+
+    Icons have always been drawn with their RGB values as-is (partially
+    transparent edges are not blended), so the mask only hides the fully
+    transparent pixels.
+
+    Args:
+      path: String location of the icon.
+    """
+    with Image.open(path) as icon:
+      icon = icon.convert('RGBA')
+    mask = icon.getchannel('A').point(lambda a: 255 if a else 0)
+    if mask.getextrema() == (255, 255):
+      mask = None
+    return Sprite(icon.convert('RGB'), mask)
+
+  def Load(self):
+    """ Decode every icon in the library, if not already done. """
+    if self._sprites is not None:
+      return
+    with self._lock:
+      if self._sprites is not None:
+        return
+      sprites = {}
+      for filename in sorted(os.listdir(self.library)):
+        (code, extension) = os.path.splitext(filename)
+        if extension == '.png':
+          sprites[code] = self._Decode(os.path.join(self.library, filename))
+      self._sprites = sprites
+
+  def GetCodes(self):
+    """ Returns List of String icon codes available. """
+    self.Load()
+    return sorted(self._sprites)
+
+  def GetSprite(self, code):
+    """ Returns Sprite for an icon code.
+
+    Args:
+      code: String icon code, e.g. '01d'.
+
+    Raises:
+      Exception if the icon for the code does not exist.
+    """
+    self.Load()
+    sprite = self._sprites.get(code)
+    if sprite is None:
+      raise Exception('IconAtlas: icon file not found: %s' %
+                      os.path.join(self.library, '%s.png' % code))
+    return sprite
+
+
+_ATLAS = IconAtlas()
+
+
+def GetAtlas():
+  """ Returns IconAtlas shared by every tile in the process. """
+  return _ATLAS
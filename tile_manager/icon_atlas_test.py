@@ -0,0 +1,56 @@
+#
+# Icon atlas unittest.
+#
+
+import icon_atlas
+import unittest
+import weather
+from PIL import Image
+
+
+class TestIconAtlas(unittest.TestCase):
+  """ Test the shared weather icon atlas. """
+
+  def setUp(self):
+    """ Initalize IconAtlas test setup. """
+    self.atlas = icon_atlas.IconAtlas()
+
+  def testLoadAllIcons(self):
+    """ Ensure every icon in the library is decoded. """
+    codes = self.atlas.GetCodes()
+    self.assertEqual(len(codes), 18)
+    self.assertIn('01d', codes)
+    self.assertIn('50n', codes)
+
+  def testSprite(self):
+    """ Ensure sprites are preconverted to RGB with a mask. """
+    sprite = self.atlas.GetSprite('01d')
+    self.assertEqual(sprite.image.mode, 'RGB')
+    self.assertEqual(sprite.mask.mode, 'L')
+    self.assertEqual(sprite.size, (32, 32))
+    self.assertEqual(sorted(set(sprite.mask.getdata())), [0, 255])
+
+  def testPasteKeepsTransparentPixels(self):
+    """ Ensure fully transparent pixels do not overwrite the buffer. """
+    sprite = self.atlas.GetSprite('01d')
+    buffer = Image.new('RGB', (32, 32), (0, 0, 255))
+    sprite.Paste(buffer, (0, 0))
+    self.assertEqual(buffer.getpixel((0, 0)), (0, 0, 255))
+
+  def testMissingIcon(self):
+    """ Ensure an unknown icon code raises. """
+    with self.assertRaises(Exception):
+      self.atlas.GetSprite('99x')
+
+  def testSharedByTiles(self):
+    """ Ensure all weather tiles share the process atlas sprites. """
+    data = {'icon': '10d', 'main': 'rain', 'temp': 1, 'temp_min': 0,
+            'temp_max': 2, 'humidity': 90}
+    first = weather.WeatherTile32x32(data)
+    second = weather.WeatherTile64x32(data)
+    self.assertIs(first._GetIcon(), second._GetIcon())
+    self.assertIs(first._GetIcon(), icon_atlas.GetAtlas().GetSprite('10d'))
+
+
+if __name__ == '__main__':
+  unittest.main()
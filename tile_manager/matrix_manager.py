@@ -16,6 +16,7 @@
 # this import for test verificatin and change it back when deploying.
 #
 
+import color_correction
 import logging
 from PIL import Image
 from PIL import ImageDraw
@@ -74,10 +75,17 @@ class MatrixInterface(object):
     offscreen_buffer: Pillow.Image buffer used to prep the next display image.
     offscreen_draw: Pillow.ImageDraw object used to draw shapes onto the
         offscreen_buffer.
+    color_correction: color_correction.ColorCorrection stage applied to the
+        composite frame just before it is pushed to the matrix, or None.
+    sinks: List of additional frame outputs (e.g. network_sink), each has
+        Push(image) called with every frame pushed to the matrix.
+    dither: dithering.OrderedDither stage reducing the composite frame to
+        the output bit depth, applied after color correction, or None.
   """
 
   def __init__(self, led_rows=32, chain_length=2,
-               write_cycles=2, tile_size=None):
+               write_cycles=2, tile_size=None, color_correction=None,
+               sinks=None, dither=None):
     """ Initialize matrix interface.
 
     led_rows and chain_length should correspond to --led-rows and
@@ -91,13 +99,24 @@ class MatrixInterface(object):
       write_cycles: Integer write cycle speed, higher is slower. Default: 2.
       tile_size: Integer minimum square tile size in pixels. Default: None (same
           as led_rows).
+      color_correction: color_correction.ColorCorrection stage to apply to
+          each frame before display. Default: None (no correction).
+      sinks: List of objects implementing Push(image) which also receive
+          every displayed frame. Default: None (matrix only).
+      dither: dithering.OrderedDither stage; the panel PWM bits are set to
+          its bit depth. Default: None (full 8 bit output).
     """
     self.led_rows = led_rows
     self.chain_length = chain_length
     self.tile_size = tile_size or led_rows
+    self.color_correction = color_correction
+    self.sinks = list(sinks or [])
+    self.dither = dither
     self._GetMatrixShape()
     self._matrix = rgbmatrix.RGBMatrix(led_rows, chain_length)
     self._matrix.SetWriteCycles(write_cycles)
+    if dither:
+      self._matrix.SetPWMBits(dither.bits)
     self.offscreen_buffer = Image.new('RGB', (self.width, self.height))
     self.offscreen_draw = ImageDraw.Draw(self.offscreen_buffer)
     self.FillScreen()
@@ -142,9 +161,46 @@ class MatrixInterface(object):
         fill=fill)
     self.Render()
 
+  def SetBrightness(self, brightness):
+    """ Change the display brightness at runtime.
+
+    A color correction stage is created if one does not already exist.
+
+    Args:
+      brightness: Float global brightness, 0.0 to 1.0.
+    """
+    if self.color_correction is None:
+      self.color_correction = color_correction.ColorCorrection(
+          brightness=brightness)
+    else:
+      self.color_correction.SetBrightness(brightness)
+
   def Render(self):
-    """ Render screen buffer to screen."""
-    self._matrix.SetImage(self.offscreen_buffer.im.id, 0, 0)
+    """ Render screen buffer to screen.
+
+    The offscreen buffer is left untouched; color correction and dithering
+    are applied to a copy of the composite frame which is what is displayed
+    and sent to all sinks.
+    """
+    frame = self.offscreen_buffer
+    if self.color_correction:
+      frame = self.color_correction.Apply(frame)
+    if self.dither:
+      frame = self.dither.Apply(frame)
+    self.ShowFrame(frame)
+
+  def ShowFrame(self, frame):
+    """ Display a finished frame as is and send it to all sinks.
+
+    Color correction and dithering are not applied, the frame is expected to
+    have been through them already, e.g. a frame recorded from a sink.
+
+    Args:
+      frame: PIL.Image of the display size.
+    """
+    self._matrix.SetImage(frame, 0, 0)
+    for sink in self.sinks:
+      sink.Push(frame)
 
   def TurnOffScreen(self):
     """ Clears and powers off the screen. """
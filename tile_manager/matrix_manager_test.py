@@ -89,6 +89,14 @@ class TestMatrixManager(unittest.TestCase):
     self.assertEqual(m.height, 8)
     self.assertEqual(m.tile_size, 8)
 
+  def testSetBrightness(self):
+    """ Ensure brightness can be changed without a correction stage. """
+    self.assertIsNone(self.matrix.color_correction)
+    self.matrix.SetBrightness(0.5)
+    self.assertEqual(self.matrix.color_correction.brightness, 0.5)
+    self.matrix.SetBrightness(0.25)
+    self.assertEqual(self.matrix.color_correction.brightness, 0.25)
+
 
 if __name__ == '__main__':
   unittest.main()
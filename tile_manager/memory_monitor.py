@@ -0,0 +1,262 @@
+#
+# Memory growth monitor for long running displays.
+#
+# Displays run Run(loop=True) for weeks, so memory kept a little longer every
+# loop adds up. The monitor traces allocations with tracemalloc between loop
+# boundaries (TileManager._ResetTiles) and reports what was allocated during
+# a loop and is still alive at its end:
+#
+#   - growth attributed to the tile classes whose code allocated it, and to
+#     the top allocation sites (file:line),
+#   - the number of live PIL images,
+#   - a warning logged when the growth of a loop exceeds a threshold.
+#
+# Tracing slows every allocation down (a traced loop takes several times the
+# CPU of an untraced one, more with more `frames` recorded), so only one loop
+# out of every `interval` loops is measured; tracing is stopped in between.
+# Memory freed while tracing but allocated before is not seen, so tracing
+# starts one loop early: frames and other objects replaced every loop then
+# cancel out, and only memory outliving a loop is reported. Two loops out of
+# every `interval` are thus traced, the warm up loop and the measured loop;
+# with an interval of 1 or 2 tracing never stops. The first loop is never
+# measured, as it fills caches.
+#
+#   monitor = memory_monitor.MemoryMonitor(interval=60, threshold=256 * 1024)
+#   m = tile_manager.TileManager(tiles, 32, 2, memory_monitor=monitor)
+#   m.Run(loop=True)
+#
+
+import base_tile
+import collections
+import gc
+import inspect
+import logging
+import os
+import tracemalloc
+from PIL import Image
+
+OTHER = 'other'
+
+
+class MemoryReport(object):
+  """ Memory growth over one traced loop.
+
+  Attributes:
+    loop: Integer number of the loop traced, 1 is the first loop.
+    growth: Integer bytes allocated during the loop and still alive.
+    blocks: Integer memory blocks allocated during the loop and still alive.
+    classes: Dictionary of String tile class name (or 'other') to Integer
+        bytes of growth allocated by its code.
+    sites: List of Tuple (String: 'file:line', Integer: bytes, Integer:
+        blocks) largest allocation sites of the growth, largest first.
+    images: Integer live PIL images at the end of the loop.
+    image_growth: Integer change of live PIL images over the loop.
+  """
+
+  def __init__(self, loop, growth, blocks, classes, sites, images,
+               image_growth):
+    self.loop = loop
+    self.growth = growth
+    self.blocks = blocks
+    self.classes = classes
+    self.sites = sites
+    self.images = images
+    self.image_growth = image_growth
+
+  def __str__(self):
+    """ Returns String one line summary of the report. """
+    classes = ', '.join(
+        '%s %+d' % (name, size) for (name, size) in
+        sorted(self.classes.items(), key=lambda item: -item[1]))
+    site = self.sites[0][0] if self.sites else None
+    return ('loop %d: %+d bytes in %+d blocks (%s), %d images (%+d), top '
+            'site %s' % (self.loop, self.growth, self.blocks, classes,
+                         self.images, self.image_growth, site))
+
+
+class MemoryMonitor(object):
+  """ Reports memory growth of traced loops.
+
+  Attributes:
+    interval: Integer loops between measured loops, 1 measures every loop.
+        The loop before each measured loop is traced too.
+    threshold: Integer bytes of growth per loop logged as a warning.
+    frames: Integer stack frames recorded per allocation, to find the tile
+        class allocating.
+    top: Integer allocation sites kept per report.
+    loops: Integer number of loops completed.
+    reports: collections.deque of the most recent MemoryReport.
+    MAX_REPORTS: Integer number of recent reports kept. Default: 32.
+  """
+  MAX_REPORTS = 32
+
+  def __init__(self, interval=60, threshold=256 * 1024, frames=8, top=10):
+    """ Initalize memory monitor.
+
+    Args:
+      interval: Integer loops between measured loops. Default: 60.
+      threshold: Integer bytes of growth per loop logged as a warning.
+          Default: 256 KiB.
+      frames: Integer stack frames recorded per allocation. Default: 8.
+      top: Integer allocation sites kept per report. Default: 10.
+
+    Raises:
+      Exception if interval or frames are less than 1.
+    """
+    if interval < 1 or frames < 1:
+      raise Exception('MemoryMonitor: interval and frames must be 1 or more.')
+    self.interval = interval
+    self.threshold = threshold
+    self.frames = frames
+    self.top = top
+    self.loops = 0
+    self.reports = collections.deque(maxlen=self.MAX_REPORTS)
+    self._baseline = None
+    self._images = 0
+    self._started = False
+    self._tracing = False
+    self._code = {}
+
+  def GetLastReport(self):
+    """ Returns the most recent MemoryReport, or None. """
+    if self.reports:
+      return self.reports[-1]
+    return None
+
+  def IsTracing(self):
+    """ Returns Boolean True if the current loop is traced. """
+    return self._tracing
+
+  def LoopCompleted(self, tiles):
+    """ Report the loop if traced, then decide whether to trace the next.
+
+    Args:
+      tiles: List of BaseTile displayed, to attribute growth to.
+
+    Returns:
+      MemoryReport for the loop just completed, or None if not reported.
+    """
+    self.loops += 1
+    report = None
+    if self._tracing:
+      snapshot = self._TakeSnapshot()
+      if self._baseline is None:
+        # End of the warm up loop: measure the next one.
+        self._baseline = snapshot
+        self._images = self._CountImages()
+        return None
+      report = self._Report(snapshot, tiles)
+      self.reports.append(report)
+      if report.growth > self.threshold:
+        logging.warning('MemoryMonitor: %s', report)
+      if self.interval == 1:
+        self._baseline = snapshot
+        return report
+      self.Stop()
+
+    if self.loops % self.interval == 0:
+      # Finding tile code while tracing would be much slower.
+      self._GetTileCode(tiles)
+      if not tracemalloc.is_tracing():
+        tracemalloc.start(self.frames)
+        self._started = True
+      self._tracing = True
+    return report
+
+  def Stop(self):
+    """ Stop tracing, if started by the monitor. """
+    self._tracing = False
+    self._baseline = None
+    if self._started:
+      tracemalloc.stop()
+      self._started = False
+
+  def _TakeSnapshot(self):
+    """ Returns tracemalloc.Snapshot without the monitor's own allocations. """
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__)))
+
+  def _CountImages(self):
+    """ Returns Integer number of live PIL images. """
+    return sum(1 for item in gc.get_objects()
+               if isinstance(item, Image.Image))
+
+  def _GetTileCode(self, tiles):
+    """ Returns Dictionary of String source file to List of Tuple (Integer:
+    first line, Integer: last line, String: tile class names) of tile code.
+
+    Code of BaseTile is shared by every tile; allocations in it are
+    attributed to the tile class calling it, if any. Finding the source of
+    classes is slow, the code of the last set of tile classes is kept.
+
+    Args:
+      tiles: List of BaseTile displayed.
+    """
+    classes = frozenset(type(tile) for tile in tiles)
+    if classes in self._code:
+      return self._code[classes]
+    names = collections.defaultdict(set)
+    for cls in classes:
+      for ancestor in cls.__mro__:
+        if ancestor in (object, base_tile.BaseTile):
+          continue
+        try:
+          path = inspect.getsourcefile(ancestor)
+          (lines, first) = inspect.getsourcelines(ancestor)
+        except (OSError, TypeError):
+          continue
+        if path:
+          names[(os.path.abspath(path), first,
+                 first + len(lines) - 1)].add(cls.__name__)
+    code = collections.defaultdict(list)
+    for ((path, first, last), owners) in names.items():
+      code[path].append((first, last, '/'.join(sorted(owners))))
+    self._code = {classes: code}
+    return code
+
+  def _GetOwner(self, traceback, code):
+    """ Returns String tile class names whose code allocated, or OTHER.
+
+    Args:
+      traceback: tracemalloc.Traceback of the allocation.
+      code: Dictionary from _GetTileCode().
+    """
+    # Most recent frame first: the innermost tile code allocating.
+    for frame in reversed(traceback):
+      for (first, last, names) in code.get(os.path.abspath(frame.filename),
+                                           ()):
+        if first <= frame.lineno <= last:
+          return names
+    return OTHER
+
+  def _Report(self, snapshot, tiles):
+    """ Returns MemoryReport of the growth since the baseline snapshot.
+
+    Args:
+      snapshot: tracemalloc.Snapshot taken at the end of the loop.
+      tiles: List of BaseTile displayed.
+    """
+    code = self._GetTileCode(tiles)
+    classes = collections.Counter()
+    for difference in snapshot.compare_to(self._baseline, 'traceback'):
+      if difference.size_diff:
+        classes[self._GetOwner(difference.traceback, code)] += (
+            difference.size_diff)
+
+    sites = []
+    growth = blocks = 0
+    for difference in snapshot.compare_to(self._baseline, 'lineno'):
+      growth += difference.size_diff
+      blocks += difference.count_diff
+      if difference.size_diff > 0:
+        frame = difference.traceback[0]
+        sites.append(('%s:%d' % (frame.filename, frame.lineno),
+                      difference.size_diff, difference.count_diff))
+    sites = sorted(sites, key=lambda site: -site[1])[:self.top]
+
+    images = self._CountImages()
+    report = MemoryReport(self.loops, growth, blocks, dict(classes), sites,
+                          images, images - self._images)
+    self._images = images
+    return report
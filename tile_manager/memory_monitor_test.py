@@ -0,0 +1,108 @@
+#
+# Memory monitor unittest.
+#
+
+import base_tile
+import clocks
+import memory_monitor
+import tile_manager
+import tracemalloc
+import unittest
+from PIL import Image
+
+LEAK_SIZE = 1024 * 1024
+
+
+class LeakyTile(base_tile.BaseTile):
+  """ Tile keeping an image and a buffer every time it is reset. """
+  leaked = []
+
+  def Reset(self):
+    base_tile.BaseTile.Reset(self)
+    self.leaked.append((Image.new('RGB', (8, 8)), bytearray(LEAK_SIZE)))
+
+
+class SteadyTile(base_tile.BaseTile):
+  """ Tile allocating only temporary memory. """
+
+  def Render(self):
+    base_tile.BaseTile.Render(self)
+    bytearray(LEAK_SIZE)
+    return self._image_buffer
+
+
+class TestMemoryMonitor(unittest.TestCase):
+  """ Test measuring memory growth over display loops. """
+
+  def setUp(self):
+    """ Initalize MemoryMonitor test setup. """
+    LeakyTile.leaked = []
+    self.addCleanup(LeakyTile.leaked.clear)
+
+  def _Manager(self, tiles, monitor):
+    """ Returns TileManager displaying tiles on a virtual clock. """
+    manager = tile_manager.TileManager(tiles, 32, 2, fps=10,
+                                       static_lifespan=1,
+                                       clock=clocks.VirtualClock(),
+                                       memory_monitor=monitor)
+    self.addCleanup(monitor.Stop)
+    return manager
+
+  def _Run(self, manager, loops):
+    """ Display the tiles for a number of loops. """
+    for loop in range(loops):
+      while not manager._AllTilesDisplayed():
+        manager._RenderFrame()
+      manager._ResetTiles()
+      manager.render_pipeline = manager.matrix.shape
+
+  def testLeakAttributed(self):
+    """ Ensure growth is attributed to the leaking tile class and site. """
+    monitor = memory_monitor.MemoryMonitor(interval=1, threshold=LEAK_SIZE)
+    manager = self._Manager([LeakyTile(), SteadyTile()], monitor)
+    with self.assertLogs(level='WARNING') as logs:
+      self._Run(manager, 4)
+    self.assertEqual([report.loop for report in monitor.reports], [3, 4])
+    report = monitor.GetLastReport()
+    self.assertGreater(report.growth, LEAK_SIZE)
+    self.assertGreater(report.classes['LeakyTile'], LEAK_SIZE)
+    self.assertLess(report.classes.get('SteadyTile', 0), LEAK_SIZE)
+    self.assertIn('memory_monitor_test.py', report.sites[0][0])
+    self.assertGreaterEqual(report.sites[0][1], LEAK_SIZE)
+    self.assertEqual(report.image_growth, 1)
+    self.assertIn('MemoryMonitor: loop 4', logs.output[-1])
+
+  def testSteady(self):
+    """ Ensure temporary allocations are not reported as growth. """
+    monitor = memory_monitor.MemoryMonitor(interval=1, threshold=LEAK_SIZE)
+    manager = self._Manager([SteadyTile(), SteadyTile()], monitor)
+    self._Run(manager, 5)
+    self.assertEqual(len(monitor.reports), 3)
+    for report in monitor.reports:
+      self.assertLess(report.growth, LEAK_SIZE)
+      self.assertLess(report.classes.get('SteadyTile', 0), 1024)
+      self.assertEqual(report.image_growth, 0)
+
+  def testInterval(self):
+    """ Ensure one loop out of every interval is measured, after a warm up.
+    """
+    monitor = memory_monitor.MemoryMonitor(interval=3, threshold=4 * LEAK_SIZE)
+    manager = self._Manager([LeakyTile()], monitor)
+    tracing = []
+    for loop in range(9):
+      self._Run(manager, 1)
+      tracing.append(monitor.IsTracing())
+    self.assertEqual(tracing, [False, False, True, True, False, True, True,
+                               False, True])
+    self.assertEqual([report.loop for report in monitor.reports], [5, 8])
+    monitor.Stop()
+    self.assertFalse(tracemalloc.is_tracing())
+
+  def testInvalidInterval(self):
+    """ Ensure at least every loop is traced. """
+    with self.assertRaises(Exception):
+      memory_monitor.MemoryMonitor(interval=0)
+
+
+if __name__ == '__main__':
+  unittest.main()
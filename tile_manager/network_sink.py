@@ -0,0 +1,305 @@
+#
+# Network frame sink and receiver for driving remote matrices.
+#
+# One host renders all content with the usual TileManager stack and streams
+# the composited frames over the LAN to any number of Pi's which only run the
+# lightweight receiver and push frames to their matrix:
+#
+#   sink = network_sink.NetworkFrameSink('10.0.0.20', 9999, size=(64, 32))
+#   m = tile_manager.TileManager(tiles, 32, 2, sinks=[sink])
+#
+#   (on the Pi)
+#   python network_sink.py --port 9999 --led-rows 32 --chain-length 2
+#
+# Every packet carries a header with a sequence number and the frame size.
+# Frames are sent as keyframes plus XOR/RLE deltas (see frame_codec). Over
+# UDP a lost packet breaks the delta chain, so the receiver drops deltas until
+# the next keyframe; the sender emits a keyframe every keyframe_interval
+# frames to bound that outage. TCP is reliable and reconnects on failure.
+#
+
+import argparse
+import frame_codec
+import logging
+import socket
+import struct
+import threading
+from PIL import Image
+
+MAGIC = b'RGBF'
+HEADER = struct.Struct('!4sBIHH')
+LENGTH = struct.Struct('!I')
+MAX_UDP_PAYLOAD = 65507
+REORDER_WINDOW = 64
+
+
+class NetworkFrameSink(object):
+  """ Streams composited frames to a remote FrameReceiver.
+
+  A sink is attached to MatrixInterface (via the sinks argument) and has
+  Push() called with every frame pushed to the matrix.
+
+  Attributes:
+    host: String receiver host name or address.
+    port: Integer receiver port.
+    protocol: String 'udp' or 'tcp'. Default: 'udp'.
+    sequence: Integer sequence number of the last frame sent.
+  """
+
+  def __init__(self, host, port, protocol='udp', keyframe_interval=30,
+               size=None):
+    """ Initalize network frame sink.
+
+    Args:
+      host: String receiver host name or address.
+      port: Integer receiver port.
+      protocol: String 'udp' or 'tcp'. Default: 'udp'.
+      keyframe_interval: Integer maximum frames between keyframes.
+          Default: 30.
+      size: Tuple (Integer: X, Integer: Y) frame size, checked to fit in a
+          UDP datagram. Default: None (not checked).
+
+    Raises:
+      Exception if the protocol is not supported, or frames of the size
+      cannot fit in a UDP datagram.
+    """
+    if protocol not in ('udp', 'tcp'):
+      raise Exception('NetworkFrameSink: unknown protocol %s' % protocol)
+    if (protocol == 'udp' and size and
+        HEADER.size + size[0] * size[1] * 3 > MAX_UDP_PAYLOAD):
+      raise Exception('NetworkFrameSink: %dx%d frames too large for udp, use '
+                      'tcp.' % size)
+    self.host = host
+    self.port = port
+    self.protocol = protocol
+    self.sequence = 0
+    self._encoder = frame_codec.FrameEncoder(keyframe_interval)
+    self._socket = None
+
+  def _Connect(self):
+    """ Create the socket to the receiver, if not already connected. """
+    if self._socket:
+      return
+    if self.protocol == 'udp':
+      self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    else:
+      self._socket = socket.create_connection((self.host, self.port))
+      self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+      self._encoder.ForceKeyframe()
+
+  def Push(self, image):
+    """ Encode and send a frame.
+
+    Network errors are logged and never raised, so a missing receiver does
+    not stop the local display. A TCP connection is re-established on the
+    next frame, starting with a keyframe. Frames too large for a UDP
+    datagram are logged and dropped.
+
+    Args:
+      image: PIL.Image RGB frame to send.
+    """
+    (frame_type, payload) = self._encoder.Encode(image)
+    self.sequence = (self.sequence + 1) & 0xffffffff
+    packet = HEADER.pack(MAGIC, frame_type, self.sequence,
+                         image.size[0], image.size[1]) + payload
+    if self.protocol == 'udp' and len(packet) > MAX_UDP_PAYLOAD:
+      logging.error('NetworkFrameSink: dropped %d byte frame, too large for '
+                    'udp, use tcp.', len(packet))
+      self._encoder.ForceKeyframe()
+      return
+    try:
+      self._Connect()
+      if self.protocol == 'udp':
+        self._socket.sendto(packet, (self.host, self.port))
+      else:
+        self._socket.sendall(LENGTH.pack(len(packet)) + packet)
+    except (OSError, socket.error) as e:
+      logging.error('NetworkFrameSink: send to %s:%s failed: %s',
+                    self.host, self.port, e)
+      self.Close()
+      self._encoder.ForceKeyframe()
+
+  def Close(self):
+    """ Close the connection to the receiver. """
+    if self._socket:
+      self._socket.close()
+      self._socket = None
+
+
+class FrameReceiver(object):
+  """ Receives frames from a NetworkFrameSink and displays them.
+
+  Attributes:
+    matrix: rgbmatrix matrix object frames are pushed to with SetImage().
+    port: Integer port listened on.
+    protocol: String 'udp' or 'tcp'.
+    frame: PIL.Image last frame displayed, or None.
+    frames_received: Integer number of frames displayed.
+    frames_dropped: Integer number of frames dropped (lost, out of order or
+        missing their keyframe).
+  """
+
+  def __init__(self, matrix, port, host='0.0.0.0', protocol='udp'):
+    """ Initalize frame receiver and bind the listening socket.
+
+    Args:
+      matrix: rgbmatrix matrix object to push frames to.
+      port: Integer port to listen on, 0 to pick a free port.
+      host: String address to listen on. Default: '0.0.0.0' (all).
+      protocol: String 'udp' or 'tcp'. Default: 'udp'.
+
+    Raises:
+      Exception if the protocol is not supported.
+    """
+    if protocol not in ('udp', 'tcp'):
+      raise Exception('FrameReceiver: unknown protocol %s' % protocol)
+    self.matrix = matrix
+    self.protocol = protocol
+    self.frame = None
+    self.frames_received = 0
+    self.frames_dropped = 0
+    self._decoder = frame_codec.FrameDecoder()
+    self._last_sequence = None
+    self._running = threading.Event()
+    if protocol == 'udp':
+      self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    else:
+      self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+      self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._socket.bind((host, port))
+    if protocol == 'tcp':
+      self._socket.listen(1)
+    self._socket.settimeout(0.2)
+    self.port = self._socket.getsockname()[1]
+
+  def HandlePacket(self, packet):
+    """ Decode a packet and display the frame.
+
+    Args:
+      packet: bytes packet from a NetworkFrameSink.
+
+    Returns:
+      Boolean True if a frame was displayed.
+    """
+    if len(packet) < HEADER.size:
+      self.frames_dropped += 1
+      return False
+    (magic, frame_type, sequence, width, height) = HEADER.unpack_from(packet)
+    if magic != MAGIC:
+      self.frames_dropped += 1
+      return False
+
+    behind = None
+    if self._last_sequence is not None:
+      behind = (self._last_sequence - sequence) & 0xffffffff
+    if frame_type == frame_codec.DELTA:
+      if behind != 0xffffffff:
+        # A frame was lost; deltas are useless until the next keyframe.
+        self._decoder.Reset()
+        self.frames_dropped += 1
+        return False
+    elif behind is not None and behind < REORDER_WINDOW:
+      # Duplicate or stale keyframe arriving out of order. Anything further
+      # behind is a restarted sender and is accepted.
+      self.frames_dropped += 1
+      return False
+
+    data = self._decoder.Decode(frame_type, packet[HEADER.size:])
+    if data is None or len(data) != width * height * 3:
+      self._decoder.Reset()
+      self.frames_dropped += 1
+      return False
+    self._last_sequence = sequence
+    self.frame = Image.frombytes('RGB', (width, height), data)
+    self.matrix.SetImage(self.frame, 0, 0)
+    self.frames_received += 1
+    return True
+
+  def _ReadExactly(self, connection, size):
+    """ Returns bytes read from a TCP connection, or None if it closed. """
+    chunks = []
+    while size:
+      try:
+        chunk = connection.recv(size)
+      except socket.timeout:
+        if not self._running.is_set():
+          return None
+        continue
+      if not chunk:
+        return None
+      chunks.append(chunk)
+      size -= len(chunk)
+    return b''.join(chunks)
+
+  def _ServeTcp(self):
+    """ Accept one sender at a time and read length prefixed packets. """
+    while self._running.is_set():
+      try:
+        (connection, _) = self._socket.accept()
+      except socket.timeout:
+        continue
+      connection.settimeout(0.2)
+      with connection:
+        while self._running.is_set():
+          length = self._ReadExactly(connection, LENGTH.size)
+          if length is None:
+            break
+          packet = self._ReadExactly(connection, LENGTH.unpack(length)[0])
+          if packet is None:
+            break
+          self.HandlePacket(packet)
+      # A new sender starts its own sequence with a keyframe.
+      self._last_sequence = None
+      self._decoder.Reset()
+
+  def _ServeUdp(self):
+    """ Read datagram packets. """
+    while self._running.is_set():
+      try:
+        packet = self._socket.recv(MAX_UDP_PAYLOAD)
+      except socket.timeout:
+        continue
+      self.HandlePacket(packet)
+
+  def Serve(self):
+    """ Receive and display frames until Stop() is called. """
+    self._running.set()
+    try:
+      if self.protocol == 'udp':
+        self._ServeUdp()
+      else:
+        self._ServeTcp()
+    finally:
+      self._socket.close()
+
+  def Stop(self):
+    """ Stop serving, Serve() returns within the socket timeout. """
+    self._running.clear()
+
+
+def main():
+  """ Run a frame receiver driving the local matrix. """
+  parser = argparse.ArgumentParser(
+      description='Display frames streamed from a NetworkFrameSink.')
+  parser.add_argument('--port', type=int, default=9999)
+  parser.add_argument('--host', default='0.0.0.0')
+  parser.add_argument('--protocol', choices=('udp', 'tcp'), default='udp')
+  parser.add_argument('--led-rows', type=int, default=32)
+  parser.add_argument('--chain-length', type=int, default=2)
+  parser.add_argument('--write-cycles', type=int, default=2)
+  args = parser.parse_args()
+
+  from matrix_manager import rgbmatrix
+  matrix = rgbmatrix.RGBMatrix(args.led_rows, args.chain_length)
+  matrix.SetWriteCycles(args.write_cycles)
+  receiver = FrameReceiver(matrix, args.port, args.host, args.protocol)
+  try:
+    receiver.Serve()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    matrix.Clear()
+
+
+if __name__ == '__main__':
+  main()
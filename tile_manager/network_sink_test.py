@@ -0,0 +1,113 @@
+#
+# Network frame sink unittest.
+#
+
+import frame_codec
+import network_sink
+import rgbmatrix_mock
+import threading
+import time
+import unittest
+from PIL import Image
+from PIL import ImageDraw
+
+
+class TestNetworkFrameSink(unittest.TestCase):
+  """ Stream frames over localhost to a receiver driving a mock matrix. """
+
+  def _StartReceiver(self, protocol):
+    """ Start a receiver on a free localhost port in a thread. """
+    matrix = rgbmatrix_mock.RGBMatrix(32, 2)
+    receiver = network_sink.FrameReceiver(matrix, 0, '127.0.0.1', protocol)
+    thread = threading.Thread(target=receiver.Serve)
+    thread.start()
+    self.addCleanup(thread.join)
+    self.addCleanup(receiver.Stop)
+    return receiver
+
+  def _Frames(self, count):
+    """ Returns List of count distinct 64x32 frames. """
+    frames = []
+    for index in range(count):
+      image = Image.new('RGB', (64, 32))
+      ImageDraw.Draw(image).rectangle((index, 0, index + 4, 8),
+                                      fill=(255, index, 0))
+      frames.append(image)
+    return frames
+
+  def _WaitFor(self, receiver, count):
+    """ Wait until the receiver has displayed count frames. """
+    deadline = time.time() + 5
+    while receiver.frames_received < count and time.time() < deadline:
+      time.sleep(0.01)
+
+  def _AssertStream(self, protocol):
+    """ Ensure a stream of frames arrives intact over a protocol. """
+    receiver = self._StartReceiver(protocol)
+    sink = network_sink.NetworkFrameSink('127.0.0.1', receiver.port,
+                                         protocol, keyframe_interval=4)
+    self.addCleanup(sink.Close)
+    frames = self._Frames(10)
+    for image in frames:
+      sink.Push(image)
+      self._WaitFor(receiver, sink.sequence)
+    self.assertEqual(receiver.frames_received, 10)
+    self.assertEqual(receiver.frame.tobytes(), frames[-1].tobytes())
+    self.assertEqual(receiver.matrix.GetFrameImage().tobytes(),
+                     frames[-1].tobytes())
+
+  def testUdpStream(self):
+    """ Ensure frames stream over UDP. """
+    self._AssertStream('udp')
+
+  def testTcpStream(self):
+    """ Ensure frames stream over TCP. """
+    self._AssertStream('tcp')
+
+  def testDroppedFrameWaitsForKeyframe(self):
+    """ Ensure deltas after a lost packet are dropped until a keyframe. """
+    receiver = network_sink.FrameReceiver(rgbmatrix_mock.RGBMatrix(
+        32, 2), 0, '127.0.0.1')
+    self.addCleanup(receiver._socket.close)
+    encoder = frame_codec.FrameEncoder(keyframe_interval=3)
+    packets = []
+    for sequence, image in enumerate(self._Frames(4), 1):
+      (frame_type, payload) = encoder.Encode(image)
+      packets.append(network_sink.HEADER.pack(
+          network_sink.MAGIC, frame_type, sequence, 64, 32) + payload)
+    self.assertTrue(receiver.HandlePacket(packets[0]))
+    # packets[1] is lost.
+    self.assertFalse(receiver.HandlePacket(packets[2]))
+    self.assertTrue(receiver.HandlePacket(packets[3]))
+    self.assertEqual(receiver.frames_dropped, 1)
+    self.assertEqual(receiver.frames_received, 2)
+
+  def testInvalidPacket(self):
+    """ Ensure garbage packets are counted and ignored. """
+    receiver = network_sink.FrameReceiver(rgbmatrix_mock.RGBMatrix(
+        32, 2), 0, '127.0.0.1')
+    self.addCleanup(receiver._socket.close)
+    self.assertFalse(receiver.HandlePacket(b'garbage'))
+    self.assertFalse(receiver.HandlePacket(b'XXXX' + bytes(20)))
+    self.assertEqual(receiver.frames_dropped, 2)
+
+  def testUnknownProtocol(self):
+    """ Ensure unknown protocols are rejected. """
+    with self.assertRaises(Exception):
+      network_sink.NetworkFrameSink('127.0.0.1', 9999, 'sctp')
+
+
+  def testUdpFrameTooLarge(self):
+    """ Ensure frames too large for udp are rejected upfront or dropped. """
+    with self.assertRaises(Exception):
+      network_sink.NetworkFrameSink('127.0.0.1', 9999, size=(192, 128))
+    network_sink.NetworkFrameSink('127.0.0.1', 9999, 'tcp', size=(192, 128))
+    sink = network_sink.NetworkFrameSink('127.0.0.1', 9999)
+    self.addCleanup(sink.Close)
+    with self.assertLogs(level='ERROR'):
+      sink.Push(Image.new('RGB', (192, 128)))
+    self.assertIsNone(sink._socket)
+
+
+if __name__ == '__main__':
+  unittest.main()
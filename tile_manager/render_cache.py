@@ -0,0 +1,380 @@
+#
+# Persistent on-disk cache of rendered tile frames.
+#
+# Rendering a tile from scratch measures its text, decodes its images and
+# draws every frame of its scroll sequence; after a reboot or deploy every
+# tile does this again although most show the same content. With a render
+# cache, the frames of a tile's whole sequence are written to disk the first
+# time it is displayed and played back from the file afterwards, including
+# after a restart:
+#
+#   cache = render_cache.RenderCache('/var/cache/tile_manager')
+#   manager = tile_manager.TileManager(tiles, 32, 2, render_cache=cache)
+#
+# Only tiles returning a key from GetCacheKey() are cached. The key describes
+# everything the tile's frames depend on; it is hashed together with the
+# tile class, tile size and font, so changing any of them misses the cache.
+#
+# Entries are one file per key, memory-mapped when played:
+#
+#   header: magic 'TILC', version, width, height, max frames, frame count,
+#           unique frame count
+#   index:  unique frame number of every frame
+#   frames: raw RGB unique frames
+#
+# Identical frames (e.g. every frame of a static tile) are stored once. The
+# least recently used entries are deleted once the cache grows beyond its
+# size limit. The cache never stops the display: unreadable entries are
+# deleted and the tile rendered instead.
+#
+
+import collections
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import weakref
+from PIL import Image
+
+MAGIC = b'TILC'
+VERSION = 1
+EXTENSION = '.tilecache'
+HEADER = struct.Struct('!4sHHHIII')
+
+# Stored as max frames when the tile's own frame count is not known.
+UNKNOWN_FRAMES = 0xFFFFFFFF
+
+# Printable ASCII rendered to fingerprint a font.
+_FONT_SAMPLE = ''.join(chr(code) for code in range(32, 127))
+
+
+class CacheEntry(object):
+  """ Frames of a tile sequence, memory-mapped from a cache file.
+
+  Attributes:
+    size: Tuple (Integer: X, Integer: Y) frame size in pixels.
+    max_frames: Integer tile frame count before TileManager set the static
+        lifespan (0 for static tiles), or None if not known.
+    frame_count: Integer number of frames in the sequence.
+  """
+
+  def __init__(self, path):
+    """ Map a cache file.
+
+    Args:
+      path: String location of the cache file.
+
+    Raises:
+      Exception if the file is not a valid cache entry.
+      OSError if the file can not be read.
+    """
+    with open(path, 'rb') as cache_file:
+      self._map = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(self._map) < HEADER.size:
+      raise Exception('CacheEntry: %s is truncated.' % path)
+    (magic, version, width, height, self.max_frames, self.frame_count,
+     unique_count) = HEADER.unpack_from(self._map)
+    if magic != MAGIC or version != VERSION:
+      raise Exception('CacheEntry: %s is not a cache entry.' % path)
+    if self.max_frames == UNKNOWN_FRAMES:
+      self.max_frames = None
+    self.size = (width, height)
+    self._frame_bytes = width * height * 3
+    self._index = struct.unpack_from('!%dI' % self.frame_count, self._map,
+                                     HEADER.size)
+    self._frames_offset = HEADER.size + 4 * self.frame_count
+    if (len(self._map) != self._frames_offset +
+        unique_count * self._frame_bytes or
+        (self._index and max(self._index) >= unique_count)):
+      raise Exception('CacheEntry: %s is truncated.' % path)
+    self._last = (None, None)
+
+  def GetFrame(self, index):
+    """ Returns PIL.Image RGB frame of the sequence.
+
+    Frames past the end of the sequence show the last frame, so a static
+    tile displayed longer than recorded keeps its image.
+
+    Args:
+      index: Integer frame index.
+    """
+    unique = self._index[min(index, self.frame_count - 1)]
+    if self._last[0] != unique:
+      offset = self._frames_offset + unique * self._frame_bytes
+      self._last = (unique, Image.frombuffer(
+          'RGB', self.size, self._map[offset:offset + self._frame_bytes],
+          'raw', 'RGB', 0, 1))
+    return self._last[1]
+
+
+def WriteEntry(path, images, max_frames):
+  """ Write a cache entry, replacing an existing one atomically.
+
+  Args:
+    path: String location of the cache file.
+    images: List of PIL.Image RGB frames, all the same size.
+    max_frames: Integer tile frame count, see CacheEntry, or None.
+
+  Returns:
+    Integer size of the file written, in bytes.
+  """
+  (width, height) = images[0].size
+  unique = {}
+  index = []
+  frames = []
+  for image in images:
+    data = image.tobytes()
+    number = unique.get(data)
+    if number is None:
+      number = unique[data] = len(frames)
+      frames.append(data)
+    index.append(number)
+  temporary = '%s.%d.tmp' % (path, os.getpid())
+  with open(temporary, 'wb') as cache_file:
+    cache_file.write(HEADER.pack(
+        MAGIC, VERSION, width, height,
+        UNKNOWN_FRAMES if max_frames is None else max_frames,
+        len(index), len(frames)))
+    cache_file.write(struct.pack('!%dI' % len(index), *index))
+    for data in frames:
+      cache_file.write(data)
+  os.replace(temporary, path)
+  return HEADER.size + 4 * len(index) + len(frames) * width * height * 3
+
+
+class _Session(object):
+  """ Cache state of a tile while it is displayed. """
+
+  def __init__(self, key, entry):
+    self.key = key
+    self.entry = entry
+    self.frames = []
+    self.last_frame = -1
+
+
+class RenderCache(object):
+  """ Size bounded on-disk cache of rendered tile sequences.
+
+  Attributes:
+    directory: String directory holding the cache files.
+    max_bytes: Integer size the cache files may use on disk, in bytes.
+    nbytes: Integer size of the cache files, in bytes.
+    hits: Integer number of tile sequences played from the cache.
+    misses: Integer number of tile sequences rendered.
+    stored: Integer number of tile sequences written to the cache.
+    evictions: Integer number of cache files deleted to make room.
+  """
+
+  def __init__(self, directory, max_bytes=16 * 1024 * 1024):
+    """ Initalize render cache, creating the directory if needed.
+
+    Args:
+      directory: String directory holding the cache files.
+      max_bytes: Integer size the cache files may use on disk, in bytes.
+          Default: 16 MiB.
+    """
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.nbytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.stored = 0
+    self.evictions = 0
+    self._files = collections.OrderedDict()
+    self._sessions = weakref.WeakKeyDictionary()
+    self._frame_counts = weakref.WeakKeyDictionary()
+    self._fonts = {}
+    self._lock = threading.Lock()
+    os.makedirs(directory, exist_ok=True)
+    self._Scan()
+
+  def _Scan(self):
+    """ Index the existing cache files, least recently used first. """
+    files = []
+    for name in os.listdir(self.directory):
+      path = os.path.join(self.directory, name)
+      if name.endswith('.tmp'):
+        # Left behind by a write interrupted by a crash or power loss.
+        self._Remove(path)
+      elif name.endswith(EXTENSION):
+        try:
+          stat = os.stat(path)
+        except OSError:
+          continue
+        files.append((stat.st_mtime, name[:-len(EXTENSION)], stat.st_size))
+    for (mtime, key, size) in sorted(files):
+      self._files[key] = size
+      self.nbytes += size
+    self._Evict()
+
+  def _GetPath(self, key):
+    """ Returns String location of the cache file for a key. """
+    return os.path.join(self.directory, key + EXTENSION)
+
+  def _Remove(self, path):
+    """ Delete a file, ignoring missing files. """
+    try:
+      os.remove(path)
+    except OSError:
+      pass
+
+  def _Evict(self):
+    """ Delete least recently used files until the cache fits. """
+    while self.nbytes > self.max_bytes and self._files:
+      (key, size) = self._files.popitem(last=False)
+      self.nbytes -= size
+      self.evictions += 1
+      self._Remove(self._GetPath(key))
+
+  def _GetFontDigest(self, font):
+    """ Returns String fingerprint of a font, from a rendered sample. """
+    digest = self._fonts.get(id(font))
+    if digest is None:
+      mask = font.getmask(_FONT_SAMPLE)
+      digest = self._fonts[id(font)] = hashlib.sha1(
+          b'%dx%d:' % mask.size + bytes(mask)).hexdigest()
+    return digest
+
+  def GetKey(self, tile):
+    """ Returns String cache key of a tile's current content, or None.
+
+    Args:
+      tile: BaseTile to get the key for; None is returned if the tile's
+          GetCacheKey() is None (it is not cacheable).
+    """
+    content = tile.GetCacheKey()
+    if content is None:
+      return None
+    tile_class = type(tile)
+    return hashlib.sha1(repr((
+        VERSION, tile_class.__module__, tile_class.__name__,
+        tile.GetTileDiemensions(), self._GetFontDigest(tile.FONT),
+        content)).encode('utf-8')).hexdigest()
+
+  def _Load(self, key):
+    """ Returns CacheEntry for a key, or None if not cached. """
+    with self._lock:
+      if key not in self._files:
+        return None
+      self._files.move_to_end(key)
+    path = self._GetPath(key)
+    try:
+      entry = CacheEntry(path)
+      os.utime(path)
+    except Exception as e:
+      logging.warning('RenderCache: dropping %s: %s', path, e)
+      with self._lock:
+        self.nbytes -= self._files.pop(key, 0)
+      self._Remove(path)
+      return None
+    return entry
+
+  def _Store(self, key, images, max_frames):
+    """ Write the frames of a tile sequence to the cache. """
+    path = self._GetPath(key)
+    try:
+      size = WriteEntry(path, images, max_frames)
+    except OSError as e:
+      logging.warning('RenderCache: could not write %s: %s', path, e)
+      self._Remove('%s.%d.tmp' % (path, os.getpid()))
+      return
+    with self._lock:
+      self.nbytes += size - self._files.pop(key, 0)
+      self._files[key] = size
+      self.stored += 1
+      self._Evict()
+
+  def Prime(self, tile):
+    """ Set a tile's frame count from the cache, if its content is cached.
+
+    This avoids measuring the tile's content (fonts, images) to find its
+    frame count on start up. It must be called before TileManager sets the
+    lifespan of static tiles; otherwise the frame count is measured and kept
+    to be stored with the tile's frames.
+
+    Args:
+      tile: BaseTile to prime.
+
+    Returns:
+      Boolean True if the tile's frame count was taken from the cache.
+    """
+    key = self.GetKey(tile)
+    if not key:
+      return False
+    entry = self._Load(key)
+    if entry and entry.max_frames is not None:
+      tile.SetMaxFrameCount(entry.max_frames)
+      return True
+    self._frame_counts[tile] = (key, tile.GetMaxFrames())
+    return False
+
+  def Render(self, tile, render=None):
+    """ Returns PIL.Image frame for a tile, from the cache if possible.
+
+    A displayed sequence starts with the tile's frame 0: the key is taken
+    and the sequence is played from the cache, or rendered and recorded.
+    Recorded sequences are stored once every frame up to the tile's last
+    frame was rendered, in order. A cached sequence is played with the
+    content the tile had when it started.
+
+    Args:
+      tile: BaseTile to render.
+      render: Function rendering a tile live. Default: None (tile.Render).
+    """
+    render = render or (lambda tile: tile.Render())
+    frame_index = tile.current_frame
+    session = self._sessions.get(tile)
+    if session is None or frame_index < session.last_frame:
+      session = None
+      if frame_index == 0:
+        key = self.GetKey(tile)
+        if key:
+          session = _Session(key, self._Load(key))
+          if session.entry:
+            self.hits += 1
+          else:
+            self.misses += 1
+      if session is None:
+        self._sessions.pop(tile, None)
+        return render(tile)
+      self._sessions[tile] = session
+    session.last_frame = frame_index
+
+    if session.entry:
+      tile.displayed = True
+      return session.entry.GetFrame(frame_index)
+
+    image = render(tile)
+    if session.frames is not None:
+      if frame_index == len(session.frames):
+        session.frames.append(image.convert('RGB'))
+      elif frame_index != len(session.frames) - 1:
+        # Frames were skipped, the sequence can not be recorded.
+        session.frames = None
+    if session.frames and len(session.frames) > tile.GetMaxFrames():
+      (key, max_frames) = self._frame_counts.get(tile, (None, None))
+      if key != session.key:
+        # The content changed since the frame count was measured.
+        max_frames = None
+      self._Store(session.key, session.frames, max_frames)
+      session.frames = None
+    return image
+
+  def Forget(self, tile):
+    """ Drop the cache state of a tile no longer displayed.
+
+    Args:
+      tile: BaseTile to forget.
+    """
+    self._sessions.pop(tile, None)
+
+  def Clear(self):
+    """ Delete every cache file. """
+    with self._lock:
+      for key in self._files:
+        self._Remove(self._GetPath(key))
+      self._files.clear()
+      self.nbytes = 0
+    self._sessions.clear()
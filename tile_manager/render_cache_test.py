@@ -0,0 +1,181 @@
+#
+# Render cache unittest.
+#
+
+import base_tile
+import glob
+import golden_frames
+import os
+import render_cache
+import tempfile
+import tile_manager
+import unittest
+import weather
+
+
+class RecordingSink(object):
+  """ Frame sink keeping the hash of every frame pushed. """
+
+  def __init__(self):
+    self.hashes = []
+
+  def Push(self, image):
+    self.hashes.append(golden_frames.HashFrame(image))
+
+
+class TestRenderCache(unittest.TestCase):
+  """ Test recording and playing back tile frames. """
+
+  def setUp(self):
+    """ Initalize RenderCache test setup. """
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    self.data = {'id': 208,
+                 'main': 'sunny',
+                 'description': 'sunny and clear.',
+                 'icon': '01d',
+                 'temp': 72,
+                 'temp_min': 68,
+                 'temp_max': 78,
+                 'humidity': 23}
+
+  def _Tile(self, data=None):
+    """ Returns scrolling WeatherTile64x32 for the test weather. """
+    return weather.WeatherTile64x32(data or self.data, scrolling=(0, -1))
+
+  def _Play(self, cache, tile):
+    """ Returns List of String frame hashes of a tile through a cache. """
+    hashes = []
+    for frame in range(tile.GetMaxFrames() + 1):
+      hashes.append(golden_frames.HashFrame(cache.Render(tile)))
+      tile.StepFrame()
+    return hashes
+
+  def testRecordAndPlay(self):
+    """ Ensure frames are played back from a new cache on the directory. """
+    tile = self._Tile()
+    expected = [golden_frames.HashFrame(image) for image in
+                golden_frames.RenderFrames(tile, tile.GetMaxFrames() + 1)]
+    cache = render_cache.RenderCache(self.directory.name)
+    self.assertEqual(self._Play(cache, self._Tile()), expected)
+    self.assertEqual((cache.misses, cache.stored), (1, 1))
+
+    # A restart: the tile is never rendered.
+    cache = render_cache.RenderCache(self.directory.name)
+    tile = self._Tile()
+    tile.Render = None
+    self.assertEqual(self._Play(cache, tile), expected)
+    self.assertTrue(tile.displayed)
+    self.assertEqual(cache.hits, 1)
+
+  def testContentChange(self):
+    """ Ensure changed content misses the cache. """
+    cache = render_cache.RenderCache(self.directory.name)
+    tile = self._Tile()
+    self._Play(cache, tile)
+    self.assertEqual(cache.GetKey(tile), cache.GetKey(self._Tile()))
+    data = dict(self.data, temp=73)
+    self.assertNotEqual(cache.GetKey(tile), cache.GetKey(self._Tile(data)))
+    self.assertNotEqual(cache.GetKey(tile),
+                        cache.GetKey(weather.WeatherTile32x32(self.data)))
+
+  def testNotCacheable(self):
+    """ Ensure tiles without a cache key are always rendered. """
+    cache = render_cache.RenderCache(self.directory.name)
+    tile = base_tile.BaseTile()
+    self.assertIsNone(cache.GetKey(tile))
+    cache.Render(tile)
+    self.assertEqual((cache.misses, cache.stored), (0, 0))
+    self.assertEqual(os.listdir(self.directory.name), [])
+
+  def testPrime(self):
+    """ Ensure frame counts are taken from the cache on start up. """
+    cache = render_cache.RenderCache(self.directory.name)
+    tile = self._Tile()
+    self.assertFalse(cache.Prime(tile))
+    max_frames = tile.GetMaxFrames()
+    self._Play(cache, tile)
+
+    tile = self._Tile()
+    tile._GetRenderSize = None
+    self.assertTrue(render_cache.RenderCache(self.directory.name).Prime(tile))
+    self.assertEqual(tile.GetMaxFrames(), max_frames)
+
+  def testStaticFramesStoredOnce(self):
+    """ Ensure identical frames are only stored once. """
+    cache = render_cache.RenderCache(self.directory.name)
+    tile = weather.WeatherTile32x32(self.data)
+    cache.Prime(tile)
+    tile.SetMaxFrameCount(50)
+    self._Play(cache, tile)
+    self.assertEqual(cache.nbytes, render_cache.HEADER.size + 4 * 51 +
+                     32 * 32 * 3)
+
+    # Static tiles keep their lifespan, not the recorded frame count.
+    tile = weather.WeatherTile32x32(self.data)
+    self.assertTrue(render_cache.RenderCache(self.directory.name).Prime(tile))
+    self.assertEqual(tile.GetMaxFrames(), 0)
+
+  def testEviction(self):
+    """ Ensure the least recently used entries are deleted to fit. """
+    cache = render_cache.RenderCache(self.directory.name)
+    self._Play(cache, self._Tile())
+    entry_size = cache.nbytes
+    cache = render_cache.RenderCache(self.directory.name,
+                                     max_bytes=entry_size * 2)
+    for temp in (1, 2, 3):
+      self._Play(cache, self._Tile(dict(self.data, temp=temp)))
+    self.assertEqual(cache.evictions, 2)
+    self.assertEqual(len(glob.glob(os.path.join(self.directory.name, '*'))), 2)
+    self.assertLessEqual(cache.nbytes, cache.max_bytes)
+    # The original entry was the least recently used.
+    self.assertFalse(cache.Prime(self._Tile()))
+
+  def testCorruptEntry(self):
+    """ Ensure unreadable entries are dropped and the tile rendered. """
+    cache = render_cache.RenderCache(self.directory.name)
+    tile = self._Tile()
+    expected = self._Play(cache, tile)
+    (path,) = glob.glob(os.path.join(self.directory.name, '*'))
+    with open(path, 'r+b') as cache_file:
+      cache_file.truncate(100)
+    cache = render_cache.RenderCache(self.directory.name)
+    tile.Reset()
+    with self.assertLogs(level='WARNING'):
+      self.assertEqual(self._Play(cache, tile), expected)
+    self.assertEqual((cache.hits, cache.misses, cache.stored), (0, 1, 1))
+
+  def testSkippedFramesNotStored(self):
+    """ Ensure incomplete sequences are not stored. """
+    cache = render_cache.RenderCache(self.directory.name)
+    tile = self._Tile()
+    cache.Render(tile)
+    tile.StepFrame()
+    tile.StepFrame()
+    for frame in range(tile.GetMaxFrames()):
+      cache.Render(tile)
+      tile.StepFrame()
+    self.assertEqual(cache.stored, 0)
+
+  def testTileManager(self):
+    """ Ensure a restarted tile manager shows the same frames from cache. """
+    runs = []
+    for run in range(2):
+      sink = RecordingSink()
+      cache = render_cache.RenderCache(self.directory.name)
+      tiles = [self._Tile(), weather.WeatherTile32x32(self.data)]
+      manager = tile_manager.TileManager(tiles, 32, 4, fps=1,
+                                         static_lifespan=3, sinks=[sink],
+                                         render_cache=cache)
+      while not manager._AllTilesDisplayed():
+        manager._RenderPruneAndTick()
+        manager._RenderAddNewTiles()
+        manager._RenderToMatrix()
+      runs.append((sink.hashes, cache.hits, cache.stored))
+    self.assertEqual(runs[0][0], runs[1][0])
+    self.assertEqual(runs[0][1:], (0, 2))
+    self.assertEqual(runs[1][1:], (2, 0))
+
+
+if __name__ == '__main__':
+  unittest.main()
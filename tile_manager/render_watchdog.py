@@ -0,0 +1,221 @@
+#
+# Per-tile render time watchdog for Tile Manager.
+#
+# Every tile render is timed against a budget. A tile going over budget is
+# degraded step by step instead of stalling the whole display:
+#
+#   1. its last good frame (rendered within budget) is reused, or a blank
+#      frame if there is none, the tile is only rendered every other frame;
+#      the interval doubles for each further render over budget,
+#   2. after QUARANTINE_STRIKES renders in a row over budget (or failing)
+#      the tile is quarantined: it is no longer rendered or scheduled, and
+#      the reason is logged.
+#
+# Tiles rendering within budget again have their interval halved back to
+# every frame. Render times are tracked as exponential moving averages and
+# exposed with GetStats() to find slow tiles:
+#
+#   watchdog = render_watchdog.RenderWatchdog(budget=0.05)
+#   manager = tile_manager.TileManager(tiles, watchdog=watchdog)
+#
+
+import logging
+import time
+from PIL import Image
+
+
+class TileRenderStats(object):
+  """ Render statistics and degradation state of one tile.
+
+  Attributes:
+    name: String tile description, for reports.
+    budget: Float seconds a render may take.
+    average: Float moving average render time in seconds, or None.
+    last: Float last render time in seconds, or None.
+    max: Float longest render time in seconds.
+    renders: Integer number of renders.
+    reused: Integer number of frames the last good frame was reused.
+    failures: Integer number of renders raising an exception.
+    strikes: Integer consecutive renders over budget or failing.
+    interval: Integer frames between renders, 1 renders every frame.
+    quarantined: Boolean True if the tile is no longer rendered.
+    reason: String why the tile was quarantined, or None.
+  """
+
+  def __init__(self, name, budget):
+    """ Initalize tile render statistics.
+
+    Args:
+      name: String tile description.
+      budget: Float seconds a render may take.
+    """
+    self.name = name
+    self.budget = budget
+    self.average = None
+    self.last = None
+    self.max = 0.0
+    self.renders = 0
+    self.reused = 0
+    self.failures = 0
+    self.strikes = 0
+    self.interval = 1
+    self.quarantined = False
+    self.reason = None
+    self.frame = None
+    self.skip = 0
+
+  def AsDict(self):
+    """ Returns Dictionary of the statistics. """
+    return {'name': self.name,
+            'budget': self.budget,
+            'average': self.average,
+            'last': self.last,
+            'max': self.max,
+            'renders': self.renders,
+            'reused': self.reused,
+            'failures': self.failures,
+            'interval': self.interval,
+            'quarantined': self.quarantined,
+            'reason': self.reason}
+
+
+class RenderWatchdog(object):
+  """ Times tile renders and degrades tiles exceeding their budget.
+
+  Attributes:
+    budget: Float default seconds a tile render may take.
+    SMOOTHING: Float weight of the newest render time in the moving average.
+        Default: 0.2.
+    MAX_INTERVAL: Integer maximum frames between renders of a slow tile.
+        Default: 16.
+    QUARANTINE_STRIKES: Integer consecutive renders over budget (or failing)
+        before a tile is quarantined. Default: 6.
+  """
+  SMOOTHING = 0.2
+  MAX_INTERVAL = 16
+  QUARANTINE_STRIKES = 6
+
+  def __init__(self, budget=0.05, clock=time.perf_counter):
+    """ Initalize render watchdog.
+
+    Args:
+      budget: Float default seconds a tile render may take. Default: 0.05.
+      clock: Function returning a monotonic time in seconds.
+          Default: time.perf_counter.
+    """
+    self.budget = budget
+    self._clock = clock
+    self._stats = {}
+
+  def _GetStats(self, tile):
+    """ Returns TileRenderStats for a tile, creating them if new. """
+    stats = self._stats.get(tile)
+    if stats is None:
+      stats = self._stats[tile] = TileRenderStats(
+          '%s@%x' % (type(tile).__name__, id(tile)), self.budget)
+    return stats
+
+  def SetBudget(self, tile, budget):
+    """ Override the render budget of one tile.
+
+    Args:
+      tile: BaseTile to set the budget for.
+      budget: Float seconds a render of the tile may take.
+    """
+    self._GetStats(tile).budget = budget
+
+  def IsQuarantined(self, tile):
+    """ Returns Boolean True if the tile is no longer rendered. """
+    stats = self._stats.get(tile)
+    return bool(stats and stats.quarantined)
+
+  def Release(self, tile):
+    """ Reset the statistics of a tile, releasing it from quarantine.
+
+    Args:
+      tile: BaseTile to release, its budget is kept.
+    """
+    stats = self._stats.get(tile)
+    if stats:
+      self._stats[tile] = TileRenderStats(stats.name, stats.budget)
+
+  def Forget(self, tile):
+    """ Drop the statistics of a tile no longer displayed.
+
+    Args:
+      tile: BaseTile to forget.
+    """
+    self._stats.pop(tile, None)
+
+  def _Quarantine(self, stats, reason):
+    """ Stop rendering a tile, logging the reason. """
+    stats.quarantined = True
+    stats.reason = reason
+    stats.frame = None
+    logging.warning('RenderWatchdog: quarantined %s: %s', stats.name, reason)
+
+  def _Strike(self, stats, reason):
+    """ Degrade a tile after a render over budget or failing. """
+    stats.strikes += 1
+    if stats.strikes >= self.QUARANTINE_STRIKES:
+      self._Quarantine(stats, '%s, %d times in a row' % (reason, stats.strikes))
+    else:
+      stats.interval = min(self.MAX_INTERVAL, stats.interval * 2)
+
+  def _Blank(self, tile):
+    """ Returns PIL.Image black frame the size of a tile. """
+    return Image.new('RGB', tile.GetTileDiemensions())
+
+  def Render(self, tile):
+    """ Returns PIL.Image frame for a tile, rendering it if due.
+
+    Args:
+      tile: BaseTile to render.
+    """
+    stats = self._GetStats(tile)
+    if stats.quarantined:
+      return self._Blank(tile)
+    if stats.skip > 0:
+      stats.skip -= 1
+      if stats.frame is None:
+        return self._Blank(tile)
+      stats.reused += 1
+      return stats.frame
+
+    start = self._clock()
+    try:
+      frame = tile.Render()
+    except Exception as e:
+      stats.failures += 1
+      logging.error('RenderWatchdog: %s render failed: %s', stats.name, e)
+      self._Strike(stats, 'render failed: %s' % e)
+      stats.skip = stats.interval - 1
+      if stats.frame is None or stats.quarantined:
+        return self._Blank(tile)
+      stats.reused += 1
+      return stats.frame
+    elapsed = self._clock() - start
+
+    stats.renders += 1
+    stats.last = elapsed
+    stats.max = max(stats.max, elapsed)
+    if stats.average is None:
+      stats.average = elapsed
+    else:
+      stats.average += self.SMOOTHING * (elapsed - stats.average)
+    if elapsed > stats.budget:
+      self._Strike(stats, 'render took %.0fms, budget %.0fms' %
+                   (elapsed * 1000, stats.budget * 1000))
+    else:
+      stats.strikes = 0
+      if stats.average <= stats.budget:
+        stats.interval = max(1, stats.interval // 2)
+      # The tile keeps drawing into the same buffer, keep a copy to reuse.
+      stats.frame = frame.copy()
+    stats.skip = stats.interval - 1
+    return frame
+
+  def GetStats(self):
+    """ Returns List of Dictionary statistics per tile, slowest first. """
+    return sorted((stats.AsDict() for stats in self._stats.values()),
+                  key=lambda stats: -(stats['average'] or 0.0))
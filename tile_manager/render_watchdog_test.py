@@ -0,0 +1,170 @@
+#
+# Render watchdog unittest.
+#
+
+import base_tile
+import render_watchdog
+import tile_manager
+import unittest
+
+
+class FakeClock(object):
+  """ Clock advanced by tile renders. """
+
+  def __init__(self):
+    self.now = 1000.0
+
+  def Time(self):
+    return self.now
+
+
+class TimedTile(base_tile.BaseTile):
+  """ Tile taking a set time to render, drawing its render count. """
+
+  def __init__(self, clock, duration=0.001):
+    base_tile.BaseTile.__init__(self, scrolling=(-1, 0))
+    self.clock = clock
+    self.duration = duration
+    self.fail = False
+    self.renders = 0
+
+  def Render(self):
+    self.clock.now += self.duration
+    if self.fail:
+      self._image_draw.rectangle((0, 0, 31, 31), fill=base_tile.RED)
+      raise Exception('no data')
+    self.renders += 1
+    self._image_draw.rectangle((0, 0, 31, 31), fill=(self.renders, 0, 0))
+    return self._image_buffer
+
+
+class TestRenderWatchdog(unittest.TestCase):
+  """ Test timing and degrading tile renders. """
+
+  def setUp(self):
+    """ Initalize RenderWatchdog test setup. """
+    self.clock = FakeClock()
+    self.watchdog = render_watchdog.RenderWatchdog(budget=0.05,
+                                                   clock=self.clock.Time)
+    self.tile = TimedTile(self.clock)
+
+  def Render(self, frames):
+    """ Returns List of Integer render counts shown for a number of frames. """
+    return [self.watchdog.Render(self.tile).getpixel((0, 0))[0]
+            for frame in range(frames)]
+
+  def testWithinBudget(self):
+    """ Ensure tiles within budget are rendered every frame. """
+    self.assertEqual(self.Render(4), [1, 2, 3, 4])
+    (stats,) = self.watchdog.GetStats()
+    self.assertEqual(stats['renders'], 4)
+    self.assertEqual(stats['reused'], 0)
+    self.assertEqual(stats['interval'], 1)
+    self.assertAlmostEqual(stats['average'], 0.001)
+
+  def testOverBudgetReusesFrame(self):
+    """ Ensure slow tiles reuse their last good frame, less often rendered.
+    """
+    self.Render(1)
+    self.tile.duration = 0.2
+    self.assertEqual(self.Render(7), [2, 1, 3, 1, 1, 1, 4])
+    (stats,) = self.watchdog.GetStats()
+    self.assertEqual(stats['interval'], 8)
+    self.assertEqual(stats['reused'], 4)
+    self.assertAlmostEqual(stats['max'], 0.2)
+
+  def testOverBudgetWithoutFrame(self):
+    """ Ensure frames over budget are not reused, blank until a good one.
+    """
+    self.tile.duration = 0.2
+    self.assertEqual(self.Render(4), [1, 0, 2, 0])
+    self.tile.duration = 0.001
+    self.assertEqual(self.Render(5), [0, 0, 3, 3, 3])
+    (stats,) = self.watchdog.GetStats()
+    self.assertEqual(stats['reused'], 2)
+
+  def testRecovers(self):
+    """ Ensure tiles back within budget are rendered every frame again. """
+    self.tile.duration = 0.2
+    self.Render(3)
+    self.tile.duration = 0.001
+    self.Render(40)
+    (stats,) = self.watchdog.GetStats()
+    self.assertEqual(stats['interval'], 1)
+    self.assertFalse(stats['quarantined'])
+
+  def testQuarantine(self):
+    """ Ensure tiles staying over budget are quarantined with a reason. """
+    self.tile.duration = 0.2
+    with self.assertLogs(level='WARNING'):
+      self.Render(200)
+    self.assertTrue(self.watchdog.IsQuarantined(self.tile))
+    (stats,) = self.watchdog.GetStats()
+    self.assertEqual(stats['renders'], 6)
+    self.assertIn('200ms', stats['reason'])
+    self.assertEqual(self.Render(1), [0])
+
+    self.watchdog.Release(self.tile)
+    self.assertFalse(self.watchdog.IsQuarantined(self.tile))
+
+  def testFailure(self):
+    """ Ensure failing renders reuse the last good frame. """
+    self.Render(2)
+    self.tile.fail = True
+    with self.assertLogs(level='ERROR'):
+      self.assertEqual(self.Render(1), [2])
+    (stats,) = self.watchdog.GetStats()
+    self.assertEqual(stats['failures'], 1)
+
+  def testFailureWithoutFrame(self):
+    """ Ensure failing renders without a good frame are blank. """
+    self.tile.fail = True
+    with self.assertLogs(level='ERROR'):
+      self.assertEqual(self.Render(1), [0])
+
+  def testSetBudget(self):
+    """ Ensure tiles can have their own budget. """
+    self.tile.duration = 0.1
+    self.watchdog.SetBudget(self.tile, 0.5)
+    self.assertEqual(self.Render(3), [1, 2, 3])
+    self.watchdog.Release(self.tile)
+    self.assertEqual(self.watchdog.GetStats()[0]['budget'], 0.5)
+
+  def testStatsSlowestFirst(self):
+    """ Ensure the slowest tiles are reported first. """
+    slow = TimedTile(self.clock, 0.01)
+    self.watchdog.Render(self.tile)
+    self.watchdog.Render(slow)
+    names = [stats['name'] for stats in self.watchdog.GetStats()]
+    self.assertEqual(names, ['TimedTile@%x' % id(tile)
+                             for tile in (slow, self.tile)])
+
+
+class TestTileManagerWatchdog(unittest.TestCase):
+  """ Test tile manager rendering through a watchdog. """
+
+  def setUp(self):
+    """ Initalize TileManager with a watchdog test setup. """
+    self.clock = FakeClock()
+    self.watchdog = render_watchdog.RenderWatchdog(budget=0.05,
+                                                   clock=self.clock.Time)
+    self.tiles = [TimedTile(self.clock), TimedTile(self.clock)]
+    self.manager = tile_manager.TileManager(self.tiles, 32, 2, fps=60,
+                                            watchdog=self.watchdog)
+
+  def testRendersThroughWatchdog(self):
+    """ Ensure tiles are timed by the watchdog. """
+    self.manager._RenderAddNewTiles()
+    self.manager._RenderToMatrix()
+    self.assertEqual(len(self.watchdog.GetStats()), 2)
+
+  def testQuarantinedTileSkipped(self):
+    """ Ensure quarantined tiles are no longer scheduled. """
+    self.watchdog._GetStats(self.tiles[0]).quarantined = True
+    self.manager._RenderAddNewTiles()
+    self.assertEqual(self.manager.render_pipeline, [[1, -1]])
+    self.assertTrue(self.tiles[0].IsExpired())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -4,23 +4,46 @@
 # The mock is created to enable testing for non-linux devices or systems which
 # do not have the module installed.
 #
+# The mock is a virtual panel: every frame pushed is kept in memory in a
+# bounded ring buffer along with push statistics, so long runs can be
+# simulated at full speed and the frames inspected afterwards. Nothing is
+# written to disk unless LOG_RENDER_BUFFER is set; for long recordings use
+# frame_recorder instead.
+#
 
+import collections
 import datetime
 import os
 import pytz
+import time
+from PIL import Image
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
 
 
-class Adafruit_RGBmatrix(object):
-  """ Mock out the used methods for the matrix.
+class RGBMatrix(object):
+  """ Virtual RGB matrix panel implementing the used rgbmatrix methods.
 
   Attributes:
+    FRAME_BUFFER_SIZE: Integer number of most recent frames kept in memory.
+        Default: 64.
     LOG_RENDER_BUFFER: Boolean True for SetImage() calls to write image to file.
         Default: False.
     LOG_LOCATION: String location for test render logs to be saved.
     LOG_TIMEZONE: pytz timezone object containing log timezone information.
         Default: America/Los_Angeles.
+    frames: collections.deque of Tuple (Tuple: size, bytes: RGB data) for
+        the most recent frames, oldest first.
+    pwm_bits: Integer PWM bits per color channel the panel displays.
+    push_count: Integer total number of frames pushed.
+    bytes_pushed: Integer total number of frame bytes pushed.
+    clear_count: Integer number of times the panel was cleared.
     last_log_file: String location where last image was logged to.
   """
+  FRAME_BUFFER_SIZE = 64
   LOG_RENDER_BUFFER = False
   LOG_LOCATION = 'testdata/rgbmatrix_mock'
   LOG_TIMEZONE = pytz.timezone('America/Los_Angeles')
@@ -28,27 +51,127 @@ class Adafruit_RGBmatrix(object):
   def __init__(self, matrix_size, chain_length):
     self._matrix_size = matrix_size
     self._chain_length = chain_length
+    self._write_cycles = None
+    self.pwm_bits = 11
     self._log_path = os.path.join(
         os.path.dirname(os.path.realpath(__file__)),
         self.LOG_LOCATION)
     if not os.path.isdir(self._log_path) and self.LOG_RENDER_BUFFER:
       raise Exception('Log render buffer specified, but %s log directory does '
-                      'not exist!' % self._log_path)      
+                      'not exist!' % self._log_path)
+    self.frames = collections.deque(maxlen=self.FRAME_BUFFER_SIZE)
+    self.push_count = 0
+    self.bytes_pushed = 0
+    self.clear_count = 0
+    self._last_push = None
+    self._intervals = collections.deque(maxlen=self.FRAME_BUFFER_SIZE)
+    self._interval_total = 0.0
+    self._interval_min = None
+    self._interval_max = None
 
   def SetWriteCycles(self, write_cycles):
     self._write_cycles = write_cycles
 
+  def SetPWMBits(self, bits):
+    self.pwm_bits = bits
+
   def SetImage(self, image, x, y):
+    """ Push a frame to the virtual panel.
+
+    Args:
+      image: PIL.Image RGB frame.
+      x: Integer X offset of the frame on the panel.
+      y: Integer Y offset of the frame on the panel.
+    """
+    now = time.perf_counter()
+    if self._last_push is not None:
+      interval = now - self._last_push
+      self._intervals.append(interval)
+      self._interval_total += interval
+      if self._interval_min is None or interval < self._interval_min:
+        self._interval_min = interval
+      if self._interval_max is None or interval > self._interval_max:
+        self._interval_max = interval
+    self._last_push = now
+
     self._image = image
     self._image_x = x
     self._image_y = y
+    data = image.tobytes()
+    self.frames.append((image.size, data))
+    self.push_count += 1
+    self.bytes_pushed += len(data)
     if self.LOG_RENDER_BUFFER:
       now = (datetime.datetime.now(self.LOG_TIMEZONE)
              .astimezone(self.LOG_TIMEZONE)
-             .strftime('%Y-%m-%d-%H:%M:%S'))
-      log_file = os.path.join(self._log_path, '%s.png' % now)
-      self._image.save(log_file)
+             .strftime('%Y-%m-%d-%H:%M:%S.%f'))
+      log_file = os.path.join(self._log_path,
+                              '%s-%08d.png' % (now, self.push_count))
+      image.save(log_file)
       self.last_log_file = log_file
 
   def Clear(self):
-    pass
+    self.clear_count += 1
+
+  def GetFrameImage(self, index=-1):
+    """ Returns PIL.Image for a buffered frame.
+
+    Args:
+      index: Integer index into the buffered frames, negative counts from the
+          most recent. Default: -1 (most recent).
+    """
+    (size, data) = self.frames[index]
+    return Image.frombytes('RGB', size, data)
+
+  def GetFrameArray(self, index=-1):
+    """ Returns numpy.ndarray (height, width, 3) for a buffered frame.
+
+    The array is a read only view of the buffered frame, no pixels are
+    copied.
+
+    Args:
+      index: Integer index into the buffered frames, negative counts from the
+          most recent. Default: -1 (most recent).
+
+    Raises:
+      Exception if numpy is not installed.
+    """
+    if numpy is None:
+      raise Exception('RGBMatrix: GetFrameArray requires numpy.')
+    ((width, height), data) = self.frames[index]
+    return numpy.frombuffer(data, dtype=numpy.uint8).reshape(height, width, 3)
+
+  def GetStats(self):
+    """ Returns Dictionary of push statistics.
+
+    Intervals are seconds between consecutive SetImage() calls; mean, min and
+    max cover all pushes, recent_intervals the buffered frames only.
+    """
+    intervals = self.push_count - 1
+    return {
+        'pushes': self.push_count,
+        'bytes': self.bytes_pushed,
+        'buffered': len(self.frames),
+        'clears': self.clear_count,
+        'mean_interval': (self._interval_total / intervals
+                          if intervals > 0 else None),
+        'min_interval': self._interval_min,
+        'max_interval': self._interval_max,
+        'recent_intervals': list(self._intervals),
+    }
+
+  def ResetStats(self):
+    """ Drop buffered frames and reset push statistics. """
+    self.frames.clear()
+    self.push_count = 0
+    self.bytes_pushed = 0
+    self.clear_count = 0
+    self._last_push = None
+    self._intervals.clear()
+    self._interval_total = 0.0
+    self._interval_min = None
+    self._interval_max = None
+
+
+# Name used by the Adafruit fork of the library.
+Adafruit_RGBmatrix = RGBMatrix
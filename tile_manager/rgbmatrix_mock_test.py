@@ -0,0 +1,72 @@
+#
+# Virtual RGB matrix panel unittest.
+#
+
+import matrix_manager
+import rgbmatrix_mock
+import unittest
+from PIL import Image
+
+
+class TestRGBMatrixMock(unittest.TestCase):
+  """ Test the in-memory virtual panel. """
+
+  def setUp(self):
+    """ Initalize virtual panel test setup. """
+    self.panel = rgbmatrix_mock.RGBMatrix(32, 2)
+
+  def _Push(self, count):
+    """ Push count solid frames, frame n has a red value of n. """
+    for index in range(count):
+      self.panel.SetImage(Image.new('RGB', (64, 32), (index, 0, 0)), 0, 0)
+
+  def testRingBuffer(self):
+    """ Ensure only the most recent frames are kept. """
+    self._Push(self.panel.FRAME_BUFFER_SIZE + 10)
+    self.assertEqual(len(self.panel.frames), self.panel.FRAME_BUFFER_SIZE)
+    self.assertEqual(self.panel.GetFrameImage(0).getpixel((0, 0)),
+                     (10, 0, 0))
+    self.assertEqual(self.panel.GetFrameImage().getpixel((0, 0)),
+                     (self.panel.FRAME_BUFFER_SIZE + 9, 0, 0))
+
+  def testStats(self):
+    """ Ensure pushes, bytes and intervals are counted. """
+    self.assertIsNone(self.panel.GetStats()['mean_interval'])
+    self._Push(3)
+    self.panel.Clear()
+    stats = self.panel.GetStats()
+    self.assertEqual(stats['pushes'], 3)
+    self.assertEqual(stats['bytes'], 3 * 64 * 32 * 3)
+    self.assertEqual(stats['clears'], 1)
+    self.assertEqual(len(stats['recent_intervals']), 2)
+    self.assertLessEqual(stats['min_interval'], stats['max_interval'])
+    self.panel.ResetStats()
+    self.assertEqual(self.panel.GetStats()['pushes'], 0)
+    self.assertEqual(len(self.panel.frames), 0)
+
+  def testGetFrameArray(self):
+    """ Ensure frames are exposed as (height, width, 3) arrays. """
+    if rgbmatrix_mock.numpy is None:
+      self.skipTest('numpy not installed.')
+    self._Push(2)
+    array = self.panel.GetFrameArray()
+    self.assertEqual(array.shape, (32, 64, 3))
+    self.assertEqual(int(array[5, 5, 0]), 1)
+
+  def testLegacyName(self):
+    """ Ensure the Adafruit class name is still available. """
+    self.assertIs(rgbmatrix_mock.Adafruit_RGBmatrix, rgbmatrix_mock.RGBMatrix)
+
+  def testMatrixInterfaceRender(self):
+    """ Ensure MatrixInterface pushes the composite frame to the panel. """
+    matrix = matrix_manager.MatrixInterface(32, 2)
+    matrix.FillScreen((0, 0, 255))
+    panel = matrix._matrix
+    self.assertEqual(panel.GetFrameImage().getpixel((63, 31)), (0, 0, 255))
+    matrix.SetBrightness(0.5)
+    matrix.Render()
+    self.assertEqual(panel.GetFrameImage().getpixel((0, 0)), (0, 0, 128))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,15 +3,42 @@
 #
 # This tile will render a route with stop times to a tile.
 #
+# Stop labels and colors only change when a stop crosses LONG_TIME, SHORT_TIME
+# or departs; the rendered text is cached and only redrawn at those instants,
+# every other frame just repositions the cached text.
+#
 
 import base_tile
+import bisect
 import datetime
 import math
 import pytz
-from PIL import Image
 from PIL import ImageDraw
 from PIL import ImageFont
 
+SHORT_TIME = datetime.timedelta(minutes=5)
+LONG_TIME = datetime.timedelta(minutes=10)
+
+
+def GetStopFill(stop, now, short_time=SHORT_TIME, long_time=LONG_TIME):
+  """ Returns Tuple (Integer: R, Integer: G, Integer: B) color for a stop.
+
+  Stops departing sooner than short_time are red, sooner than long_time
+  yellow, and green otherwise.
+
+  Args:
+    stop: datetime timezone aware stop time.
+    now: datetime timezone aware current time.
+    short_time: datetime.timedelta red threshold. Default: 5 minutes.
+    long_time: datetime.timedelta yellow threshold. Default: 10 minutes.
+  """
+  time_delta = stop - now
+  if time_delta < short_time:
+    return base_tile.RED
+  elif time_delta < long_time:
+    return base_tile.YELLOW
+  return base_tile.GREEN
+
 
 class AbstractRouteTile(base_tile.BaseTile):
   """ Abstract route tile used to handle routes and stops.
@@ -28,8 +55,8 @@ class AbstractRouteTile(base_tile.BaseTile):
         Default: 'America/Los_Angeles'.
     NUMBER_STOPS: Integer max number of stops to display for route. Default: 4.
   """
-  SHORT_TIME = datetime.timedelta(minutes=5)
-  LONG_TIME = datetime.timedelta(minutes=10)
+  SHORT_TIME = SHORT_TIME
+  LONG_TIME = LONG_TIME
   TIME_FORMAT = '%H:%M'
   TIME_ZONE = pytz.timezone('America/Los_Angeles')
   NUMBER_STOPS = 4
@@ -50,19 +77,94 @@ class AbstractRouteTile(base_tile.BaseTile):
           respective axis. Default: (2, 0) (scroll right).
       route_name: String route name. Default: 'Test'.
       stops: List of datetime timezone aware objects for next time on route.
-          Default: utcnow().
+          Default: the current time.
     """
     base_tile.BaseTile.__init__(self, x, y, scrolling)
     self.route = route_name or 'TEST'
-    self.stops = stops or [datetime.datetime.now(self.TIME_ZONE)]
     self._stop_width = self.FONT.getsize(
-        datetime.datetime.now(self.TIME_ZONE)
-            .astimezone(tz=self.TIME_ZONE)
-            .strftime(self.TIME_FORMAT))[0] + 3
+        self._Now().strftime(self.TIME_FORMAT))[0] + 3
+    self.SetStops(stops or [self._Now()])
+
+  def _Now(self):
+    """ Returns datetime timezone aware current time. """
+    return self.CLOCK.Now(self.TIME_ZONE)
+
+  def SetStops(self, stops):
+    """ Replace the stop times for the route.
+
+    Stops are sorted and their labels formatted once here, instead of on
+    every render. Set stops using this method, not the stops attribute.
+
+    Args:
+      stops: List of datetime timezone aware objects for next time on route.
+    """
+    self.stops = sorted(stops)
+    self._labels = [' %s' % stop.astimezone(tz=self.TIME_ZONE)
+                                .strftime(self.TIME_FORMAT)
+                    for stop in self.stops]
+    self._fills = None
+    self._next_change = None
+
+  def _GetFill(self, stop, now):
+    """ Returns Tuple (Integer: R, Integer: G, Integer: B) color for a stop.
+
+    Args:
+      stop: datetime timezone aware stop time.
+      now: datetime timezone aware current time.
+    """
+    return GetStopFill(stop, now, self.SHORT_TIME, self.LONG_TIME)
+
+  def GetCacheKey(self):
+    """ Returns the content the route's frames depend on, for a render cache.
+
+    The displayed stops are classified as of now; a stop changing color
+    while a cached sequence is played is shown from the next sequence.
+    """
+    now = self._Now()
+    departed = bisect.bisect_left(self.stops, now)
+    displayed = self.stops[departed:departed + self.NUMBER_STOPS]
+    return (self.route,
+            tuple(self._labels[departed:departed + self.NUMBER_STOPS]),
+            tuple(self._GetFill(stop, now) for stop in displayed),
+            self.START_X, self.START_Y, self.scrolling)
+
+  def _UpdateStops(self, now):
+    """ Drop departed stops and classify the displayed stops.
+
+    Stops are displayed until the time has passed, then dropped. The next
+    instant a displayed stop changes color or departs is kept, so nothing
+    needs to be recomputed until then.
+
+    Args:
+      now: datetime timezone aware current time.
+
+    Returns:
+      Boolean True if the displayed stops changed.
+    """
+    if (self._fills is not None and
+        (self._next_change is None or now <= self._next_change)):
+      return False
+    departed = bisect.bisect_left(self.stops, now)
+    if departed:
+      del self.stops[:departed]
+      del self._labels[:departed]
+
+    displayed = self.stops[:self.NUMBER_STOPS]
+    fills = tuple(self._GetFill(stop, now) for stop in displayed)
+    changes = [change for stop in displayed
+               for change in (stop - self.LONG_TIME,
+                              stop - self.SHORT_TIME,
+                              stop)
+               if change >= now]
+    self._next_change = min(changes) if changes else None
+    changed = departed or fills != self._fills
+    self._fills = fills
+    return bool(changed)
 
 
 class RouteTile32x32(AbstractRouteTile):
-  """ 32x32 pixel route tile. """
+  """ 32x32 pixel route tile, palette-indexed. """
+  BUFFER_MODE = 'P'
 
   def _GetRenderSize(self):
     """ Determines the total size of the information rendered within a tile.
@@ -77,6 +179,42 @@ class RouteTile32x32(AbstractRouteTile):
     stop_columns = math.ceil(min(len(self.stops), self.NUMBER_STOPS) / 2)
     return (stop_columns * self._stop_width, self.TILE_HEIGHT)
 
+  def OnHide(self):
+    """ Release the image buffer and the cached layers. """
+    base_tile.BaseTile.OnHide(self)
+    self._route_layer = self._stops_layer = self._stops_mask = None
+    self._fills = None
+
+  def _RenderLayers(self):
+    """ Render the route name and stops into cached images.
+
+    The route name only moves vertically and the stops only horizontally
+    with scrolling, so each is rendered once and pasted at the scrolled
+    position by Render().
+    """
+    self._route_layer = self._NewImage((self.TILE_WIDTH, self.TILE_HEIGHT))
+    draw = ImageDraw.Draw(self._route_layer)
+    draw.text((0, 0), '%s ' % self.route, font=self.FONT, fill=base_tile.WHITE)
+    route_y = self.FONT.getsize(self.route)[1]
+
+    columns = math.ceil(len(self._fills) / 2)
+    self._stops_layer = self._NewImage(
+        (max(1, columns * self._stop_width), self.TILE_HEIGHT))
+    draw = ImageDraw.Draw(self._stops_layer)
+    x = 0
+    y = route_y
+    for index, fill in enumerate(self._fills):
+      if index % 2 == 0 and index > 0:
+        x += self._stop_width
+        y = route_y
+      label = self._labels[index]
+      draw.text((x, y + self.FONT_Y_OFFSET), '%s ' % label, font=self.FONT,
+                fill=fill)
+      y += self.FONT.getsize(label)[1]
+    # Text is drawn without a background, so only text pixels are pasted.
+    self._stops_mask = (self._stops_layer.convert('L')
+                        .point(lambda v: 255 if v else 0))
+
   def Render(self):
     """ Returns Image buffer for tile to render.
 
@@ -93,33 +231,12 @@ class RouteTile32x32(AbstractRouteTile):
     Returns:
       Image containing rendered tile to display.
     """
+    if self._UpdateStops(self._Now()):
+      self._RenderLayers()
     self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
                                 fill=base_tile.BLACK)
-    now = datetime.datetime.now(self.TIME_ZONE)
-    x = self.x
-    y = route_y = self._RenderText(0,
-                                   self.y + self.FONT_Y_OFFSET,
-                                   self.route)[1]
-
-    for index, stop in enumerate(self.stops):      
-      fill = base_tile.GREEN
-      time_delta = stop - now
-      if time_delta < self.SHORT_TIME:
-        fill = base_tile.RED
-      elif time_delta < self.LONG_TIME:
-        fill = base_tile.YELLOW
-      
-      if index % 2 == 0 and index > 0:
-        x += self._stop_width
-        y = route_y
-      if index > self.NUMBER_STOPS:
-        break
-
-      y += self._RenderText(
-          x,
-          y + self.FONT_Y_OFFSET,
-          ' %s' % stop.astimezone(tz=self.TIME_ZONE).strftime(self.TIME_FORMAT),
-          color=fill)[1]
-
+    self._image_buffer.paste(self._route_layer,
+                             (0, self.y + self.FONT_Y_OFFSET))
+    self._image_buffer.paste(self._stops_layer, (self.x, 0), self._stops_mask)
     self.displayed = True
     return self._image_buffer
@@ -2,6 +2,7 @@
 # Mass Transit Route Tile unittest.
 #
 
+import base_tile
 import datetime
 import pytz
 import route
@@ -16,11 +17,14 @@ class TestRouteTile32x32(unittest_tiletest.TileTest):
   def setUp(self):
     """ Initalize RouteTile32x32 test setup.
 
-    Statically create a stop time so we know the expected size of text.
+    Statically create a stop time so we know the expected size of text, and
+    a current time just before it so the stop is displayed.
     """
     test_time = datetime.datetime(2017, 1, 1,
                                   tzinfo=pytz.timezone('America/Los_Angeles'))
+    self.now = test_time - datetime.timedelta(minutes=1)
     self.tile = route.RouteTile32x32(stops=[test_time])
+    self.tile._Now = lambda: self.now
 
   def testInitUtcNowTimezoneAware(self):
     """ Ensure the default utcnow() datetime has no issues with timezones. """
@@ -38,6 +42,86 @@ class TestRouteTile32x32(unittest_tiletest.TileTest):
     self.assertIsInstance(image, Image.Image)
     self.AssertSameImage(image, 'testdata/route/test_render.png')
 
+  def testSetStopsSortsAndFormats(self):
+    """ Ensure stops are sorted and labels are formatted once. """
+    stops = [self.now + datetime.timedelta(minutes=minutes)
+             for minutes in (30, 2, 12)]
+    self.tile.SetStops(stops)
+    self.assertEqual(self.tile.stops, sorted(stops))
+    self.assertEqual(
+        self.tile._labels,
+        [' %s' % stop.astimezone(tz=self.tile.TIME_ZONE).strftime('%H:%M')
+         for stop in sorted(stops)])
+
+  def testColorThresholds(self):
+    """ Ensure stops are colored by time until departure. """
+    self.tile.SetStops([self.now + datetime.timedelta(minutes=minutes)
+                        for minutes in (2, 7, 12)])
+    self.tile.Render()
+    self.assertEqual(self.tile._fills,
+                     (base_tile.RED, base_tile.YELLOW, base_tile.GREEN))
+
+  def testGetStopFill(self):
+    """ Ensure the shared stop colors follow the thresholds given. """
+    stop = self.now + datetime.timedelta(minutes=7)
+    self.assertEqual(route.GetStopFill(stop, self.now), base_tile.YELLOW)
+    self.assertEqual(route.GetStopFill(stop, self.now,
+                                       datetime.timedelta(minutes=8),
+                                       datetime.timedelta(minutes=9)),
+                     base_tile.RED)
+    self.assertEqual(route.GetStopFill(stop, self.now,
+                                       datetime.timedelta(minutes=1),
+                                       datetime.timedelta(minutes=2)),
+                     base_tile.GREEN)
+
+  def testNextChange(self):
+    """ Ensure the next change is the closest color change or departure. """
+    stop = self.now + datetime.timedelta(minutes=12)
+    self.tile.SetStops([stop])
+    self.tile.Render()
+    self.assertEqual(self.tile._next_change, stop - self.tile.LONG_TIME)
+    self.now = stop - datetime.timedelta(minutes=7)
+    self.tile.Render()
+    self.assertEqual(self.tile._fills, (base_tile.YELLOW,))
+    self.assertEqual(self.tile._next_change, stop - self.tile.SHORT_TIME)
+    self.now = stop - datetime.timedelta(minutes=1)
+    self.tile.Render()
+    self.assertEqual(self.tile._fills, (base_tile.RED,))
+    self.assertEqual(self.tile._next_change, stop)
+
+  def testDepartedStopsDropped(self):
+    """ Ensure stops are dropped once departed. """
+    stops = [self.now + datetime.timedelta(minutes=minutes)
+             for minutes in (1, 2, 20)]
+    self.tile.SetStops(stops)
+    self.now = stops[1] + datetime.timedelta(seconds=1)
+    self.tile.Render()
+    self.assertEqual(self.tile.stops, stops[2:])
+    self.assertEqual(len(self.tile._labels), 1)
+    self.assertEqual(self.tile._fills, (base_tile.GREEN,))
+
+  def testRenderOnlyOnChange(self):
+    """ Ensure text is only redrawn when a stop changes color or departs. """
+    self.tile.SetStops([self.now + datetime.timedelta(minutes=20)])
+    self.tile.Render()
+    layer = self.tile._stops_layer
+    self.now += datetime.timedelta(minutes=5)
+    self.tile.StepFrame()
+    self.tile.Render()
+    self.assertIs(self.tile._stops_layer, layer)
+    self.now += datetime.timedelta(minutes=6)
+    self.tile.Render()
+    self.assertIsNot(self.tile._stops_layer, layer)
+
+  def testNumberStops(self):
+    """ Ensure no more than NUMBER_STOPS stops are rendered. """
+    self.tile.SetStops([self.now + datetime.timedelta(minutes=minutes)
+                        for minutes in range(20, 26)])
+    self.tile.Render()
+    self.assertEqual(len(self.tile._fills), self.tile.NUMBER_STOPS)
+    self.assertEqual(self.tile._stops_layer.size[0],
+                     self.tile._GetRenderSize()[0])
+
 
 class TestRouteTile32x32Full(unittest_tiletest.TileTest):
   """ Ensure full frame stepping and rendering works. """
@@ -54,10 +138,11 @@ class TestRouteTile32x32Full(unittest_tiletest.TileTest):
         datetime.datetime(2017, 11, 11, 11, 0, tzinfo=self.TIMEZONE),
         datetime.datetime(2017, 12, 12, 12, 0, tzinfo=self.TIMEZONE)]
     self.tile = route.RouteTile32x32(stops=stops)
+    self.tile._Now = lambda: stops[0] - datetime.timedelta(minutes=1)
 
   def testStepRender(self):
     """ Test a full run of a sample stop. """
-    self.AssertStepRender(self.tile, 'testdata/route/step_render_%02d.png')
+    self.AssertGoldenFrames(self.tile, 'testdata/route/step_render.golden')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,108 @@
+#
+# Integer upscaling of tiles for large displays.
+#
+# Tiles are drawn for 32 pixel panels; on 64 pixel panels their 8 pixel font
+# is unreadable from a distance. TileManager can show every tile scaled by an
+# integer factor instead, so a 32x32 tile fills a 64x64 (2x) or 128x128 (4x)
+# slot. Tiles still render at their native size; the frame is scaled with
+# nearest neighbor sampling, keeping text and icon edges sharp.
+#
+# Scaling is done once per distinct frame: the scaled frame of each tile is
+# cached and reused while the tile renders the same pixels (e.g. static
+# tiles, or scrolling tiles paused between steps). Looking at the pixels
+# costs about as much as scaling them, so the tile's state is checked first:
+# the same frame of the same content (see BaseTile.GetCacheKey) is reused
+# as is, and a tile that moved is scaled again. Only the pixels of tiles
+# staying in place are compared.
+#
+# Palette-indexed ('P' mode) frames are expanded to RGB by the same cache,
+# at any factor including 1, so they are not converted again every time they
+# are pasted onto the screen.
+#
+
+import weakref
+from PIL import Image
+
+
+class TileScaler(object):
+  """ Scales tile frames by an integer factor, caching the last frame.
+
+  Frames are returned in RGB, palette-indexed frames are expanded.
+
+  Attributes:
+    factor: Integer scale factor, 1 or more.
+    scaled: Integer number of frames scaled (or expanded to RGB).
+    reused: Integer number of frames served from the cache.
+  """
+
+  def __init__(self, factor):
+    """ Initalize tile scaler.
+
+    Args:
+      factor: Integer scale factor, 1 or more.
+
+    Raises:
+      Exception if the factor is not a positive integer.
+    """
+    if not isinstance(factor, int) or factor < 1:
+      raise Exception('TileScaler: scale must be a positive integer.')
+    self.factor = factor
+    self.scaled = 0
+    self.reused = 0
+    self._frames = weakref.WeakKeyDictionary()
+
+  def GetFootprint(self, tile):
+    """ Returns Tuple (Integer: X, Integer: Y) scaled tile size in pixels.
+
+    Args:
+      tile: BaseTile to get the size of.
+    """
+    (width, height) = tile.GetTileDiemensions()
+    return (width * self.factor, height * self.factor)
+
+  def Scale(self, tile, image):
+    """ Returns PIL.Image RGB frame of a tile, scaled.
+
+    The returned image must not be modified, it is reused for the tile's
+    following frames while they render the same pixels.
+
+    Args:
+      tile: BaseTile the frame was rendered by.
+      image: PIL.Image frame rendered by the tile.
+    """
+    if self.factor == 1 and image.mode == 'RGB':
+      return image
+    size = (image.size[0] * self.factor, image.size[1] * self.factor)
+    state = (tile.GetCacheKey(), tile.current_frame, tile.x, tile.y,
+             image.mode, size)
+    cached = self._frames.get(tile)
+    data = None
+    if cached:
+      (cached_state, cached_data, scaled) = cached
+      if state[0] is not None and state == cached_state:
+        self.reused += 1
+        return scaled
+      if state[2:] == cached_state[2:]:
+        data = image.tobytes()
+        if data == cached_data:
+          self._frames[tile] = (state, data, scaled)
+          self.reused += 1
+          return scaled
+    else:
+      data = image.tobytes()
+    scaled = image
+    if image.mode != 'RGB':
+      scaled = scaled.convert('RGB')
+    if self.factor != 1:
+      scaled = scaled.resize(size, Image.NEAREST)
+    self._frames[tile] = (state, data, scaled)
+    self.scaled += 1
+    return scaled
+
+  def Forget(self, tile):
+    """ Drop the cached frame of a tile no longer displayed.
+
+    Args:
+      tile: BaseTile to forget.
+    """
+    self._frames.pop(tile, None)
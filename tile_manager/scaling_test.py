@@ -0,0 +1,222 @@
+#
+# Tile scaling unittest.
+#
+
+import base_tile
+import scaling
+import tile_manager
+import unittest
+import weather
+from PIL import Image
+
+WEATHER = {'id': 208,
+           'main': 'sunny',
+           'description': 'sunny and clear.',
+           'icon': '01d',
+           'temp': 72,
+           'temp_min': 68,
+           'temp_max': 78,
+           'humidity': 23}
+
+
+class TextTile(base_tile.BaseTile):
+  """ Static tile showing a short text. """
+
+  def __init__(self, text, color=base_tile.WHITE):
+    base_tile.BaseTile.__init__(self)
+    self.text = text
+    self.color = color
+
+  def Render(self):
+    base_tile.BaseTile.Render(self)
+    self._RenderText(2, 2, self.text, self.color)
+    return self._image_buffer
+
+
+class KeyedTextTile(TextTile):
+  """ Text tile declaring the content its frames depend on. """
+
+  def GetCacheKey(self):
+    return (self.text,)
+
+
+class PaletteTextTile(KeyedTextTile):
+  """ Text tile rendering into a palette-indexed buffer. """
+  BUFFER_MODE = 'P'
+
+
+class WallMatrix(object):
+  """ MatrixInterface stand-in for a wall of any size. """
+
+  def __init__(self, width, height, tile_size):
+    self.width = width
+    self.height = height
+    self.tile_size = tile_size
+    self.shape = [[None] * (width // tile_size)
+                  for row in range(height // tile_size)]
+    self.offscreen_buffer = Image.new('RGB', (width, height))
+
+  def FillScreen(self):
+    self.offscreen_buffer.paste(0, (0, 0, self.width, self.height))
+
+  def Render(self):
+    pass
+
+
+class TestTileScaler(unittest.TestCase):
+  """ Test scaling tile frames. """
+
+  def setUp(self):
+    """ Initalize TileScaler test setup. """
+    self.scaler = scaling.TileScaler(2)
+    self.tile = TextTile('A')
+
+  def testFootprint(self):
+    """ Ensure the footprint is the scaled tile size. """
+    self.assertEqual(self.scaler.GetFootprint(self.tile), (64, 64))
+    self.assertEqual(scaling.TileScaler(4).GetFootprint(
+        weather.WeatherTile64x32(WEATHER)), (256, 128))
+
+  def testNearestNeighbor(self):
+    """ Ensure every pixel becomes a sharp factor x factor block. """
+    image = self.tile.Render()
+    scaled = self.scaler.Scale(self.tile, image)
+    self.assertEqual(scaled.size, (64, 64))
+    for (x, y) in ((0, 0), (3, 5), (31, 31), (4, 4)):
+      for (dx, dy) in ((0, 0), (1, 0), (0, 1), (1, 1)):
+        self.assertEqual(scaled.getpixel((x * 2 + dx, y * 2 + dy)),
+                         image.getpixel((x, y)))
+
+  def testCachedUntilChanged(self):
+    """ Ensure frames are only scaled again when the tile changes. """
+    first = self.scaler.Scale(self.tile, self.tile.Render())
+    self.assertIs(self.scaler.Scale(self.tile, self.tile.Render()), first)
+    self.tile.text = 'B'
+    second = self.scaler.Scale(self.tile, self.tile.Render())
+    self.assertIsNot(second, first)
+    self.assertNotEqual(second.tobytes(), first.tobytes())
+    self.assertEqual((self.scaler.scaled, self.scaler.reused), (2, 1))
+    self.scaler.Forget(self.tile)
+    self.scaler.Scale(self.tile, self.tile.Render())
+    self.assertEqual(self.scaler.scaled, 3)
+
+  def testSameStateNotCompared(self):
+    """ Ensure the same frame of the same content is reused unread. """
+    tile = KeyedTextTile('A')
+    first = self.scaler.Scale(tile, tile.Render())
+    image = tile.Render()
+    image.tobytes = None
+    self.assertIs(self.scaler.Scale(tile, image), first)
+    del image.tobytes
+    tile.text = 'B'
+    self.assertIsNot(self.scaler.Scale(tile, tile.Render()), first)
+
+  def testMovedNotCompared(self):
+    """ Ensure frames of moving tiles are scaled again unread. """
+    tile = KeyedTextTile('A')
+    tile.scrolling = (-1, 0)
+    self.scaler.Scale(tile, tile.Render())
+    for frame in range(3):
+      tile.StepFrame()
+      image = tile.Render()
+      image.tobytes = None
+      self.scaler.Scale(tile, image)
+      del image.tobytes
+    self.assertEqual((self.scaler.scaled, self.scaler.reused), (4, 0))
+
+  def testStaticCompared(self):
+    """ Ensure tiles staying in place reuse frames with the same pixels.
+    """
+    tile = KeyedTextTile('A')
+    first = self.scaler.Scale(tile, tile.Render())
+    for frame in range(3):
+      tile.StepFrame()
+      self.assertIs(self.scaler.Scale(tile, tile.Render()), first)
+    self.assertEqual((self.scaler.scaled, self.scaler.reused), (1, 3))
+
+  def testPaletteExpandedOnce(self):
+    """ Ensure static palette frames are expanded to RGB once. """
+    scaler = scaling.TileScaler(1)
+    tile = PaletteTextTile('A', base_tile.RED)
+    image = tile.Render()
+    self.assertEqual(image.mode, 'P')
+    first = scaler.Scale(tile, image)
+    self.assertEqual(first.mode, 'RGB')
+    self.assertEqual(first.tobytes(), image.convert('RGB').tobytes())
+    for frame in range(3):
+      tile.StepFrame()
+      self.assertIs(scaler.Scale(tile, tile.Render()), first)
+    self.assertEqual((scaler.scaled, scaler.reused), (1, 3))
+
+  def testPaletteScaled(self):
+    """ Ensure palette frames are scaled to RGB. """
+    tile = PaletteTextTile('A', base_tile.RED)
+    image = tile.Render()
+    expected = image.convert('RGB').resize((64, 64), Image.NEAREST)
+    self.assertEqual(self.scaler.Scale(tile, image).tobytes(),
+                     expected.tobytes())
+
+  def testNativeSize(self):
+    """ Ensure a factor of 1 returns the frame unchanged. """
+    image = self.tile.Render()
+    self.assertIs(scaling.TileScaler(1).Scale(self.tile, image), image)
+
+  def testInvalidFactor(self):
+    """ Ensure only positive integer factors are accepted. """
+    for factor in (0, 1.5, -2):
+      with self.assertRaises(Exception):
+        scaling.TileScaler(factor)
+
+
+class TestScaledTileManager(unittest.TestCase):
+  """ Test showing native tiles scaled on a 64x64 panel. """
+
+  def testScaledLayout(self):
+    """ Ensure scaled tiles take a 64x64 cell each. """
+    tiles = [TextTile('A', base_tile.RED), TextTile('B', base_tile.GREEN)]
+    manager = tile_manager.TileManager(tiles, 64, 1, fps=1, static_lifespan=2,
+                                       scale=2)
+    self.assertEqual((manager.max_tile_width, manager.max_tile_height),
+                     (64, 64))
+    shown = []
+    while not manager._AllTilesDisplayed():
+      manager._RenderPruneAndTick()
+      manager._RenderAddNewTiles()
+      manager._RenderToMatrix()
+      shown.append(manager.render_pipeline[0][0])
+    self.assertEqual(shown, [0, 0, 0, 0, 1, 1, 1, 1])
+
+    expected = tiles[1].Render().resize((64, 64), Image.NEAREST)
+    self.assertEqual(manager.matrix.offscreen_buffer.tobytes(),
+                     expected.tobytes())
+    # Static frames were scaled once per tile.
+    self.assertEqual(manager.scaler.scaled, 2)
+
+  def testScaledTooBig(self):
+    """ Ensure tiles too big once scaled are rejected. """
+    with self.assertRaises(Exception):
+      tile_manager.TileManager([weather.WeatherTile64x32(WEATHER)], 64, 1,
+                               scale=2)
+
+  def testScaledTallerThanCell(self):
+    """ Ensure tiles scaled taller than a cell are rejected, not overlapped.
+    """
+    with self.assertRaises(Exception):
+      tile_manager.TileManager([TextTile('A'), TextTile('B')], fps=1, scale=2,
+                               matrix=WallMatrix(128, 64, 32))
+
+  def testScaledSpan(self):
+    """ Ensure scaled wide tiles span cells on a 128x64 wall. """
+    tiles = [weather.WeatherTile64x32(WEATHER), TextTile('A'), TextTile('B')]
+    manager = tile_manager.TileManager(tiles, fps=1, scale=2,
+                                       matrix=WallMatrix(128, 64, 64))
+    manager._RenderAddNewTiles()
+    self.assertEqual(manager.render_pipeline, [[0, 0]])
+    manager._RenderToMatrix()
+    expected = tiles[0].Render().resize((128, 64), Image.NEAREST)
+    self.assertEqual(manager.matrix.offscreen_buffer.tobytes(),
+                     expected.tobytes())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,256 @@
+#
+# Streaming Ticker Tile for Tile Manager.
+#
+# A news or alerts crawler fed by an unbounded stream of messages:
+#
+#   [ ... breaking: N line delayed   weather alert ... ]
+#
+# Messages are pulled from an iterable (list, generator) or a queue.Queue
+# only when their text is about to scroll in. Text is rasterized a character
+# at a time into a ring buffer just ahead of the viewport, and columns are
+# cleared for re-use as soon as they scroll off, so memory is bounded by the
+# tile width plus LOOKAHEAD however long the ticker runs.
+#
+
+import base_tile
+import queue
+import sys
+from PIL import Image
+from PIL import ImageDraw
+
+
+class AbstractTickerTile(base_tile.BaseTile):
+  """ Abstract ticker tile, scrolling an unbounded stream of messages.
+
+  The tile expires once the stream ends and its text has scrolled off, or
+  after max_frames frames if set. A queue.Queue stream ends when None is put
+  in it; an empty queue leaves a gap until the next message arrives.
+
+  Resetting the tile restarts the message being displayed; messages already
+  scrolled off are not replayed.
+
+  Attributes:
+    LOOKAHEAD: Integer columns rasterized beyond the right edge, at least the
+        widest character. Default: 16.
+    ROW_HEIGHT: Integer height of the ticker text row, in pixels. Default: 11.
+    SEPARATOR: String appended to every message. Default: 3 spaces.
+    max_frames: Integer frames the tile is displayed, or None until the
+        stream ends.
+    messages: Integer number of messages pulled from the stream.
+  """
+  LOOKAHEAD = 16
+  ROW_HEIGHT = 11
+  SEPARATOR = '   '
+
+  def __init__(self, messages, x=None, y=0, scrolling=(-1, 0), max_frames=None):
+    """ Initalize ticker tile object.
+
+    Args:
+      messages: Iterable or queue.Queue of String messages, or Tuple
+          (String: message, Tuple: (Integer: R, Integer: G, Integer: B)
+          color). Strings are white.
+      x: Integer absolute X position of the stream start.
+          Default: None (TILE_WIDTH, text enters from the right).
+      y: Integer absolute Y position of the ticker row. Default: 0.
+      scrolling: Tuple (Integer: X, Integer: Y) containing scrolling
+          information. Default: (-1, 0) (scroll left).
+      max_frames: Integer frames to display the tile for.
+          Default: None (until the stream ends).
+
+    Raises:
+      Exception if the tile does not scroll left.
+    """
+    if scrolling[0] >= 0 or scrolling[1] != 0:
+      raise Exception('TickerTile: tickers only scroll left.')
+    if x is None:
+      x = self.TILE_WIDTH
+    base_tile.BaseTile.__init__(self, x, y, scrolling)
+    if isinstance(messages, queue.Queue):
+      self._queue = messages
+      self._iterator = None
+    else:
+      self._queue = None
+      self._iterator = iter(messages)
+    self.max_frames = max_frames
+    self.messages = 0
+    self._exhausted = False
+    self._text = ''
+    self._color = base_tile.WHITE
+    self._ring_width = self.TILE_WIDTH + self.LOOKAHEAD
+    self._ring = Image.new('RGB', (self._ring_width, self.ROW_HEIGHT))
+    self._ring_draw = ImageDraw.Draw(self._ring)
+    self._Restart()
+
+  def _Restart(self):
+    """ Empty the ring buffer, restarting the current message. """
+    self._ring_draw.rectangle((0, 0, self._ring_width, self.ROW_HEIGHT),
+                              fill=base_tile.BLACK)
+    # Stream columns: [_tail, _head) are rasterized, column c is displayed
+    # at tile X position x + c.
+    self._tail = -self.x
+    self._head = 0
+    self._index = 0
+    self._waiting = False
+
+  def _NextMessage(self):
+    """ Returns Boolean True if a new message was pulled from the stream. """
+    if self._exhausted:
+      return False
+    if self._queue is not None:
+      try:
+        message = self._queue.get_nowait()
+      except queue.Empty:
+        self._waiting = True
+        return False
+      if message is None:
+        self._exhausted = True
+        return False
+    else:
+      try:
+        message = next(self._iterator)
+      except StopIteration:
+        self._exhausted = True
+        return False
+    if isinstance(message, tuple):
+      (text, self._color) = message
+    else:
+      (text, self._color) = (message, base_tile.WHITE)
+    self._text = '%s%s' % (text, self.SEPARATOR)
+    self._index = 0
+    self.messages += 1
+    if self._waiting:
+      # After a gap, new text enters from the right edge.
+      self._head = max(self._head, self._tail + self.TILE_WIDTH)
+      self._waiting = False
+    return True
+
+  def AddMessage(self, message):
+    """ Queue a message on a ticker fed by a queue.Queue.
+
+    Args:
+      message: String message, Tuple (String: message, Tuple: color), or
+          None to end the stream.
+
+    Raises:
+      Exception if the ticker is not fed by a queue.Queue.
+    """
+    if self._queue is None:
+      raise Exception('TickerTile: only queue fed tickers accept messages.')
+    self._queue.put(message)
+
+  def _FreeColumns(self, tail):
+    """ Clear ring columns scrolled off the left edge.
+
+    Args:
+      tail: Integer first stream column still displayed.
+    """
+    start = max(self._tail, tail - self._ring_width)
+    if start < tail:
+      self._ClearRing(start, tail)
+    self._tail = tail
+
+  def _ClearRing(self, start, end):
+    """ Clear stream columns [start, end) in the ring buffer. """
+    position = start % self._ring_width
+    width = end - start
+    first = min(width, self._ring_width - position)
+    self._ring_draw.rectangle((position, 0, position + first - 1,
+                               self.ROW_HEIGHT), fill=base_tile.BLACK)
+    if first < width:
+      self._ring_draw.rectangle((0, 0, width - first - 1, self.ROW_HEIGHT),
+                                fill=base_tile.BLACK)
+
+  def _RasterizeCharacter(self):
+    """ Returns PIL.Image columns of the next character of the message.
+
+    Bitmap font glyphs may overlap their neighbours, so the character is
+    drawn with the characters around it and only its own columns are kept,
+    matching the text drawn at once.
+    """
+    before = self._text[max(0, self._index - 1):self._index]
+    character = self._text[self._index]
+    after = self._text[self._index + 1:self._index + 2]
+    offset = self.FONT.getsize(before)[0] if before else 0
+    width = self.FONT.getsize(character)[0]
+    scratch = Image.new('RGB', (self.FONT.getsize(
+        before + character + after)[0] + 1, self.ROW_HEIGHT))
+    ImageDraw.Draw(scratch).text((0, self.FONT_Y_OFFSET),
+                                 before + character + after,
+                                 font=self.FONT, fill=self._color)
+    return scratch.crop((offset, 0, offset + width, self.ROW_HEIGHT))
+
+  def _Rasterize(self):
+    """ Rasterize characters until the ring buffer is full. """
+    end = self._tail + self._ring_width
+    while True:
+      if self._index >= len(self._text) and not self._NextMessage():
+        return
+      width = self.FONT.getsize(self._text[self._index])[0]
+      if self._head + width > end:
+        return
+      columns = self._RasterizeCharacter()
+      position = self._head % self._ring_width
+      first = min(width, self._ring_width - position)
+      self._ring.paste(columns.crop((0, 0, first, self.ROW_HEIGHT)),
+                       (position, 0))
+      if first < width:
+        self._ring.paste(columns.crop((first, 0, width, self.ROW_HEIGHT)),
+                         (0, 0))
+      self._head += width
+      self._index += 1
+
+  def GetMaxFrames(self):
+    """ Returns Integer total number of frames for tile.
+
+    While the stream is running, the tile does not expire.
+    """
+    if self.max_frames is not None:
+      return self.max_frames
+    if not self._exhausted:
+      return sys.maxsize
+    return self._GetFrameCount(self.scrolling[0], self.START_X,
+                               self.TILE_WIDTH, self._head)
+
+  def SetMaxFrameCount(self, count):
+    """ Manually set the max frame count for a tile.
+
+    Args:
+      count: Integer number of frames to set.
+    """
+    self.max_frames = count
+
+  def Reset(self):
+    """ Reset tile frame state to initial state. """
+    base_tile.BaseTile.Reset(self)
+    self._Restart()
+
+  def Render(self):
+    """ Returns Image buffer for tile to render.
+
+    Render can be called multiple times, but it is not garanteed that a
+    specific time has elapsed; meaning you have would have to determine
+    to advance the frame before rendering.
+
+    Returns:
+      Image containing rendered tile to display.
+    """
+    self._FreeColumns(-self.x)
+    self._Rasterize()
+    self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
+                               fill=base_tile.BLACK)
+    position = self._tail % self._ring_width
+    first = min(self.TILE_WIDTH, self._ring_width - position)
+    self._image_buffer.paste(
+        self._ring.crop((position, 0, position + first, self.ROW_HEIGHT)),
+        (0, self.y))
+    if first < self.TILE_WIDTH:
+      self._image_buffer.paste(
+          self._ring.crop((0, 0, self.TILE_WIDTH - first, self.ROW_HEIGHT)),
+          (first, self.y))
+    self.displayed = True
+    return self._image_buffer
+
+
+class TickerTile64x32(AbstractTickerTile):
+  """ 64x32 pixel ticker tile. """
+  TILE_WIDTH = 64
@@ -0,0 +1,131 @@
+#
+# Streaming Ticker Tile unittest.
+#
+
+import base_tile
+import queue
+import sys
+import ticker
+import unittest
+from PIL import Image
+from PIL import ImageDraw
+
+
+class TestTickerTile64x32(unittest.TestCase):
+  """ Ensure ticker functionality works. """
+
+  def Reference(self, text, color=base_tile.WHITE):
+    """ Returns PIL.Image of the whole text, entering from the right. """
+    tile = ticker.TickerTile64x32
+    width = tile.FONT.getsize(text)[0]
+    image = Image.new('RGB', (tile.TILE_WIDTH * 2 + width, tile.ROW_HEIGHT))
+    ImageDraw.Draw(image).text((tile.TILE_WIDTH, tile.FONT_Y_OFFSET),
+                               '%s ' % text, font=tile.FONT, fill=color)
+    return image
+
+  def Frames(self, tile, count):
+    """ Returns List of PIL.Image ticker rows rendered for a number of frames.
+    """
+    frames = []
+    for frame in range(count):
+      frames.append(tile.Render().crop((0, 0, tile.TILE_WIDTH,
+                                        tile.ROW_HEIGHT)))
+      tile.StepFrame()
+    return frames
+
+  def testRenderMatchesReference(self):
+    """ Ensure scrolled frames match drawing the whole text at once. """
+    messages = ['N line delayed', 'Fog advisory until 10am', 'All clear']
+    tile = ticker.TickerTile64x32(messages)
+    reference = self.Reference(tile.SEPARATOR.join(messages))
+    for (frame, image) in enumerate(self.Frames(tile, reference.size[0] - 64)):
+      expected = reference.crop((frame, 0, frame + 64, tile.ROW_HEIGHT))
+      self.assertEqual(list(image.getdata()), list(expected.getdata()),
+                       'frame %d' % frame)
+
+  def testColors(self):
+    """ Ensure messages are drawn in their color. """
+    tile = ticker.TickerTile64x32([('ALERT', base_tile.RED)], x=0)
+    colors = set(tile.Render().getdata())
+    self.assertEqual(colors, {base_tile.BLACK, base_tile.RED})
+
+  def testStreamPulledLazily(self):
+    """ Ensure messages are only pulled when about to scroll in. """
+    pulled = []
+
+    def Stream():
+      while True:
+        pulled.append(True)
+        yield 'message %d' % len(pulled)
+
+    tile = ticker.TickerTile64x32(Stream())
+    self.Frames(tile, 2000)
+    self.assertEqual(tile.messages, len(pulled))
+    self.assertLess(len(pulled), 60)
+    self.assertFalse(tile.IsExpired())
+    self.assertEqual(tile.GetMaxFrames(), sys.maxsize)
+    # The ring buffer never grows.
+    self.assertEqual(tile._ring.size, (64 + tile.LOOKAHEAD, tile.ROW_HEIGHT))
+
+  def testExpiresWhenStreamEnds(self):
+    """ Ensure the tile expires once the last message scrolled off. """
+    tile = ticker.TickerTile64x32(['short'])
+    width = tile.FONT.getsize('short' + tile.SEPARATOR)[0]
+    frames = 0
+    while not tile.IsExpired():
+      tile.Render()
+      tile.StepFrame()
+      frames += 1
+    self.assertEqual(frames, 64 + width + 1)
+    self.assertEqual(tile.GetMaxFrames(), 64 + width)
+
+  def testMaxFrames(self):
+    """ Ensure a lifespan can be set for endless streams. """
+    tile = ticker.TickerTile64x32(iter(int, 1), max_frames=10)
+    self.assertEqual(tile.GetMaxFrames(), 10)
+    tile.SetMaxFrameCount(20)
+    self.assertEqual(tile.GetMaxFrames(), 20)
+
+  def testQueueGap(self):
+    """ Ensure queued messages after a gap enter from the right edge. """
+    messages = queue.Queue()
+    messages.put('first')
+    tile = ticker.TickerTile64x32(messages, x=0)
+    self.Frames(tile, 100)
+    blank = tile.Render()
+    self.assertEqual(blank.getbbox(), None)
+    messages.put('second')
+    image = tile.Render()
+    self.assertEqual(image.getbbox(), None)
+    self.Frames(tile, 4)
+    self.assertGreaterEqual(tile.Render().getbbox()[0], 60)
+    messages.put(None)
+    self.Frames(tile, 100)
+    self.assertTrue(tile.IsExpired())
+
+  def testAddMessage(self):
+    """ Ensure only queue fed tickers accept messages. """
+    tile = ticker.TickerTile64x32(queue.Queue(), x=0)
+    tile.AddMessage('queued')
+    self.assertIsNotNone(tile.Render().getbbox())
+    with self.assertRaises(Exception):
+      ticker.TickerTile64x32([]).AddMessage('listed')
+
+  def testReset(self):
+    """ Ensure resetting restarts the current message. """
+    tile = ticker.TickerTile64x32(['first message', 'second message'])
+    first = self.Frames(tile, 30)
+    tile.Reset()
+    self.assertEqual([image.tobytes() for image in self.Frames(tile, 30)],
+                     [image.tobytes() for image in first])
+    self.assertEqual(tile.messages, 1)
+
+  def testScrollingLeftOnly(self):
+    """ Ensure tickers cannot scroll in other directions. """
+    for scrolling in ((0, -1), (1, 0), (0, 0)):
+      with self.assertRaises(Exception):
+        ticker.TickerTile64x32([], scrolling=scrolling)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,8 +3,10 @@
 # 
 
 import blank
+import clocks
 import matrix_manager
-import time
+import scaling
+import transitions
 
 
 class TileManager(object):
@@ -35,10 +37,18 @@ class TileManager(object):
 
     [[3, None],
      [-1, -1]]
+
+  With a scale, tiles are rendered at their native size and shown scaled by
+  that integer factor; a 32x32 tile at scale 2 takes the space of a 64x64
+  tile. Scaled tiles span cells horizontally like wide tiles do; tiles are
+  one cell high, so tiles taller than tile_size once scaled are rejected.
   """
 
   def __init__(self, tiles, led_rows=32, chain_length=2, write_cycles=2,
-               tile_size=None, fps=1, static_lifespan=5):
+               tile_size=None, fps=1, static_lifespan=5,
+               color_correction=None, sinks=None, matrix=None, watchdog=None,
+               transition=None, dither=None, render_cache=None,
+               clock=None, scale=1, memory_monitor=None):
     """ Initalize tile manager.
 
     Args:
@@ -53,19 +63,53 @@ class TileManager(object):
           recommended.
       static_lifespan: Integer number of seconds a static tile should be
           displayed before being cleared. Default: 5 seconds.
+      color_correction: color_correction.ColorCorrection stage applied to
+          every frame before display. Default: None (no correction).
+      sinks: List of frame outputs, such as network_sink.NetworkFrameSink,
+          receiving every displayed frame. Default: None (matrix only).
+      matrix: MatrixInterface compatible object to display on. Default: None
+          (create a MatrixInterface from the arguments above).
+      watchdog: render_watchdog.RenderWatchdog timing tile renders and
+          degrading slow tiles. Default: None (tiles always rendered).
+      transition: transitions.Transition effect between a tile and the next
+          tile in the same space. Default: None (cut).
+      dither: dithering.OrderedDither stage reducing the output bit depth.
+          Default: None (full 8 bit output).
+      render_cache: render_cache.RenderCache playing back the frames of
+          cacheable tiles rendered before, also across restarts.
+          Default: None (tiles always rendered).
+      clock: clocks.RealClock or clocks.VirtualClock pacing frames, also set
+          on every tile. Default: None (clocks.GetClock(), the real clock).
+      scale: Integer factor tiles are scaled up by on screen, with nearest
+          neighbor sampling. Default: 1 (native size).
+      memory_monitor: memory_monitor.MemoryMonitor reporting memory growth
+          over display loops. Default: None (not monitored).
       render_pipline: List of Lists (matrix) containing Integer indexes
           representing the tile to display. This matrix shape is generated from
           the matrix_manager.
     """
     self.tiles = tiles
-    self.matrix = matrix_manager.MatrixInterface(led_rows,
-                                                 chain_length,
-                                                 write_cycles,
-                                                 tile_size)
+    self.matrix = matrix or matrix_manager.MatrixInterface(led_rows,
+                                                           chain_length,
+                                                           write_cycles,
+                                                           tile_size,
+                                                           color_correction,
+                                                           sinks,
+                                                           dither)
     self.fps = fps
     self.static_lifespan = static_lifespan
+    self.watchdog = watchdog
+    self.render_cache = render_cache
+    self.clock = clock or clocks.GetClock()
+    self.scaler = scaling.TileScaler(scale)
+    self.memory_monitor = memory_monitor
+    self.transitions = None
+    if transition:
+      self.transitions = transitions.TransitionEngine(transition,
+                                                      self.matrix.tile_size)
     self.render_pipeline = self.matrix.shape
     (self.max_tile_width, self.max_tile_height) = self._InitalizeTiles()
+    self._scheduled_tile = None
     self._current_time = 0.0
     self._previous_time = 0.0
 
@@ -79,16 +123,23 @@ class TileManager(object):
       Tuple (Integer: X, Integer: Y) of max tile size loaded.
 
     Raises:
-      Exception if a tile used is larger than the screen matrix size.
+      Exception if a tile used is larger than the screen matrix size, or
+      taller than a cell.
     """
     max_screen_width = 0
     max_screen_height = 0
     static_tile_frame_count = self.static_lifespan * self.fps
 
     for tile in self.tiles:
-      (screen_width, screen_height) = tile.GetTileDiemensions()
+      tile.SetClock(self.clock)
+      if self.render_cache:
+        self.render_cache.Prime(tile)
+      (screen_width, screen_height) = self.scaler.GetFootprint(tile)
       max_screen_width = max(screen_width, max_screen_width)
       max_screen_height = max(screen_height, max_screen_height)
+      if screen_height > self.matrix.tile_size:
+        raise Exception('TileManager: A tile cannot be taller than tile_size, '
+                        'lower the scale.')
       if tile.GetMaxFrames() == 0:
         tile.SetMaxFrameCount(static_tile_frame_count)
 
@@ -111,8 +162,13 @@ class TileManager(object):
       avaliable.
     """
     for index, tile in enumerate(self.tiles):
-      if not tile.displayed and tile.GetTileDiemensions() <= size:
+      (width, height) = self.scaler.GetFootprint(tile)
+      if not tile.displayed and width <= size[0] and height <= size[1]:
         self.tiles[index].displayed = True
+        if self.watchdog and self.watchdog.IsQuarantined(tile):
+          # Never shown again, but counts as displayed for looping.
+          tile.current_frame = tile.GetMaxFrames() + 1
+          continue
         return index
     return None
 
@@ -130,9 +186,24 @@ class TileManager(object):
     return True
 
   def _ResetTiles(self):
-    """ Resets all tiles to initial non-displayed state. """
+    """ Resets all tiles to initial non-displayed state.
+
+    This is the loop boundary memory growth is measured at.
+    """
+    if self.memory_monitor:
+      self.memory_monitor.LoopCompleted(self.tiles)
     for tile in self.tiles:
       tile.Reset()
+    self._scheduled_tile = None
+
+  def _ScheduleNextTile(self):
+    """ Let the next tile to be displayed prepare itself, once. """
+    for tile in self.tiles:
+      if not tile.displayed:
+        if tile is not self._scheduled_tile:
+          self._scheduled_tile = tile
+          tile.OnSchedule()
+        return
 
   def _RenderPruneAndTick(self):
     """ Check and remove finished tiles from render pipeline, tick frame.
@@ -145,13 +216,28 @@ class TileManager(object):
       +Integer: A positive Integer represents an index into self.tiles.
     """
     last_tile_index = None
+    hidden = set()
     for y_index, y_list in enumerate(self.render_pipeline):
       for x_index, tile_index in enumerate(y_list):
         if tile_index is not None:
           if tile_index == -1 or self.tiles[tile_index].IsExpired():
+            if tile_index != -1:
+              if self.transitions:
+                self.transitions.TileExpired(self.matrix.offscreen_buffer,
+                                             y_index, x_index)
+              if tile_index not in hidden:
+                # Expired tiles give back their buffers until shown again.
+                self.tiles[tile_index].OnHide()
+                if self.render_cache:
+                  self.render_cache.Forget(self.tiles[tile_index])
+                self.scaler.Forget(self.tiles[tile_index])
+                hidden.add(tile_index)
             self.render_pipeline[y_index][x_index] = None
           elif last_tile_index != tile_index:
-            self.tiles[tile_index].StepFrame()
+            # Transitions do not count against the tile lifespan.
+            if not (self.transitions and
+                    self.transitions.IsTransitioning(tile_index)):
+              self.tiles[tile_index].StepFrame()
             last_tile_index = tile_index
 
   def _RenderAddNewTiles(self):
@@ -172,12 +258,30 @@ class TileManager(object):
                self.matrix.tile_size))
           if new_tile_index is not None:
             adjust_space = int(
-                  self.tiles[new_tile_index].GetTileDiemensions()[0] /
+                  self.scaler.GetFootprint(self.tiles[new_tile_index])[0] /
                   self.matrix.tile_size)
             for i in range(x_index, x_index + adjust_space):
               self.render_pipeline[y_index][i] = new_tile_index
+            self.tiles[new_tile_index].OnShow()
+            if self.transitions:
+              self.transitions.TileAdded(new_tile_index, y_index, x_index,
+                                         adjust_space)
           else:
             self.render_pipeline[y_index][x_index] = -1
+    self._ScheduleNextTile()
+
+  def _RenderTile(self, tile):
+    """ Returns Image rendered by a tile.
+
+    Frames are played from the render cache if any, tiles rendered live go
+    through the watchdog if any.
+    """
+    render = self.watchdog.Render if self.watchdog else None
+    if self.render_cache:
+      return self.render_cache.Render(tile, render)
+    if render:
+      return render(tile)
+    return tile.Render()
 
   def _RenderToMatrix(self):
     """ Compose rendered image and send to matrix for display. """
@@ -189,23 +293,42 @@ class TileManager(object):
           self.matrix.offscreen_buffer.paste(
               blank.BlankTile().Render(),
               (x_composite_index, y_composite_index))
+          x_composite_index += self.matrix.tile_size
         elif last_tile_index != tile_index:
+          tile = self.tiles[tile_index]
           self.matrix.offscreen_buffer.paste(
-              self.tiles[tile_index].Render(),
+              self.scaler.Scale(tile, self._RenderTile(tile)),
               (x_composite_index, y_composite_index))
-          x_composite_index += self.tiles[tile_index].GetTileDiemensions()[0]
+          x_composite_index += self.scaler.GetFootprint(tile)[0]
           last_tile_index = tile_index
       y_composite_index += self.matrix.tile_size
       x_composite_index = 0
+    if self.transitions:
+      self.transitions.Compose(self.matrix.offscreen_buffer,
+                               self.render_pipeline)
     self.matrix.Render()
 
   def _RenderSyncFps(self):
-    """ Sync rendering to an approximate FPS specified by user. """
-    self._current_time = time.time()
-    delta = (1.0 / self.fps) - (self._current_time - self._previous_time)
-    if delta > 0.0:
-      time.sleep(delta)
-    self._previous_time = self._current_time
+    """ Sync rendering to an approximate FPS specified by user.
+
+    Each frame is due one frame interval after the previous frame was due,
+    so render times do not make the frame rate drift. A late frame starts
+    the schedule again instead of rushing the next frames to catch up.
+    """
+    self._current_time = self.clock.Time()
+    due = self._previous_time + 1.0 / self.fps
+    if due > self._current_time:
+      self.clock.Sleep(due - self._current_time)
+      self._previous_time = due
+    else:
+      self._previous_time = self._current_time
+
+  def _RenderFrame(self):
+    """ Advance, compose and display one frame at the requested FPS. """
+    self._RenderPruneAndTick()
+    self._RenderAddNewTiles()
+    self._RenderToMatrix()
+    self._RenderSyncFps()
 
   def Run(self, loop=False):
     """ Run through the displaying of all loaded tiles.
@@ -215,10 +338,7 @@ class TileManager(object):
     """
     self.matrix.FillScreen()
     while True:
-      self._RenderPruneAndTick()
-      self._RenderAddNewTiles()
-      self._RenderToMatrix()
-      self._RenderSyncFps()
+      self._RenderFrame()
 
       # If looping indefinitely, reset tiles.
       if self._AllTilesDisplayed():
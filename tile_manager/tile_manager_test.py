@@ -3,6 +3,7 @@
 #
 
 import blank
+import clocks
 import datetime
 import math
 import operator
@@ -232,7 +233,8 @@ class FullTileManagerTest(unittest.TestCase):
         datetime.datetime(2017, 11, 11, 11, 0, tzinfo=pytz.timezone('America/Los_Angeles')),
         datetime.datetime(2017, 12, 12, 12, 0, tzinfo=pytz.timezone('America/Los_Angeles'))]
     tile = route.RouteTile32x32(stops=stops)
-    manager = tile_manager.TileManager([weather_large, tile], 32, 2)
+    manager = tile_manager.TileManager([weather_large, tile], 32, 2,
+                                       clock=clocks.VirtualClock())
     manager.Run()
 
 
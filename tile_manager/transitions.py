@@ -0,0 +1,306 @@
+#
+# Transition effects between tiles for Tile Manager.
+#
+# When a tile expires, the space it used keeps showing its last frame until
+# the next tile is placed there; the two are then blended over a number of
+# frames instead of cutting. Space left empty transitions to a blank frame
+# the same way:
+#
+#   manager = tile_manager.TileManager(
+#       tiles, 32, 2, fps=30, transition=transitions.Crossfade(frames=15))
+#
+# Effects work on whole images with Pillow operations (blend, composite,
+# point lookup tables, crop and paste) which run in C over the buffer, never
+# per pixel in Python. The incoming tile does not advance frames while its
+# transition runs, so transitions do not shorten a tile's lifespan.
+#
+
+import random
+from PIL import Image
+
+LEFT = 'left'
+RIGHT = 'right'
+UP = 'up'
+DOWN = 'down'
+DIRECTIONS = (LEFT, RIGHT, UP, DOWN)
+
+
+class Transition(object):
+  """ Abstract transition effect.
+
+  Attributes:
+    frames: Integer number of frames the transition takes.
+  """
+
+  def __init__(self, frames=8):
+    """ Initalize transition.
+
+    Args:
+      frames: Integer number of frames the transition takes. Default: 8.
+
+    Raises:
+      Exception if frames is less than 1.
+    """
+    if frames < 1:
+      raise Exception('Transition: frames must be at least 1.')
+    self.frames = frames
+
+  def Blend(self, outgoing, incoming, progress):
+    """ Returns PIL.Image between the outgoing and incoming images.
+
+    Args:
+      outgoing: PIL.Image RGB frame being replaced.
+      incoming: PIL.Image RGB frame replacing it, same size.
+      progress: Float 0.0 (outgoing) to 1.0 (incoming).
+    """
+    raise NotImplementedError
+
+
+class Cut(Transition):
+  """ No transition, the incoming image replaces the outgoing one. """
+
+  def Blend(self, outgoing, incoming, progress):
+    return incoming
+
+
+class Crossfade(Transition):
+  """ Fade the outgoing image into the incoming image. """
+
+  def Blend(self, outgoing, incoming, progress):
+    return Image.blend(outgoing, incoming, progress)
+
+
+class _DirectionalTransition(Transition):
+  """ Transition moving in a direction.
+
+  Attributes:
+    direction: String direction the edge between the images moves to, one of
+        LEFT, RIGHT, UP, DOWN.
+  """
+
+  def __init__(self, frames=8, direction=LEFT):
+    """ Initalize directional transition.
+
+    Args:
+      frames: Integer number of frames the transition takes. Default: 8.
+      direction: String LEFT, RIGHT, UP or DOWN. Default: LEFT (the incoming
+          image enters from the right, like scrolling tiles).
+
+    Raises:
+      Exception if the direction is unknown.
+    """
+    Transition.__init__(self, frames)
+    if direction not in DIRECTIONS:
+      raise Exception('Transition: unknown direction %s.' % direction)
+    self.direction = direction
+
+  def _Offset(self, size, progress):
+    """ Returns Tuple (Integer: X, Integer: Y) moved by the edge so far. """
+    (width, height) = size
+    if self.direction == LEFT:
+      return (-round(width * progress), 0)
+    elif self.direction == RIGHT:
+      return (round(width * progress), 0)
+    elif self.direction == UP:
+      return (0, -round(height * progress))
+    return (0, round(height * progress))
+
+
+class Wipe(_DirectionalTransition):
+  """ Reveal the incoming image behind a moving edge. """
+
+  def Blend(self, outgoing, incoming, progress):
+    (width, height) = outgoing.size
+    (x, y) = self._Offset(outgoing.size, progress)
+    if self.direction == LEFT:
+      box = (width + x, 0, width, height)
+    elif self.direction == RIGHT:
+      box = (0, 0, x, height)
+    elif self.direction == UP:
+      box = (0, height + y, width, height)
+    else:
+      box = (0, 0, width, y)
+    frame = outgoing.copy()
+    frame.paste(incoming.crop(box), box[:2])
+    return frame
+
+
+class Slide(_DirectionalTransition):
+  """ Push the outgoing image out with the incoming image. """
+
+  def Blend(self, outgoing, incoming, progress):
+    (width, height) = outgoing.size
+    (x, y) = self._Offset(outgoing.size, progress)
+    frame = Image.new('RGB', outgoing.size)
+    frame.paste(outgoing, (x, y))
+    if self.direction == LEFT:
+      frame.paste(incoming, (width + x, 0))
+    elif self.direction == RIGHT:
+      frame.paste(incoming, (x - width, 0))
+    elif self.direction == UP:
+      frame.paste(incoming, (0, height + y))
+    else:
+      frame.paste(incoming, (0, y - height))
+    return frame
+
+
+class Dissolve(Transition):
+  """ Replace pixels in a random order. """
+
+  def __init__(self, frames=8, seed=0):
+    """ Initalize dissolve transition.
+
+    Args:
+      frames: Integer number of frames the transition takes. Default: 8.
+      seed: Integer seed of the pixel order. Default: 0.
+    """
+    Transition.__init__(self, frames)
+    self.seed = seed
+    self._noise = {}
+
+  def _GetNoise(self, size):
+    """ Returns PIL.Image L of random pixel ranks, cached per size. """
+    noise = self._noise.get(size)
+    if noise is None:
+      generator = random.Random(self.seed)
+      noise = self._noise[size] = Image.frombytes(
+          'L', size, bytes(generator.randrange(256)
+                           for pixel in range(size[0] * size[1])))
+    return noise
+
+  def Blend(self, outgoing, incoming, progress):
+    threshold = round(progress * 256)
+    mask = self._GetNoise(outgoing.size).point(
+        [255 if rank < threshold else 0 for rank in range(256)])
+    return Image.composite(incoming, outgoing, mask)
+
+
+class TransitionEngine(object):
+  """ Tracks and composes transitions for the cells of a render pipeline.
+
+  Cells are the tile sized spaces of the render pipeline, see
+  tile_manager.TileManager.
+
+  Attributes:
+    transition: Transition effect used.
+    tile_size: Integer cell size, in pixels.
+  """
+
+  def __init__(self, transition, tile_size):
+    """ Initalize transition engine.
+
+    Args:
+      transition: Transition effect to use between tiles.
+      tile_size: Integer cell size, in pixels.
+    """
+    self.transition = transition
+    self.tile_size = tile_size
+    self._outgoing = {}
+    self._active = []
+
+  def _CellBox(self, y_index, x_index, span=1):
+    """ Returns Tuple box of cells in a row, in pixels. """
+    return (x_index * self.tile_size, y_index * self.tile_size,
+            (x_index + span) * self.tile_size, (y_index + 1) * self.tile_size)
+
+  def TileExpired(self, buffer, y_index, x_index):
+    """ Keep the last frame displayed in a cell of an expired tile.
+
+    Args:
+      buffer: PIL.Image composed frame last displayed.
+      y_index: Integer cell row.
+      x_index: Integer cell column.
+    """
+    if (y_index, x_index) not in self._outgoing:
+      self._outgoing[(y_index, x_index)] = [
+          buffer.crop(self._CellBox(y_index, x_index)), 0]
+
+  def _Outgoing(self, snapshot, shown):
+    """ Returns PIL.Image of a kept frame transitioning to a blank frame.
+
+    Args:
+      snapshot: PIL.Image last frame of the expired tile in the cell.
+      shown: Integer frames the cell has been empty.
+    """
+    if not shown:
+      return snapshot
+    return self.transition.Blend(snapshot, Image.new('RGB', snapshot.size),
+                                 shown / (self.transition.frames + 1))
+
+  def TileAdded(self, tile_index, y_index, x_index, span):
+    """ Start a transition for a tile placed over expired cells.
+
+    Args:
+      tile_index: Integer index of the tile placed.
+      y_index: Integer cell row.
+      x_index: Integer first cell column.
+      span: Integer number of cells used by the tile.
+
+    Returns:
+      Boolean True if a transition was started.
+    """
+    cells = [(y_index, x) for x in range(x_index, x_index + span)]
+    if not any(cell in self._outgoing for cell in cells):
+      return False
+    outgoing = Image.new('RGB', (span * self.tile_size, self.tile_size))
+    for (offset, cell) in enumerate(cells):
+      kept = self._outgoing.pop(cell, None)
+      if kept is not None:
+        outgoing.paste(self._Outgoing(*kept), (offset * self.tile_size, 0))
+    self._active.append([tile_index, self._CellBox(y_index, x_index, span),
+                         outgoing, 0])
+    return True
+
+  def IsTransitioning(self, tile_index):
+    """ Returns Boolean True if a tile is in a transition. """
+    return any(active[0] == tile_index for active in self._active)
+
+  def TileRemoved(self, tile_index):
+    """ Update transitions after a tile was removed from the tiles list.
+
+    Args:
+      tile_index: Integer index of the removed tile.
+    """
+    self._active = [active for active in self._active
+                    if active[0] != tile_index]
+    for active in self._active:
+      if active[0] > tile_index:
+        active[0] -= 1
+
+  def Reset(self):
+    """ Drop every kept frame and transition. """
+    self._outgoing = {}
+    self._active = []
+
+  def Compose(self, buffer, render_pipeline):
+    """ Apply transitions to a composed frame and advance them one frame.
+
+    Cells waiting for a tile show the expired tile's last frame
+    transitioning to a blank frame; it is dropped once blank.
+
+    Args:
+      buffer: PIL.Image composed frame, modified in place.
+      render_pipeline: List of Lists of Integer tile indexes.
+    """
+    blank = []
+    for ((y_index, x_index), kept) in self._outgoing.items():
+      if render_pipeline[y_index][x_index] in (None, -1):
+        kept[1] += 1
+        if kept[1] > self.transition.frames:
+          blank.append((y_index, x_index))
+        else:
+          buffer.paste(self._Outgoing(*kept),
+                       self._CellBox(y_index, x_index)[:2])
+    for cell in blank:
+      del self._outgoing[cell]
+    finished = []
+    for active in self._active:
+      (tile_index, box, outgoing, frame) = active
+      progress = (frame + 1) / (self.transition.frames + 1)
+      buffer.paste(self.transition.Blend(outgoing, buffer.crop(box), progress),
+                   box[:2])
+      active[3] += 1
+      if active[3] >= self.transition.frames:
+        finished.append(active)
+    for active in finished:
+      self._active.remove(active)
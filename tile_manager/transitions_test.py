@@ -0,0 +1,166 @@
+#
+# Transition effects unittest.
+#
+
+import base_tile
+import tile_manager
+import transitions
+import unittest
+from PIL import Image
+
+RED = Image.new('RGB', (4, 2), base_tile.RED)
+BLUE = Image.new('RGB', (4, 2), base_tile.BLUE)
+
+
+class ColorTile(base_tile.BaseTile):
+  """ Static tile filled with one color. """
+
+  def __init__(self, color):
+    base_tile.BaseTile.__init__(self)
+    self.color = color
+
+  def Render(self):
+    self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
+                               fill=self.color)
+    self.displayed = True
+    return self._image_buffer
+
+
+class TestTransitions(unittest.TestCase):
+  """ Test transition effects. """
+
+  def Columns(self, image):
+    """ Returns List of Tuple colors of the first image row. """
+    return [image.getpixel((x, 0)) for x in range(image.size[0])]
+
+  def testFrames(self):
+    """ Ensure transitions take at least one frame. """
+    with self.assertRaises(Exception):
+      transitions.Crossfade(frames=0)
+
+  def testCut(self):
+    """ Ensure a cut shows the incoming image. """
+    self.assertIs(transitions.Cut().Blend(RED, BLUE, 0.5), BLUE)
+
+  def testCrossfade(self):
+    """ Ensure a crossfade mixes both images. """
+    frame = transitions.Crossfade().Blend(RED, BLUE, 0.25)
+    self.assertEqual(frame.getpixel((0, 0)), (191, 0, 63))
+
+  def testWipe(self):
+    """ Ensure a wipe reveals the incoming image from the edge. """
+    self.assertEqual(
+        self.Columns(transitions.Wipe().Blend(RED, BLUE, 0.25)),
+        [base_tile.RED] * 3 + [base_tile.BLUE])
+    self.assertEqual(
+        self.Columns(transitions.Wipe(direction=transitions.RIGHT)
+                     .Blend(RED, BLUE, 0.25)),
+        [base_tile.BLUE] + [base_tile.RED] * 3)
+    frame = transitions.Wipe(direction=transitions.UP).Blend(RED, BLUE, 0.5)
+    self.assertEqual((frame.getpixel((0, 0)), frame.getpixel((0, 1))),
+                     (base_tile.RED, base_tile.BLUE))
+    self.assertEqual(
+        self.Columns(transitions.Wipe().Blend(RED, BLUE, 0.0)),
+        [base_tile.RED] * 4)
+
+  def testSlide(self):
+    """ Ensure a slide moves both images. """
+    left = Image.new('RGB', (4, 1))
+    left.putdata([(1, 0, 0), (2, 0, 0), (3, 0, 0), (4, 0, 0)])
+    right = Image.new('RGB', (4, 1))
+    right.putdata([(0, 1, 0), (0, 2, 0), (0, 3, 0), (0, 4, 0)])
+    self.assertEqual(
+        self.Columns(transitions.Slide().Blend(left, right, 0.5)),
+        [(3, 0, 0), (4, 0, 0), (0, 1, 0), (0, 2, 0)])
+    self.assertEqual(
+        self.Columns(transitions.Slide(direction=transitions.RIGHT)
+                     .Blend(left, right, 0.25)),
+        [(0, 4, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0)])
+
+  def testDissolve(self):
+    """ Ensure a dissolve replaces a growing share of pixels. """
+    dissolve = transitions.Dissolve()
+    size = (32, 32)
+    red = Image.new('RGB', size, base_tile.RED)
+    blue = Image.new('RGB', size, base_tile.BLUE)
+    replaced = []
+    for progress in (0.0, 0.5, 1.0):
+      frame = dissolve.Blend(red, blue, progress)
+      replaced.append(frame.getchannel('B').histogram()[255])
+    self.assertEqual(replaced[0], 0)
+    self.assertTrue(400 < replaced[1] < 624, replaced[1])
+    self.assertEqual(replaced[2], 32 * 32)
+
+  def testUnknownDirection(self):
+    """ Ensure unknown directions raise. """
+    with self.assertRaises(Exception):
+      transitions.Slide(direction='sideways')
+
+
+class TestTileManagerTransitions(unittest.TestCase):
+  """ Test transitions in the tile manager pipeline. """
+
+  def setUp(self):
+    """ Initalize TileManager with a crossfade test setup.
+
+    Static tiles last a second at 2 fps, the crossfade 3 frames.
+    """
+    self.tiles = [ColorTile(base_tile.RED), ColorTile(base_tile.GREEN),
+                  ColorTile(base_tile.BLUE)]
+    self.manager = tile_manager.TileManager(
+        self.tiles, 32, 2, fps=2, static_lifespan=1,
+        transition=transitions.Crossfade(frames=3))
+
+  def Frame(self):
+    """ Returns Tuple colors of both cells after rendering a frame. """
+    self.manager._RenderPruneAndTick()
+    self.manager._RenderAddNewTiles()
+    self.manager._RenderToMatrix()
+    buffer = self.manager.matrix.offscreen_buffer
+    return (buffer.getpixel((0, 0)), buffer.getpixel((32, 0)))
+
+  def testCrossfade(self):
+    """ Ensure expired tiles fade into the next tile. """
+    frames = [self.Frame() for frame in range(9)]
+    self.assertEqual([cells[0] for cells in frames],
+                     [base_tile.RED] * 4 +
+                     [(191, 0, 63), (127, 0, 127), (63, 0, 191)] +
+                     [base_tile.BLUE] * 2)
+    # Without a next tile the last frame fades out.
+    self.assertEqual([cells[1] for cells in frames],
+                     [base_tile.GREEN] * 4 +
+                     [(0, 191, 0), (0, 127, 0), (0, 63, 0)] +
+                     [base_tile.BLACK] * 2)
+
+  def testExpiredWithoutNextTile(self):
+    """ Ensure the last frame of an expired tile is not kept forever. """
+    manager = tile_manager.TileManager(
+        [ColorTile(base_tile.RED)], 32, 2, fps=2, static_lifespan=1,
+        transition=transitions.Crossfade(frames=2))
+    colors = []
+    for frame in range(8):
+      manager._RenderPruneAndTick()
+      manager._RenderAddNewTiles()
+      manager._RenderToMatrix()
+      colors.append(manager.matrix.offscreen_buffer.getpixel((0, 0)))
+    self.assertEqual(colors, [base_tile.RED] * 4 + [(170, 0, 0), (85, 0, 0)] +
+                     [base_tile.BLACK] * 2)
+    self.assertEqual(manager.transitions._outgoing, {})
+
+  def testLifespanExcludesTransition(self):
+    """ Ensure tiles do not advance frames while transitioning in. """
+    for frame in range(7):
+      self.Frame()
+    self.assertEqual(self.tiles[2].current_frame, 0)
+    self.Frame()
+    self.assertEqual(self.tiles[2].current_frame, 1)
+
+  def testNoTransition(self):
+    """ Ensure tiles are cut without a transition. """
+    manager = tile_manager.TileManager(
+        [ColorTile(base_tile.RED)], 32, 2, fps=2, static_lifespan=1)
+    self.assertIsNone(manager.transitions)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -2,8 +2,10 @@
 # Helper unittest library for testing tiles.
 #
 
+import golden_frames
 import math
 import operator
+import os
 import unittest
 from PIL import Image
 from functools import reduce
@@ -30,6 +32,8 @@ class TileTest(unittest.TestCase):
     Asserts:
       Asserts test image is < 5 RMS difference from specified filename image.
     """
+    if test.mode == 'P':
+      test = test.convert('RGB')
     h1 = test.histogram()
     h2 = Image.open(filename).histogram()
     rms = math.sqrt(reduce(operator.add,
@@ -50,6 +54,39 @@ class TileTest(unittest.TestCase):
       self.AssertSameImage(tile.Render(), test_images % index)
       tile.StepFrame()
 
+  def AssertGoldenFrames(self, tile, manifest):
+    """ Compares a tile's rendered frames exactly with a golden manifest.
+
+    Set the REGENERATE_GOLDENS environment variable to write the manifest
+    from the rendered frames instead.
+
+    Args:
+      tile: BaseTile or subclass tile object to test.
+      manifest: String location of the golden_frames manifest.
+
+          Example: 'testdata/weather/step_render_large.golden'
+
+    Asserts:
+      Asserts every frame is pixel identical, reporting the first differing
+      frame and the bounding box of the difference.
+    """
+    if os.environ.get('REGENERATE_GOLDENS'):
+      self.WriteGoldenFrames(tile, manifest)
+      return
+    images = golden_frames.RenderFrames(tile)
+    mismatch = golden_frames.GoldenManifest(manifest).Compare(images)
+    if mismatch:
+      self.fail(str(mismatch))
+
+  def WriteGoldenFrames(self, tile, manifest):
+    """ Writes a golden manifest of a tile's rendered frames.
+
+    Args:
+      tile: BaseTile or subclass tile object to render.
+      manifest: String location of the golden_frames manifest to write.
+    """
+    golden_frames.WriteManifest(manifest, golden_frames.RenderFrames(tile))
+
   def WriteSampleFiles(self, tile, location):
     """ Writes sample images to a specified directory for a given tile.
 
@@ -3,19 +3,17 @@
 #
 
 import base_tile
-import operator
-import os
-
-from PIL import Image
+import icon_atlas
 
 
 class AbstractWeatherTile(base_tile.BaseTile):
   """ Abstract weather Tile used to handle weather information.
 
   Attributes:
+    ICON_ATLAS: icon_atlas.IconAtlas containing the weather icons, shared by
+        all weather tiles. Default: the bundled openweathermap.org icons.
   """
-  ICON_LIBRARY = (os.path.join(os.path.dirname(os.path.realpath(__file__)),
-                               'openweathermap.org-icons'))
+  ICON_ATLAS = icon_atlas.GetAtlas()
 
   def __init__(self, weather, x=0, y=0, scrolling=(0,0)):
     """ Initalize weather tile.
@@ -30,6 +28,7 @@ class AbstractWeatherTile(base_tile.BaseTile):
            'temp_min': Integer minimum temperature,
            'temp_max': Integer maximum temperature,
            'humidity': Integer current humidity}.
+          Empty while no weather is known yet, the tile is then blank.
       x: Integer absolute X position of tile. Default: 0.
       y: Integer absolute Y position of tile. Default: 0.
       scrolling: Tuple (Integer: X, Integer: Y) containing scrolling
@@ -38,7 +37,34 @@ class AbstractWeatherTile(base_tile.BaseTile):
     """
     base_tile.BaseTile.__init__(self, x, y, scrolling)
     self.weather = weather
-    self._icon_cache = None
+
+  def SetWeather(self, weather):
+    """ Replace the weather displayed by the tile.
+
+    This may be called from another thread (e.g. weather_provider) while the
+    tile is displayed; the new weather is picked up on the next Render. The
+    frame count of scrolling tiles is recalculated for the new information.
+
+    Args:
+      weather: Dictionary containing weather information, see __init__.
+    """
+    self.weather = weather
+    if self.scrolling != (0, 0):
+      self._max_frame_count = None
+
+  def GetCacheKey(self):
+    """ Returns the content the weather frames depend on, see BaseTile. """
+    return (tuple(sorted((str(name), str(value))
+                         for (name, value) in self.weather.items())),
+            self.START_X, self.START_Y, self.scrolling)
+
+  def _GetIcon(self):
+    """ Returns icon_atlas.Sprite for the current weather.
+
+    Raises:
+      Exception if the image icon for the given weather is not found.
+    """
+    return self.ICON_ATLAS.GetSprite(self.weather['icon'])
 
 
 class WeatherTile32x32(AbstractWeatherTile):
@@ -60,13 +86,8 @@ class WeatherTile32x32(AbstractWeatherTile):
       if weather_item not in ['id', 'description', 'icon']:
         max_height += self.FONT.getsize(str(self.weather[weather_item]))[1]
 
-    if not self._icon_cache:
-      icon = os.path.join(self.ICON_LIBRARY, '%s.png' % self.weather['icon'])
-      if os.path.isfile(icon):
-        self._icon_cache = Image.open(icon)
-      else:
-        raise Exception('WeatherTile: icon file not found: %s' % icon)
-    max_height += self._icon_cache.size[1]
+    if self.weather:
+      max_height += self._GetIcon().size[1]
     
     return (self.TILE_WIDTH, max_height)
 
@@ -91,16 +112,14 @@ class WeatherTile32x32(AbstractWeatherTile):
    """
     self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
                                 fill=base_tile.BLACK)
-    if not self._icon_cache:
-      icon = os.path.join(self.ICON_LIBRARY, '%s.png' % self.weather['icon'])
-      if os.path.isfile(icon):
-        self._icon_cache = Image.open(icon)
-      else:
-        raise Exception('WeatherTile: icon file not found: %s' % icon)
+    if not self.weather:
+      self.displayed = True
+      return self._image_buffer
+    icon = self._GetIcon()
 
     y = self.y
-    self._image_buffer.paste(self._icon_cache, (0, 0))
-    y += self._icon_cache.size[1]
+    icon.Paste(self._image_buffer, (0, 0))
+    y += icon.size[1]
 
     y += self._RenderText(self.x,
                           self.y + self.FONT_Y_OFFSET,
@@ -161,17 +180,15 @@ class WeatherTile64x32(AbstractWeatherTile):
     """
     self._image_draw.rectangle((0, 0, self.TILE_WIDTH, self.TILE_HEIGHT),
                                 fill=base_tile.BLACK)
-    if not self._icon_cache:
-      icon = os.path.join(self.ICON_LIBRARY, '%s.png' % self.weather['icon'])
-      if os.path.isfile(icon):
-        self._icon_cache = Image.open(icon)
-      else:
-        raise Exception('WeatherTile: icon file not found: %s' % icon)
+    if not self.weather:
+      self.displayed = True
+      return self._image_buffer
+    icon = self._GetIcon()
 
     composite_index = 0
     y = self.y
-    self._image_buffer.paste(self._icon_cache, (0, 0))
-    composite_index += self._icon_cache.size[0]
+    icon.Paste(self._image_buffer, (0, 0))
+    composite_index += icon.size[0]
 
     y += self._RenderText(composite_index,
                           self.y + self.FONT_Y_OFFSET,
@@ -0,0 +1,274 @@
+#
+# Non-blocking weather data provider for weather tiles.
+#
+# Weather is fetched on a background thread and pushed into existing weather
+# tiles, so a slow or failing weather service never blocks the display:
+#
+#   provider = weather_provider.WeatherProvider(
+#       'https://api.openweathermap.org/data/2.5/weather?q=...&appid=...')
+#   tile = weather.WeatherTile64x32(provider.Get() or {})
+#   provider.Subscribe(tile)
+#   provider.Start()
+#
+# Tiles created before the first fetch completes are blank until then.
+#
+# Responses are cached for their Cache-Control max-age (or ttl). Expired data
+# keeps being served while it is revalidated in the background with a
+# conditional request (ETag / Last-Modified). Failed fetches back off
+# exponentially and keep the last good data.
+#
+
+import json
+import logging
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def ParseOpenWeatherMap(payload):
+  """ Converts an openweathermap.org current weather response for tiles.
+
+  Args:
+    payload: bytes JSON response body.
+
+  Returns:
+    Dictionary weather information, see weather.AbstractWeatherTile.
+
+  Raises:
+    Exception if the response is not a current weather response.
+  """
+  try:
+    data = json.loads(payload.decode('utf-8'))
+    condition = data['weather'][0]
+    main = data['main']
+    return {'id': condition['id'],
+            'main': condition['main'],
+            'description': condition['description'],
+            'icon': condition['icon'],
+            'temp': int(round(main['temp'])),
+            'temp_min': int(round(main['temp_min'])),
+            'temp_max': int(round(main['temp_max'])),
+            'humidity': int(round(main['humidity']))}
+  except (ValueError, KeyError, IndexError, TypeError) as e:
+    raise Exception('WeatherProvider: invalid weather response: %s' % e)
+
+
+class WeatherProvider(object):
+  """ Fetches weather in the background and updates subscribed tiles.
+
+  Attributes:
+    url: String weather service URL.
+    ttl: Integer seconds a response is fresh, unless the service sends a
+        Cache-Control max-age. Default: 600.
+    timeout: Float seconds to wait for the service. Default: 10.
+    min_backoff: Float seconds to wait after the first failure, doubled
+        for every further failure. Default: 30.
+    max_backoff: Float maximum seconds to wait between failures.
+        Default: 1800.
+    failures: Integer consecutive failed fetches.
+    fetches: Integer requests sent.
+    not_modified: Integer requests answered 304 Not Modified.
+    MIN_WAIT: Float minimum seconds between background loop wake ups.
+  """
+  MIN_WAIT = 0.1
+
+  def __init__(self, url, ttl=600, timeout=10, min_backoff=30,
+               max_backoff=1800, parser=ParseOpenWeatherMap,
+               clock=time.time):
+    """ Initalize weather provider. Nothing is fetched until needed.
+
+    Args:
+      url: String weather service URL.
+      ttl: Integer seconds a response is fresh. Default: 600.
+      timeout: Float seconds to wait for the service. Default: 10.
+      min_backoff: Float seconds to wait after a failure. Default: 30.
+      max_backoff: Float maximum seconds between failures. Default: 1800.
+      parser: Function converting a response body into a weather
+          Dictionary. Default: ParseOpenWeatherMap.
+      clock: Function returning the current time in seconds. Default:
+          time.time.
+    """
+    self.url = url
+    self.ttl = ttl
+    self.timeout = timeout
+    self.min_backoff = min_backoff
+    self.max_backoff = max_backoff
+    self.failures = 0
+    self.fetches = 0
+    self.not_modified = 0
+    self._parser = parser
+    self._clock = clock
+    self._data = None
+    self._expires = 0.0
+    self._retry_at = 0.0
+    self._etag = None
+    self._last_modified = None
+    self._tiles = []
+    self._lock = threading.Lock()
+    self._refreshing = threading.Lock()
+    self._wake = threading.Event()
+    self._thread = None
+    self._running = False
+
+  def Subscribe(self, tile):
+    """ Push every weather update into a tile.
+
+    The tile is updated immediately if weather is already known.
+
+    Args:
+      tile: weather.AbstractWeatherTile to keep updated.
+    """
+    with self._lock:
+      self._tiles.append(tile)
+      data = self._data
+    if data is not None:
+      tile.SetWeather(data)
+
+  def Unsubscribe(self, tile):
+    """ Stop updating a tile.
+
+    Args:
+      tile: weather.AbstractWeatherTile previously subscribed.
+    """
+    with self._lock:
+      if tile in self._tiles:
+        self._tiles.remove(tile)
+
+  def IsFresh(self):
+    """ Boolean True if the cached weather has not expired. """
+    return self._data is not None and self._clock() < self._expires
+
+  def Get(self):
+    """ Returns the cached weather Dictionary without blocking.
+
+    If the weather is missing or expired a background refresh is started
+    and the stale weather (or None) is returned meanwhile.
+    """
+    if not self.IsFresh() and self._clock() >= self._retry_at:
+      self._RefreshInBackground()
+    return self._data
+
+  def _RefreshInBackground(self):
+    """ Start a refresh on a new thread unless one is already running. """
+    if self._thread and self._running:
+      self._wake.set()
+      return
+    # Taken here, not in the thread, so two callers never both start one.
+    if not self._refreshing.acquire(blocking=False):
+      return
+    threading.Thread(target=self._RefreshAndRelease, daemon=True).start()
+
+  def _RefreshAndRelease(self):
+    """ Refresh holding the refresh lock taken by _RefreshInBackground. """
+    try:
+      self._Refresh()
+    finally:
+      self._refreshing.release()
+
+  def _MaxAge(self, headers):
+    """ Returns Integer seconds the response is fresh for.
+
+    Args:
+      headers: email.message.Message HTTP response headers.
+    """
+    match = re.search(r'max-age=(\d+)', headers.get('Cache-Control', ''))
+    if match:
+      return int(match.group(1))
+    return self.ttl
+
+  def _Fetch(self):
+    """ Send a conditional request to the weather service.
+
+    Returns:
+      Tuple (Integer: HTTP status, bytes: body, headers).
+    """
+    request = urllib.request.Request(self.url)
+    if self._etag:
+      request.add_header('If-None-Match', self._etag)
+    if self._last_modified:
+      request.add_header('If-Modified-Since', self._last_modified)
+    self.fetches += 1
+    try:
+      with urllib.request.urlopen(request, timeout=self.timeout) as response:
+        return (response.status, response.read(), response.headers)
+    except urllib.error.HTTPError as e:
+      if e.code == 304:
+        return (304, b'', e.headers)
+      raise
+
+  def Refresh(self):
+    """ Fetch the weather now, blocking the calling thread.
+
+    Errors are logged and never raised; the last good weather is kept and
+    the next attempt is delayed by an exponential backoff.
+
+    Returns:
+      Boolean True if the weather was fetched or revalidated.
+    """
+    with self._refreshing:
+      return self._Refresh()
+
+  def _Refresh(self):
+    """ Fetch the weather, the refresh lock must be held. See Refresh. """
+    try:
+      (status, body, headers) = self._Fetch()
+      if status != 304:
+        data = self._parser(body)
+    except Exception as e:
+      self.failures += 1
+      backoff = min(self.max_backoff,
+                    self.min_backoff * 2 ** (self.failures - 1))
+      self._retry_at = self._clock() + backoff
+      logging.error('WeatherProvider: fetch %s failed (retry in %ds): %s',
+                    self.url, backoff, e)
+      return False
+
+    self.failures = 0
+    self._retry_at = 0.0
+    self._expires = self._clock() + self._MaxAge(headers)
+    self._etag = headers.get('ETag', self._etag)
+    self._last_modified = headers.get('Last-Modified', self._last_modified)
+    if status == 304:
+      self.not_modified += 1
+      return True
+
+    with self._lock:
+      changed = data != self._data
+      self._data = data
+      tiles = list(self._tiles)
+    if changed:
+      for tile in tiles:
+        tile.SetWeather(data)
+    return True
+
+  def _NextDue(self):
+    """ Returns Float seconds until the next fetch is due. """
+    due = self._retry_at if self.failures else self._expires
+    return max(0.0, due - self._clock())
+
+  def _Run(self):
+    """ Background loop, refreshing whenever the weather expires. """
+    while self._running:
+      if self._NextDue() <= 0:
+        self.Refresh()
+      self._wake.wait(max(self.MIN_WAIT, self._NextDue()))
+      self._wake.clear()
+
+  def Start(self):
+    """ Start refreshing the weather on a background thread. """
+    if self._thread:
+      return
+    self._running = True
+    self._thread = threading.Thread(target=self._Run, daemon=True)
+    self._thread.start()
+
+  def Stop(self):
+    """ Stop the background thread. """
+    if not self._thread:
+      return
+    self._running = False
+    self._wake.set()
+    self._thread.join()
+    self._thread = None
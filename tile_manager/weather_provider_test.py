@@ -0,0 +1,158 @@
+#
+# Weather provider unittest.
+#
+
+import threading
+import time
+import unittest
+import weather
+import weather_provider
+import weather_stub
+
+
+class FakeClock(object):
+  """ Manually advanced clock. """
+
+  def __init__(self):
+    self.now = 1000.0
+
+  def Time(self):
+    return self.now
+
+
+class TestParseOpenWeatherMap(unittest.TestCase):
+  """ Test converting service responses for tiles. """
+
+  def testParse(self):
+    """ Ensure a recorded response is converted for tiles. """
+    with open('testdata/weather_provider/sunny.json', 'rb') as f:
+      data = weather_provider.ParseOpenWeatherMap(f.read())
+    self.assertEqual(data, {'id': 800,
+                            'main': 'Clear',
+                            'description': 'clear sky',
+                            'icon': '01d',
+                            'temp': 72,
+                            'temp_min': 68,
+                            'temp_max': 78,
+                            'humidity': 23})
+
+  def testParseInvalid(self):
+    """ Ensure a bad response raises. """
+    with self.assertRaises(Exception):
+      weather_provider.ParseOpenWeatherMap(b'{"cod": 401}')
+    with self.assertRaises(Exception):
+      weather_provider.ParseOpenWeatherMap(b'not json')
+
+
+class TestWeatherProvider(unittest.TestCase):
+  """ Test fetching from the local stub service. """
+
+  def setUp(self):
+    """ Start a stub service and a provider with a fake clock. """
+    self.stub = weather_stub.WeatherStubServer()
+    self.addCleanup(self.stub.Stop)
+    self.clock = FakeClock()
+    self.provider = weather_provider.WeatherProvider(
+        self.stub.url, ttl=60, min_backoff=10, max_backoff=40,
+        clock=self.clock.Time)
+    self.tile = weather.WeatherTile64x32({}, scrolling=(0, -2))
+
+  def _WaitFor(self, condition):
+    """ Wait up to 5 seconds for a condition to be true. """
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+      time.sleep(0.01)
+    self.assertTrue(condition())
+
+  def testRefreshUpdatesTiles(self):
+    """ Ensure a fetch pushes weather into subscribed tiles. """
+    self.provider.Subscribe(self.tile)
+    self.assertTrue(self.provider.Refresh())
+    self.assertEqual(self.tile.weather['icon'], '01d')
+    self.assertTrue(self.provider.IsFresh())
+    self.tile.Render()
+    late = weather.WeatherTile32x32({})
+    self.provider.Subscribe(late)
+    self.assertEqual(late.weather['icon'], '01d')
+
+  def testConditionalRequest(self):
+    """ Ensure revalidation sends the ETag and accepts 304. """
+    self.provider.Refresh()
+    self.clock.now += 61
+    self.assertFalse(self.provider.IsFresh())
+    self.assertTrue(self.provider.Refresh())
+    self.assertEqual(self.provider.not_modified, 1)
+    self.assertIn('If-None-Match', self.stub.requests[-1])
+    self.assertTrue(self.provider.IsFresh())
+
+  def testChangedWeather(self):
+    """ Ensure changed weather replaces the tile weather and frame count. """
+    self.provider.Subscribe(self.tile)
+    self.provider.Refresh()
+    frames = self.tile.GetMaxFrames()
+    self.stub.fixture = 'rain'
+    self.clock.now += 61
+    self.provider.Refresh()
+    self.assertEqual(self.tile.weather['icon'], '10n')
+    self.assertEqual(self.tile.weather['humidity'], 88)
+    self.assertIsNone(self.tile._max_frame_count)
+    self.assertEqual(self.tile.GetMaxFrames(), frames)
+
+  def testMaxAge(self):
+    """ Ensure Cache-Control max-age overrides the ttl. """
+    self.stub.max_age = 5
+    self.provider.Refresh()
+    self.clock.now += 6
+    self.assertFalse(self.provider.IsFresh())
+
+  def testBackoff(self):
+    """ Ensure failures back off exponentially and keep stale weather. """
+    self.provider.Refresh()
+    self.stub.status = 500
+    self.clock.now += 61
+    retries = []
+    for i in range(4):
+      self.assertFalse(self.provider.Refresh())
+      retries.append(self.provider._retry_at - self.clock.now)
+    self.assertEqual(retries, [10, 20, 40, 40])
+    self.assertEqual(self.provider.Get()['icon'], '01d')
+    self.stub.status = 200
+    self.assertTrue(self.provider.Refresh())
+    self.assertEqual(self.provider.failures, 0)
+
+  def testGetDoesNotBlock(self):
+    """ Ensure Get returns stale data at once while revalidating. """
+    self.provider.Refresh()
+    self.clock.now += 61
+    self.stub.fixture = 'rain'
+    self.stub.delay = 0.5
+    started = time.time()
+    self.assertEqual(self.provider.Get()['icon'], '01d')
+    self.assertLess(time.time() - started, 0.1)
+    self._WaitFor(lambda: self.provider.Get()['icon'] == '10n')
+
+  def testGetStartsOneFetch(self):
+    """ Ensure concurrent Get calls start a single background fetch. """
+    self.stub.delay = 0.2
+    threads = [threading.Thread(target=self.provider.Get) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self._WaitFor(lambda: self.provider.Get() is not None)
+    self.assertEqual(self.provider.fetches, 1)
+
+  def testBackgroundThread(self):
+    """ Ensure the background thread fetches on start and on expiry. """
+    self.provider.Subscribe(self.tile)
+    self.provider.Start()
+    self.addCleanup(self.provider.Stop)
+    self._WaitFor(lambda: self.tile.weather.get('icon') == '01d')
+    self.stub.fixture = 'rain'
+    self.clock.now += 61
+    self.provider.Get()
+    self._WaitFor(lambda: self.tile.weather.get('icon') == '10n')
+
+
+if __name__ == '__main__':
+  unittest.main()
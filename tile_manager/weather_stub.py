@@ -0,0 +1,108 @@
+#
+# Local stub weather service for testing weather_provider offline.
+#
+# Serves recorded openweathermap.org responses from testdata, with ETag
+# revalidation, so the provider can be exercised without network access:
+#
+#   with weather_stub.WeatherStubServer() as stub:
+#     provider = weather_provider.WeatherProvider(stub.url)
+#
+
+import hashlib
+import http.server
+import os
+import threading
+import time
+
+FIXTURES = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        'testdata', 'weather_provider')
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+  """ Answers every GET with the stub's current fixture. """
+
+  def do_GET(self):
+    """ Serve the current fixture, 304 if the client has it already. """
+    stub = self.server.stub
+    stub.requests.append(dict(self.headers))
+    if stub.delay:
+      time.sleep(stub.delay)
+    if stub.status != 200:
+      self.send_error(stub.status)
+      return
+    (body, etag) = stub.GetResponse()
+    if self.headers.get('If-None-Match') == etag:
+      self.send_response(304)
+      self.send_header('ETag', etag)
+      self.end_headers()
+      return
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('ETag', etag)
+    if stub.max_age is not None:
+      self.send_header('Cache-Control', 'max-age=%d' % stub.max_age)
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    """ Keep test output quiet. """
+    pass
+
+
+class WeatherStubServer(object):
+  """ Local HTTP server returning recorded weather responses.
+
+  Attributes:
+    fixture: String name of the fixture served, e.g. 'sunny'.
+    status: Integer HTTP status to answer with, 200 serves the fixture.
+    delay: Float seconds to wait before answering.
+    max_age: Integer Cache-Control max-age to send, or None.
+    requests: List of Dictionary headers of every request received.
+    url: String URL of the stub.
+  """
+
+  def __init__(self, fixture='sunny', fixtures=FIXTURES, port=0):
+    """ Initalize and start the stub server on localhost.
+
+    Args:
+      fixture: String name of the fixture to serve. Default: 'sunny'.
+      fixtures: String directory of '<name>.json' fixtures. Default: the
+          bundled testdata fixtures.
+      port: Integer port to listen on, 0 to pick a free port. Default: 0.
+    """
+    self.fixture = fixture
+    self.fixtures = fixtures
+    self.status = 200
+    self.delay = 0
+    self.max_age = None
+    self.requests = []
+    self._server = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                                   _Handler)
+    self._server.daemon_threads = True
+    self._server.stub = self
+    self.url = 'http://127.0.0.1:%d/data/2.5/weather' % (
+        self._server.server_address[1])
+    self._thread = threading.Thread(target=self._server.serve_forever,
+                                    daemon=True)
+    self._thread.start()
+
+  def __enter__(self):
+    """ Enter runtime context for the stub. """
+    return self
+
+  def __exit__(self, type, value, traceback):
+    """ Exit runtime context for the stub, stopping the server. """
+    self.Stop()
+
+  def GetResponse(self):
+    """ Returns Tuple (bytes: body, String: ETag) for the current fixture. """
+    with open(os.path.join(self.fixtures, '%s.json' % self.fixture),
+              'rb') as f:
+      body = f.read()
+    return (body, '"%s"' % hashlib.sha1(body).hexdigest())
+
+  def Stop(self):
+    """ Stop the stub server. """
+    self._server.shutdown()
+    self._server.server_close()
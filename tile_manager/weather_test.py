@@ -47,6 +47,15 @@ class TestWeatherTile(unittest_tiletest.TileTest):
     self.assertIsInstance(image, Image.Image)
     #self.AssertSameImage(image, 'testdata/weather/test_render.png')
 
+  def testRenderNoWeather(self):
+    """ Ensure tiles without weather yet render blank. """
+    for tile in (weather.WeatherTile32x32({}), weather.WeatherTile64x32({})):
+      image = tile.Render()
+      self.assertTrue(tile.displayed)
+      self.assertIsNone(image.getbbox())
+      tile.SetWeather(self.data)
+      self.assertIsNotNone(tile.Render().getbbox())
+
 
 class TestWeatherFull(unittest_tiletest.TileTest):
   """ Ensure full frame stepping and rendering works. """
@@ -69,8 +78,8 @@ class TestWeatherFull(unittest_tiletest.TileTest):
 
   def testStepRenderLarge(self):
     """ Test a full run of a sample weather for 64x32 weather tiles. """
-    self.AssertStepRender(self.tile_large,
-                          'testdata/weather/step_render_large_%02d.png')
+    self.AssertGoldenFrames(self.tile_large,
+                            'testdata/weather/step_render_large.golden')
 
   # def testStepRenderNormal(self):
   #   """ Test a full run of a sample weather for 32x32 weather tiles. """